@@ -2,6 +2,10 @@ import argparse
 import re
 import sys
 
+from litpcli.paths import expand_braces, has_braces, PathTemplate, \
+    MAX_EXPANSIONS
+from litpcli.rows import parse_columns
+
 PATH_RE = r'^/([a-zA-Z\d_-]/?)*$'
 SNAPSHOT_NAME_RE = r'^[a-zA-Z0-9_-]+$'
 HOSTNAME_RE = r"([a-zA-Z0-9][a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])"
@@ -207,6 +211,23 @@ def valid_create_path(path_arg):
     return valid_path(path_arg)
 
 
+def valid_path_template(path_arg):
+    """
+    Validate a path that may hold brace expressions, e.g. /nodes/n{1..10},
+    by validating every path it expands to; such a path is returned as a
+    PathTemplate holding its expansions.
+    """
+    if not has_braces(path_arg):
+        return valid_path(path_arg)
+    try:
+        expansions = expand_braces(path_arg, MAX_EXPANSIONS)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    for path, _ in expansions:
+        valid_create_path(path)
+    return PathTemplate(path_arg, expansions)
+
+
 def valid_depth(depth_arg):
     value = int(depth_arg)
     if value < 1:
@@ -215,6 +236,24 @@ def valid_depth(depth_arg):
     return value
 
 
+def valid_columns(columns_arg):
+    try:
+        return parse_columns(columns_arg)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def valid_timeout(timeout_arg):
+    try:
+        value = float(timeout_arg)
+    except ValueError:
+        value = 0
+    if value <= 0:
+        msg = "%s is not a valid timeout argument" % timeout_arg
+        raise argparse.ArgumentTypeError(msg)
+    return value
+
+
 def validate_opts(opts):
     invalid_opts = []
     if isinstance(opts, list):
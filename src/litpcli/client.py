@@ -0,0 +1,327 @@
+"""
+Python client of the LITP REST API, for automation that would otherwise run
+the litp command and parse its output.
+
+Example::
+
+    from litpcli.client import LitpClient
+
+    with LitpClient() as client:
+        client.create('/software/items/vim', 'package',
+                      {'name': 'vim-enhanced'})
+        client.create_plan()
+        client.run_plan()
+"""
+
+import httplib
+import json
+import os
+import pwd
+import socket
+import stat
+import threading
+import urlparse
+
+from litpcli.compression import ACCEPT_ENCODING
+from litpcli.connection import UnixSocketConnection, ConnectionPool, \
+    get_ssl_context, basic_auth_headers, \
+    DEFAULT_POOL_SIZE, DEFAULT_IDLE_TIMEOUT
+from litpcli.download import save_response
+from litpcli.formatter import CliFormatter
+from litpcli.retry import Deadline, RetryPolicy, DEFAULT_RETRIES
+from litpcli.service import REST_URL, XML_PATH, UNIX_SOCKET, OK_STATUSES, \
+    CREDENTIALS_ERR, LITP_SERVICE_ERR, LITP_TIMEOUT_ERR, \
+    SERVICE_UNAVAILABLE_ERR, INVALID_RESPONSE_ERR, send
+
+
+class LitpClientError(Exception):
+    """
+    Raised when the LITP service rejects a request or cannot be reached.
+
+    :ivar status: HTTP status of the response, None if there was none
+    :ivar messages: error messages returned by the service
+    """
+    def __init__(self, message, status=None, messages=None):
+        Exception.__init__(self, message)
+        self.status = status
+        self.messages = messages or []
+
+
+class LitpClient(object):
+    """
+    Client of the LITP REST API sharing the transport of the litp command:
+    pooled keep-alive connections, compression, timeouts and retries of
+    reads. Methods return the items of the model as decoded JSON objects
+    and raise LitpClientError on failure.
+
+    A client is thread-safe; concurrent calls use separate connections
+    from its pool.
+
+    The local litpd socket is used, authenticated as the current user,
+    unless a username and password are given.
+
+    :param url: REST URL of the LITP service, used with username and
+        password
+    :param timeout: time limit in seconds of each request, retries included
+    :param request_timeout: time limit in seconds of each attempt of a
+        request
+    :param retries: number of times a failed read is retried
+    """
+    def __init__(self, username=None, password=None, url=REST_URL,
+                 unix_socket_path=UNIX_SOCKET, timeout=None,
+                 request_timeout=None, pool_size=DEFAULT_POOL_SIZE,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, retries=DEFAULT_RETRIES):
+        self.url = url.rstrip('/')
+        parsed = urlparse.urlparse(self.url)
+        self.xml_url = "{0}://{1}{2}".format(parsed.scheme, parsed.netloc,
+                                             XML_PATH)
+        self.unix_socket_path = None
+        if username is not None and password is not None:
+            self.headers = basic_auth_headers(username, password)
+            self.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            self.host = parsed.netloc
+        elif self._is_socket(unix_socket_path):
+            self.unix_socket_path = unix_socket_path
+            self.headers = basic_auth_headers(
+                pwd.getpwuid(os.getuid()).pw_name, '')
+        else:
+            raise LitpClientError(
+                "The litpd socket {0} is not available, a username and"
+                " password are required".format(unix_socket_path))
+        self.timeout = timeout
+        self.request_timeout = request_timeout
+        self.retry_policy = RetryPolicy(retries)
+        self._local = threading.local()
+        self.pool = ConnectionPool(self._create_connection, pool_size,
+                                   idle_timeout, timeout=self._get_timeout)
+
+    @staticmethod
+    def _is_socket(path):
+        return bool(path) and os.path.exists(path) and \
+            stat.S_ISSOCK(os.stat(path).st_mode)
+
+    def _create_connection(self):
+        if self.unix_socket_path is not None:
+            return UnixSocketConnection(self.unix_socket_path)
+        return httplib.HTTPSConnection(self.host, context=get_ssl_context())
+
+    def _get_timeout(self):
+        deadline = getattr(self._local, 'deadline', None) or Deadline()
+        return deadline.limit(self.request_timeout)
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _send(self, url, method='GET', data=None, content_type=None,
+              compress=False):
+        self._local.deadline = Deadline(self.timeout)
+        try:
+            response = send(self.pool, method, url, data, self.headers,
+                            self.retry_policy, self._local.deadline,
+                            content_type, compress)
+        except socket.timeout:
+            raise LitpClientError(LITP_TIMEOUT_ERR)
+        except (socket.error, httplib.HTTPException):
+            raise LitpClientError(LITP_SERVICE_ERR)
+        if response.status not in OK_STATUSES:
+            self._raise_error(response.status, self._read(response))
+        return response
+
+    @staticmethod
+    def _read(response):
+        try:
+            return response.read()
+        except socket.timeout:
+            raise LitpClientError(LITP_TIMEOUT_ERR)
+        except socket.error:
+            raise LitpClientError(LITP_SERVICE_ERR)
+        except httplib.HTTPException:
+            raise LitpClientError(INVALID_RESPONSE_ERR)
+
+    @staticmethod
+    def _decode(result):
+        try:
+            return json.loads(result)
+        except ValueError:
+            raise LitpClientError(INVALID_RESPONSE_ERR)
+
+    def _raise_error(self, status, result):
+        try:
+            data = json.loads(result)
+        except ValueError:
+            data = None
+        if status == 401:
+            raise LitpClientError(CREDENTIALS_ERR, status)
+        if data is None:
+            if status == 503:
+                result = SERVICE_UNAVAILABLE_ERR
+            raise LitpClientError(result, status)
+        messages = []
+        if isinstance(data, dict):
+            messages = data.get('messages', [])
+        # Formatted from a copy, as the formatter alters the messages
+        message = CliFormatter(self.url, {}).cb_format_error(
+            json.loads(result))
+        raise LitpClientError(message, status, messages)
+
+    def _call(self, path, method='GET', data=None):
+        response = self._send(self.url + path, method, data)
+        result = self._read(response)
+        if not result:
+            return None
+        return self._decode(result)
+
+    @staticmethod
+    def _split_path(path):
+        path = path.rstrip('/')
+        parent, item_id = path.rsplit('/', 1)
+        return parent, item_id
+
+    def show(self, path='/', recursive=False, depth=None):
+        """
+        Return the item at path; with recursive, its descendants are
+        embedded in place of its children links, down to depth levels.
+        """
+        item = self._call(path)
+        if recursive:
+            self._embed_children(item, depth)
+        return item
+
+    def _embed_children(self, item, depth, level=1):
+        if '_embedded' not in item or (depth is not None and level > depth):
+            return
+        children = []
+        for child in item['_embedded'].get('item', []):
+            if '_links' in child:
+                response = self._send(child['_links']['self']['href'])
+                child = self._decode(self._read(response))
+                self._embed_children(child, depth, level + 1)
+                children.append(child)
+        item['_embedded']['item'] = children
+
+    def create(self, path, item_type, properties=None):
+        parent, item_id = self._split_path(path)
+        return self._call(parent, 'POST', {
+            'id': item_id, 'type': item_type,
+            'properties': properties or {}})
+
+    def inherit(self, path, source_path, properties=None):
+        parent, item_id = self._split_path(path)
+        return self._call(parent, 'POST', {
+            'inherit': source_path, 'id': item_id,
+            'properties': properties or {}})
+
+    def update(self, path, properties=None, delete=None):
+        """
+        Update properties of the item at path, and delete the properties
+        named in delete.
+        """
+        properties = dict(properties or {})
+        properties.update((name, None) for name in delete or [])
+        return self._call(path, 'PUT', {'properties': properties})
+
+    def remove(self, path):
+        return self._call(path, 'DELETE')
+
+    def load(self, path, filename, merge=False, replace=False,
+             compress=False):
+        """
+        Load the XML file into the model at path, streaming it from disk.
+        """
+        url = self.xml_url + path
+        if merge:
+            url += "?merge=true"
+        elif replace:
+            url += "?replace=true"
+        with open(filename, 'rb') as fobj:
+            response = self._send(url, 'POST', fobj, "application/xml",
+                                  compress)
+        result = self._read(response)
+        return self._decode(result) if result else None
+
+    def export(self, path, filename=None, compress=False):
+        """
+        Export the model at path as XML; the XML is returned, or written
+        to filename as it is received.
+        """
+        response = self._send(self.xml_url + path,
+                              content_type="application/xml")
+        if filename is None:
+            return self._read(response)
+        try:
+            save_response(response, filename, compress)
+        except socket.timeout:
+            raise LitpClientError(LITP_TIMEOUT_ERR)
+        except socket.error:
+            raise LitpClientError(LITP_SERVICE_ERR)
+        except httplib.HTTPException:
+            raise LitpClientError(INVALID_RESPONSE_ERR)
+
+    def create_plan(self, no_lock_tasks=None, initial_lock_tasks=False):
+        """
+        Create the deployment plan.
+        :param no_lock_tasks: list of nodes, possibly empty, whose lock
+            tasks are not created
+        """
+        data = {'id': 'plan', 'type': 'plan'}
+        if no_lock_tasks is not None:
+            data['no-lock-tasks'] = 'True'
+            if no_lock_tasks:
+                data['no-lock-tasks-list'] = no_lock_tasks
+        if initial_lock_tasks:
+            data['initial-lock-tasks'] = 'True'
+        return self._call('/plans', 'POST', data)
+
+    def create_reboot_plan(self, path=None):
+        data = {'id': 'plan', 'type': 'reboot_plan'}
+        if path:
+            data['path'] = path
+        return self._call('/plans/', 'POST', data)
+
+    def show_plan(self):
+        """
+        Return the plan with its phases and tasks embedded.
+        """
+        return self._call('/plans/plan?recurse_depth=1000')
+
+    def run_plan(self, resume=False):
+        properties = {"state": "running"}
+        if resume:
+            properties["resume"] = "true"
+        return self._call('/plans/plan', 'PUT', {"properties": properties})
+
+    def stop_plan(self):
+        return self._call('/plans/plan', 'PUT',
+                          {"properties": {"state": "stopped"}})
+
+    def remove_plan(self):
+        return self._call('/plans/plan', 'DELETE')
+
+    @staticmethod
+    def _snapshot_path(name, exclude_nodes=None):
+        path = '/snapshots/{0}/'.format(name or 'snapshot')
+        if exclude_nodes:
+            path += '?exclude_nodes=' + exclude_nodes
+        return path
+
+    def create_snapshot(self, name=None, exclude_nodes=None):
+        return self._call(self._snapshot_path(name, exclude_nodes), 'POST',
+                          {'type': 'snapshot-base'})
+
+    def remove_snapshot(self, name=None, force=False, exclude_nodes=None):
+        return self._call(self._snapshot_path(name, exclude_nodes), 'PUT',
+                          {'properties': {'force': force,
+                                          'action': 'remove'}})
+
+    def restore_snapshot(self, force=False):
+        return self._call('/snapshots/snapshot', 'PUT',
+                          {'properties': {'force': force}})
+
+    def version(self):
+        return self._call('/')
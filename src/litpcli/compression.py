@@ -0,0 +1,139 @@
+"""
+HTTP content coding of requests to and responses from the LITP service.
+"""
+
+import httplib
+import zlib
+
+ACCEPT_ENCODING = 'gzip, deflate'
+CHUNK_SIZE = 65536
+GZIP_LEVEL = 6
+# zlib window bits selecting the gzip, zlib and raw deflate formats
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+ZLIB_WBITS = zlib.MAX_WBITS
+RAW_WBITS = -zlib.MAX_WBITS
+
+
+def gzip_compress(data, level=GZIP_LEVEL):
+    """
+    Return data compressed in the gzip format.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def gzip_compress_file(src, dst, level=GZIP_LEVEL):
+    """
+    Write the rest of file object src to file object dst in the gzip
+    format, a chunk at a time.
+    """
+    writer = GzipWriter(dst, level)
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        writer.write(chunk)
+    writer.close()
+
+
+class GzipWriter(object):
+    """
+    Compresses data in the gzip format as it is written to a file object.
+    close() writes the end of the gzip stream but leaves the file open.
+    """
+    def __init__(self, fobj, level=GZIP_LEVEL):
+        self.fobj = fobj
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+
+    def write(self, data):
+        self.fobj.write(self._compressor.compress(data))
+
+    def close(self):
+        self.fobj.write(self._compressor.flush())
+
+
+def decode_response(response):
+    """
+    Return response, wrapped so that reading it decompresses the body if
+    the server applied a gzip or deflate content coding.
+    """
+    getheader = getattr(response, 'getheader', None)
+    if getheader is None:
+        return response
+    encoding = (getheader('content-encoding') or '').strip().lower()
+    if encoding in ('gzip', 'x-gzip', 'deflate'):
+        return DecompressingResponse(response, encoding)
+    return response
+
+
+class DecompressingResponse(object):
+    """
+    Decompresses an HTTP response body as it is read, so that a large body
+    is never held compressed and decompressed in memory at the same time.
+    """
+    def __init__(self, response, encoding):
+        self._response = response
+        self._encoding = encoding
+        if encoding == 'deflate':
+            wbits = ZLIB_WBITS
+        else:
+            wbits = GZIP_WBITS
+        self._decompressor = zlib.decompressobj(wbits)
+        self._started = False
+        self._buffer = ''
+        self._eof = False
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def _decompress(self, data):
+        if not data:
+            return ''
+        try:
+            output = self._decompressor.decompress(data)
+        except zlib.error:
+            # Some servers send raw deflate data without the zlib header
+            if self._encoding != 'deflate' or self._started:
+                raise
+            self._decompressor = zlib.decompressobj(RAW_WBITS)
+            output = self._decompressor.decompress(data)
+        self._started = True
+        return output
+
+    def _finish(self):
+        """
+        Return the end of the decompressed body once the response is read.
+
+        :raise httplib.IncompleteRead: if the compressed stream was cut short
+        """
+        if not self._started:
+            return ''
+        # zlib of Python 2.7 does not tell whether the stream ended, but
+        # leaves data past its end in unused_data
+        probe = self._decompressor.copy()
+        try:
+            probe.decompress(' ')
+        except zlib.error:
+            pass
+        if probe.unused_data != ' ':
+            raise httplib.IncompleteRead(self._buffer)
+        return self._decompressor.flush()
+
+    def read(self, amt=None):
+        if amt is None:
+            data = self._buffer
+            if not self._eof:
+                data += self._decompress(self._response.read())
+                data += self._finish()
+                self._eof = True
+            self._buffer = ''
+            return data
+        while len(self._buffer) < amt and not self._eof:
+            chunk = self._response.read(CHUNK_SIZE)
+            if chunk:
+                self._buffer += self._decompress(chunk)
+            else:
+                self._buffer += self._finish()
+                self._eof = True
+        data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
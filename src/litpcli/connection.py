@@ -0,0 +1,289 @@
+"""
+Connections to the LITP service.
+"""
+
+import base64
+import httplib
+import select
+import socket
+import ssl
+import threading
+from time import time
+
+from litpcli.retry import DeadlineExceeded
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_IDLE_TIMEOUT = 30
+# Methods without side effects: a request that may have reached the
+# server before failing is only sent again if it reads
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_ssl_context = None
+_ssl_context_lock = threading.Lock()
+
+
+def basic_auth_headers(username, password):
+    """
+    Return the Authorization header of a request, encoding both user and
+    password in base64.
+    """
+    val = base64.encodestring(
+        "{0}:{1}".format(username, password)).replace('\n', '')
+    return {"Authorization": "Basic {0}".format(val)}
+
+
+def get_ssl_context():
+    """
+    Return the SSL context shared by every HTTPS connection of the process.
+    """
+    global _ssl_context
+    with _ssl_context_lock:
+        if _ssl_context is None:
+            _ssl_context = ssl._create_unverified_context()
+        return _ssl_context
+
+
+class UnixSocketConnection(httplib.HTTPConnection):
+    def __init__(self, path):
+        self.path = path
+        # '' is a placeholder
+        httplib.HTTPConnection.__init__(self, '')
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class PooledConnection(object):
+    """
+    A connection owned by a ConnectionPool, with its usage counters.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self.created = time()
+        self.last_used = self.created
+        self.requests = 0
+
+
+class PooledResponse(object):
+    """
+    Wraps an HTTP response so that its connection is returned to the pool
+    once the body has been read to the end.
+    """
+    def __init__(self, response, pool, pooled):
+        self._response = response
+        self._pool = pool
+        self._pooled = pooled
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def read(self, amt=None):
+        if amt is None:
+            data = self._response.read()
+        else:
+            data = self._response.read(amt)
+        if amt is None or not data:
+            self._release()
+        return data
+
+    def close(self):
+        # An unread body leaves the connection unusable
+        if self._pooled is not None:
+            self._pool.release(self._pooled, reusable=False)
+            self._pooled = None
+        close = getattr(self._response, 'close', None)
+        if close is not None:
+            close()
+
+    def _release(self):
+        if self._pooled is not None:
+            reusable = not getattr(self._response, 'will_close', False)
+            self._pool.release(self._pooled, reusable)
+            self._pooled = None
+
+
+class ConnectionPool(object):
+    """
+    Thread-safe pool of keep-alive connections to the LITP service.
+
+    It offers the request()/getresponse() pair of httplib connections; the
+    connection used by request() is bound to the calling thread until
+    getresponse() returns. Idle connections are health-checked before reuse
+    and closed once idle for longer than idle_timeout seconds. A read
+    request that fails on a reused connection, which the server may have
+    closed in the meantime, is resent on a new connection; other requests
+    are not, as the server may have acted on them.
+
+    :param factory: callable returning a new, unconnected httplib connection
+    :param size: maximum number of idle connections kept open
+    :param connection: optional first connection to add to the pool
+    :param timeout: optional callable returning the socket timeout, in
+        seconds or None for no timeout, to apply to each request
+    """
+    def __init__(self, factory, size=DEFAULT_POOL_SIZE,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, connection=None,
+                 timeout=None):
+        self.factory = factory
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.connections_created = 0
+        self.reconnects = 0
+        self._idle = []
+        self._all = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if connection is not None:
+            self._idle.append(self._add(connection))
+
+    def _add(self, conn):
+        pooled = PooledConnection(conn)
+        with self._lock:
+            self.connections_created += 1
+            self._all.append(pooled)
+        return pooled
+
+    def _acquire(self):
+        now = time()
+        stale = []
+        pooled = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if now - candidate.last_used > self.idle_timeout or \
+                        not self._is_healthy(candidate):
+                    stale.append(candidate)
+                else:
+                    pooled = candidate
+                    break
+        for candidate in stale:
+            self._close(candidate)
+        if pooled is None:
+            pooled = self._add(self.factory())
+        return pooled
+
+    @staticmethod
+    def _is_healthy(pooled):
+        sock = getattr(pooled.conn, 'sock', None)
+        if sock is None:
+            # Not connected yet, httplib connects on the next request
+            return True
+        try:
+            readable = select.select([sock], [], [], 0)[0]
+        except (select.error, socket.error, ValueError, TypeError):
+            return False
+        # An idle keep-alive socket only becomes readable when the server
+        # has closed it
+        return not readable
+
+    def release(self, pooled, reusable=True):
+        pooled.last_used = time()
+        with self._lock:
+            if reusable and len(self._idle) < self.size:
+                self._idle.append(pooled)
+                return
+        self._close(pooled)
+
+    def _close(self, pooled):
+        with self._lock:
+            if pooled in self._all:
+                self._all.remove(pooled)
+        try:
+            pooled.conn.close()
+        except (socket.error, httplib.HTTPException):
+            pass
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._close(pooled)
+
+    def _apply_timeout(self, pooled):
+        if self.timeout is None:
+            return
+        timeout = self.timeout()
+        if timeout is not None and timeout <= 0:
+            # A zero timeout would make the socket non-blocking
+            raise DeadlineExceeded("No time left for the request")
+        # Used by connect(), and by the socket of a connected connection
+        pooled.conn.timeout = timeout
+        sock = getattr(pooled.conn, 'sock', None)
+        if sock is not None:
+            sock.settimeout(timeout)
+
+    @staticmethod
+    def _can_resend(pooled, method, body, error):
+        # A timed out request is left to the caller's retry policy
+        if isinstance(error, socket.timeout):
+            return False
+        if method not in SAFE_METHODS or not pooled.requests:
+            return False
+        if hasattr(body, 'read'):
+            try:
+                body.seek(0)
+            except (AttributeError, IOError):
+                return False
+        return True
+
+    def _resend(self, pooled, method, url, body, headers):
+        self._close(pooled)
+        with self._lock:
+            self.reconnects += 1
+        pooled = self._add(self.factory())
+        try:
+            self._apply_timeout(pooled)
+        except DeadlineExceeded:
+            self._close(pooled)
+            raise
+        pooled.conn.request(method, url, body, headers)
+        return pooled
+
+    def request(self, method, url, body=None, headers=None):
+        if headers is None:
+            headers = {}
+        pooled = self._acquire()
+        try:
+            self._apply_timeout(pooled)
+        except DeadlineExceeded:
+            self.release(pooled)
+            raise
+        try:
+            pooled.conn.request(method, url, body, headers)
+        except (socket.error, httplib.HTTPException) as error:
+            if not self._can_resend(pooled, method, body, error):
+                self._close(pooled)
+                raise
+            pooled = self._resend(pooled, method, url, body, headers)
+        self._local.pending = (pooled, method, url, body, headers)
+
+    def getresponse(self):
+        pooled, method, url, body, headers = self._local.pending
+        self._local.pending = None
+        try:
+            response = pooled.conn.getresponse()
+        except (socket.error, httplib.HTTPException) as error:
+            if not self._can_resend(pooled, method, body, error):
+                self._close(pooled)
+                raise
+            pooled = self._resend(pooled, method, url, body, headers)
+            try:
+                response = pooled.conn.getresponse()
+            except (socket.error, httplib.HTTPException):
+                self._close(pooled)
+                raise
+        pooled.requests += 1
+        return PooledResponse(response, self, pooled)
+
+    def stats(self):
+        """
+        Return the usage counters of every open connection.
+        """
+        with self._lock:
+            idle = set(id(pooled) for pooled in self._idle)
+            return [{'requests': pooled.requests, 'created': pooled.created,
+                     'last_used': pooled.last_used,
+                     'idle': id(pooled) in idle} for pooled in self._all]
@@ -0,0 +1,74 @@
+"""
+Streaming of response bodies to local files, used by litp export.
+"""
+
+import httplib
+import os
+import tempfile
+
+from litpcli.compression import GzipWriter
+
+CHUNK_SIZE = 65536
+
+
+def check_complete(response):
+    """
+    Raise httplib.IncompleteRead if the body of response, read to its end,
+    was shorter than its Content-Length: the httplib of Python 2.7 then
+    returns '' from read(amt) rather than raising.
+    """
+    remaining = getattr(response, 'length', None)
+    if isinstance(remaining, (int, long)) and remaining > 0:
+        raise httplib.IncompleteRead('', remaining)
+
+
+def copy_response(response, fobj, chunk_size=CHUNK_SIZE):
+    """
+    Write the body of response to fobj as it is received.
+
+    :raise httplib.IncompleteRead: if the body is cut short
+    """
+    while True:
+        chunk = response.read(chunk_size)
+        if not chunk:
+            break
+        fobj.write(chunk)
+    check_complete(response)
+
+
+def save_response(response, filename, compress=False):
+    """
+    Write the body of response to filename, gzipped if compress is set.
+    """
+    save_stream(filename, lambda fobj: copy_response(response, fobj),
+                compress)
+
+
+def save_stream(filename, write_body, compress=False):
+    """
+    Write a file with write_body, called with the file object to write to,
+    gzipped if compress is set.
+
+    The body goes to a temporary file in the same directory, renamed over
+    filename once complete, so that a failed download never leaves a
+    truncated file behind.
+    """
+    filename = os.path.abspath(filename)
+    fd, tmp_filename = tempfile.mkstemp(
+        dir=os.path.dirname(filename),
+        prefix='.' + os.path.basename(filename) + '.')
+    try:
+        with os.fdopen(fd, 'wb') as fobj:
+            if compress:
+                writer = GzipWriter(fobj)
+                write_body(writer)
+                writer.close()
+            else:
+                write_body(fobj)
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_filename, 0666 & ~umask)
+        os.rename(tmp_filename, filename)
+    except BaseException:
+        os.unlink(tmp_filename)
+        raise
@@ -1,6 +1,11 @@
 import json
 import re
 import textwrap
+from time import localtime, strftime
+
+from litpcli.model import ModelTree
+
+PLAN_METRICS = ('total', 'initial', 'running', 'success', 'failed', 'stopped')
 
 
 class CliFormatter(object):
@@ -29,17 +34,19 @@ class CliFormatter(object):
         return children
 
     def cb_format_show_plan(self, item, recursive=False, indent=4):
-        plan_objects = self._get_plan(item, indent)
-        plan_state = self._get_state(item)
-
-        metrics = {
-            'total': 0,
-            'initial': 0,
-            'running': 0,
-            'success': 0,
-            'failed': 0,
-            'stopped': 0,
-        }
+        return "\n".join(self.iter_show_plan(self._get_plan(item, indent),
+                                             lambda: item))
+
+    def iter_show_plan(self, phases, get_plan_item, phase_metrics=None):
+        """
+        Generate the show_plan output, one block per phase followed by the
+        summary lines, from an iterable of per-phase task lists.
+        get_plan_item is only called once every phase has been consumed and
+        must return the plan item, allowing phases to be streamed.
+        Per-phase task state counts are appended to phase_metrics if given.
+        """
+        if phase_metrics is None:
+            phase_metrics = []
 
         def indent_line(count=1, line='', indent_char=' '):
             return count * indent_char + str(line)
@@ -69,37 +76,141 @@ class CliFormatter(object):
             return '\n'.join([format_status_line(task),
                               format_description(task)])
 
-        plan = []
-        for phase in plan_objects:
-            task_list = []
-            for task in phase:
-                metrics['total'] += 1
-                metrics[task['state'].lower()] += 1
-                if not self._get_option("active_only") or \
-                        'Running' in task['state']:
-                    task_list.append(task)
-            plan.append(task_list)
-
-        out = []
-        for phase_no, phase_tasks in enumerate(plan):
-            if phase_tasks:
-                out.append("Phase %d" % (phase_no + 1))
-                out.append("\tTask status\n\t-----------")
-            for task in phase_tasks:
-                out.append(format_task(task))
+        for phase_no, phase in enumerate(phases):
+            phase_metrics.append(self._get_phase_metrics(phase))
+            phase_tasks = [task for task in phase
+                           if not self._get_option("active_only") or
+                           'Running' in task['state']]
             if phase_tasks:
+                out = ["Phase %d" % (phase_no + 1),
+                       "\tTask status\n\t-----------"]
+                out.extend(format_task(task) for task in phase_tasks)
                 out.append("")
-
-        out.append("Tasks: %(total)s | Initial: %(initial)s"
-                   " | Running: %(running)s | Success: %(success)s"
-                   " | Failed: %(failed)s | Stopped: %(stopped)s" % metrics)
+                yield "\n".join(out)
+
+        metrics = dict((key, sum(phase[key] for phase in phase_metrics))
+                       for key in PLAN_METRICS)
+        yield ("Tasks: %(total)s | Initial: %(initial)s"
+               " | Running: %(running)s | Success: %(success)s"
+               " | Failed: %(failed)s | Stopped: %(stopped)s" % metrics)
+        item = get_plan_item()
+        plan_state = self._get_state(item)
         snapshot = self._deserialize_data(item)
         if snapshot.get('snapshot'):
-            out.append(snapshot['snapshot'])
-        out.append("Plan Status: %s" % plan_state.capitalize())
+            yield snapshot['snapshot']
+        yield "Plan Status: %s" % plan_state.capitalize()
+
+    def iter_plan_phases(self, items, indent=4):
+        """
+        Generate the task list of every phase found in items, e.g. the phase
+        items streamed from a plan's phases collection.
+        """
+        for item in items:
+            for phase in self._get_plan(item, indent):
+                yield phase
+
+    @staticmethod
+    def _get_phase_metrics(phase):
+        metrics = dict.fromkeys(PLAN_METRICS, 0)
+        for task in phase:
+            metrics['total'] += 1
+            metrics[task['state'].lower()] += 1
+        return metrics
+
+    @staticmethod
+    def _format_duration(seconds):
+        minutes, seconds = divmod(int(round(seconds)), 60)
+        hours, minutes = divmod(minutes, 60)
+        if hours:
+            return "%dh%02dm%02ds" % (hours, minutes, seconds)
+        return "%dm%02ds" % (minutes, seconds)
+
+    def cb_format_plan_estimate(self, estimate, plan_state=None):
+        if estimate is None:
+            return ("Throughput: not enough samples yet, run show_plan --eta"
+                    " again to measure progress")
+        out = ["Throughput: %.1f tasks/min over %s | Completed: %d/%d" % (
+            estimate.rate, self._format_duration(estimate.elapsed),
+            estimate.completed, estimate.total)]
+        for phase_no, rate, done, total in estimate.phase_rates:
+            out.append("\tPhase %d: %.1f tasks/min | Completed: %d/%d" % (
+                phase_no, rate, done, total))
+        if estimate.eta is not None:
+            out.append("ETA: %s (%s remaining, %d tasks)" % (
+                strftime("%Y-%m-%d %H:%M:%S", localtime(estimate.eta)),
+                self._format_duration(estimate.remaining * 60 /
+                                      estimate.rate),
+                estimate.remaining))
+        elif plan_state is not None and plan_state != 'running':
+            out.append("ETA: none, plan is not running")
+        else:
+            out.append("ETA: unavailable, no tasks completed since the first"
+                       " sample")
+        return "\n".join(out)
+
+    @staticmethod
+    def _format_timestamp(timestamp):
+        return strftime("%Y-%m-%d %H:%M:%S", localtime(timestamp))
+
+    def cb_format_plan_runs(self, runs):
+        if not runs:
+            return "No plan runs recorded"
+        out = ["%-6s%-21s%-21s%-14s%-8s%s" % (
+            "Run", "First seen", "Last seen", "State", "Tasks", "Observed")]
+        for run in runs:
+            out.append("%-6d%-21s%-21s%-14s%-8d%s" % (
+                run['run'], self._format_timestamp(run['first_seen']),
+                self._format_timestamp(run['last_seen']),
+                run['state'].capitalize(), run['tasks'],
+                self._format_duration(run['last_seen'] - run['first_seen'])))
+        return "\n".join(out)
 
+    def cb_format_plan_history(self, run, phases, slowest_tasks, indent=4):
+        out = ["Run %d: %s" % (run['run'], run['state'].capitalize()),
+               "%sobserved: %s - %s" % (
+                   ' ' * indent, self._format_timestamp(run['first_seen']),
+                   self._format_timestamp(run['last_seen'])),
+               "Phase durations:"]
+        for phase in phases:
+            duration = "incomplete"
+            if phase['duration'] is not None:
+                duration = self._format_duration(phase['duration'])
+            out.append("%sPhase %-6d%-12s%d tasks" % (
+                ' ' * indent, phase['phase'], duration, phase['tasks']))
+        if slowest_tasks:
+            out.append("Slowest tasks:")
+        for task in slowest_tasks:
+            out.append("%s%-12sPhase %-6d%s" % (
+                ' ' * indent, self._format_duration(task['duration']),
+                task['phase'], task['path']))
+            if task['description']:
+                out.append("%s%s" % (' ' * 4 * indent, task['description']))
         return "\n".join(out)
 
+    def cb_format_plan_comparison(self, runs, run_phases, indent=4):
+        def format_duration(duration):
+            if duration is None:
+                return "incomplete"
+            return self._format_duration(duration)
+
+        out = ["%s%-12s%-14s%-14s%s" % (
+            ' ' * indent, "Phase", "Run %d" % runs[0]['run'],
+            "Run %d" % runs[1]['run'], "Change")]
+        durations = [dict((phase['phase'], phase['duration'])
+                          for phase in phases) for phases in run_phases]
+        for phase_no in sorted(set(durations[0]) | set(durations[1])):
+            before = durations[0].get(phase_no)
+            after = durations[1].get(phase_no)
+            change = ""
+            if before is not None and after is not None:
+                change = "%s%s" % ('-' if after < before else '+',
+                                   self._format_duration(abs(after - before)))
+            out.append("%s%-12d%-14s%-14s%s" % (
+                ' ' * indent, phase_no, format_duration(before),
+                format_duration(after), change))
+        return "\n".join(["Phase durations of run %d and run %d:" % (
+            runs[0]['run'], runs[1]['run'])] + out)
+
     def _get_plan(self, item, indent=4):
         formatted_items = []
         self._get_plan_formatted(item, formatted_items, indent)
@@ -254,8 +365,15 @@ class CliFormatter(object):
         ret = "\n".join(ret).rstrip()
         return ret
 
+    def _model_tree(self, data):
+        # Items read whole are formatted as the trees read by show -r
+        tree = ModelTree(self.url)
+        tree.add_tree(data)
+        return tree
+
     def cb_format_show(self, item, recursive=False, indent=4):
-        ret = []
+        if isinstance(item, ModelTree):
+            return self._format_show_node(item, item.root, recursive, indent)
         try:
             data = self._deserialize_data(item)
         except ValueError:
@@ -267,38 +385,31 @@ class CliFormatter(object):
             return self.cb_format_item_type(data)
         if 'property-types' in self_uri:
             return self.cb_format_property_type(data)
-
-        ret.append(data['_links']['self']['href'].replace(self.url, '\n'))
-        if data['_links'].get("reference-to"):
-            ret.append("%slinks to: %s" % (
-                ' ' * indent,
-                data['_links']['reference-to']['href'].replace(self.url, ''))
-            )
-        if data['_links'].get("inherited-from"):
-            ret.append("%sinherited from: %s" % (
-                ' ' * indent,
-                data['_links']['inherited-from']['href'].replace(self.url, ''))
-            )
-
-        if 'item-type-name' in data:
-            ret.append("%stype: %s" % (' ' * indent, data['item-type-name']))
-
-        if 'version' in data:
-            ret.append("%sversion: %s" % (' ' * indent, data['version']))
-
-        if 'state' in data:
+        tree = self._model_tree(data)
+        return self._format_show_node(tree, tree.root, recursive, indent)
+
+    def _format_show_node(self, tree, node, recursive, indent=4):
+        # Items served from another URL keep their absolute URL
+        ret = [node.path if '://' in node.path else '\n' + node.path]
+        if node.reference is not None:
+            ret.append("%slinks to: %s" % (' ' * indent, node.reference))
+        if node.source is not None:
+            ret.append("%sinherited from: %s" % (' ' * indent, node.source))
+        if node.item_type is not None:
+            ret.append("%stype: %s" % (' ' * indent, node.item_type))
+        if node.version is not None:
+            ret.append("%sversion: %s" % (' ' * indent, node.version))
+        if node.state is not None:
             indeterminable = ''
-            if 'applied_properties_determinable' in data \
-                    and not data['applied_properties_determinable']:
+            if not node.determinable:
                 indeterminable = ' (deployment of properties indeterminable)'
-            ret.append("%sstate: %s%s" % \
-                (' ' * indent, data['state'], indeterminable)
-            )
+            ret.append("%sstate: %s%s" % (
+                ' ' * indent, node.state, indeterminable))
 
-        properties = data.get('properties')
+        properties = node.properties
         if properties:
-            if data['_links'].get("inherited-from"):
-                properties_overwritten = data.get('properties-overwritten', [])
+            if node.source is not None:
+                properties_overwritten = node.overwritten or ()
                 ret.append(
                     ('%sproperties (inherited properties are marked '
                      'with asterisk):' % (' ' * indent))
@@ -308,13 +419,7 @@ class CliFormatter(object):
                         format_str = '%s%s: %s'
                     else:
                         format_str = '%s%s: %s [*]'
-                    ret.append(
-                        format_str % (
-                            ' ' * 2 * indent,
-                            key, value
-                        )
-                    )
-
+                    ret.append(format_str % (' ' * 2 * indent, key, value))
             else:
                 ret.append('%sproperties:' % (' ' * indent))
                 ret.append(''.join([
@@ -322,27 +427,25 @@ class CliFormatter(object):
                     for key, value in properties.iteritems()
                 ]))
 
-        children = self._get_children(data)
+        children = tree.children(node)
         if recursive:
             for child in children:
-                ret.append(self.cb_format_show(child,
-                                               recursive=True))
-        else:
-            if children:
-                ret.append('%schildren:' % (' ' * indent))
-                for child in children:
-                    child_url = child['_links']['self']['href'].replace(
-                                    data['_links']['self']['href'], '')
-
-                    if not child_url.startswith("/"):
-                        child_url = "/" + child_url
-                    ret.append(' ' * 2 * indent + child_url)
+                ret.append(self._format_show_node(tree, child, True))
+        elif children:
+            ret.append('%schildren:' % (' ' * indent))
+            for child in children:
+                child_url = child.path
+                if child_url.startswith(node.path):
+                    child_url = child_url[len(node.path):]
+                if not child_url.startswith("/"):
+                    child_url = "/" + child_url
+                ret.append(' ' * 2 * indent + child_url)
 
         if self.args.get('property') is not None:
-            if self.args['property'] in data.get('properties', {}).keys():
-                ret = [str(data['properties'][self.args['property']])]
+            if self.args['property'] in (properties or {}):
+                ret = [str(properties[self.args['property']])]
             else:
-                ret = [data['_links']['self']['href'].replace(self.url, '')]
+                ret = [node.path]
                 ret.append('%s%s%sProperty "%s" is not set' %
                            (' ' * indent, "InvalidPropertyError",
                             ' ' * indent, self.args['property']))
@@ -371,43 +474,51 @@ class CliFormatter(object):
 
     def cb_format_paths_as_tree(self, item, parent=None,
                                 recursive=False, indent=0):
-        ret = []
+        if not isinstance(item, ModelTree):
+            if isinstance(item, basestring):
+                item = json.loads(item)
+            if item.get('id', '') == "item-types" or 'description' in item:
+                return self.cb_format_item_types(item)
+            if isinstance(item, list):
+                return self.cb_format_show(item)
+            item = self._model_tree(item)
+        return self._format_node_as_tree(item, item.root, parent, recursive,
+                                         indent)
+
+    def _format_node_as_tree(self, tree, node, parent, recursive, indent=0):
         if isinstance(parent, basestring):
             if parent == '/':
                 indent = 4
             else:
                 indent += (len(parent.split('/')) - 1) * 4
 
-        if isinstance(item, basestring):
-            item = json.loads(item)
-
-        if item.get('id', '') == "item-types" or 'description' in item:
-            return self.cb_format_item_types(item)
-
-        if isinstance(item, list):
-            return self.cb_format_show(item)
-
-        path = item['_links']['self']['href'].replace(self.url, '')
-        path = path.split(parent, 1)[-1]
-
+        path = node.path.split(parent, 1)[-1]
         if not path.startswith('/'):
             path = '/' + path
 
-        ret.append(' ' * indent + path)
-
-        children = self._get_children(item)
-        for child in children:
+        ret = [' ' * indent + path]
+        for child in tree.children(node):
             if not recursive:
-                ret.append(child['_links']['self']['href'].replace(self.url,
-                                                                   ''))
+                ret.append(child.path)
             else:
-                ret.append(self.cb_format_paths_as_tree(
-                    child, parent=path, recursive=True,
-                    indent=indent))
-
+                ret.append(self._format_node_as_tree(tree, child, path, True,
+                                                     indent))
         return "\n".join(ret)
 
+    @staticmethod
+    def _format_node_paths(tree):
+        # Depth first, as the nodes are not necessarily added in that order
+        ret = []
+        stack = [tree.root]
+        while stack:
+            node = stack.pop()
+            ret.append(node.path)
+            stack.extend(reversed(tree.children(node)))
+        return '\n'.join(ret)
+
     def cb_format_path_list(self, item, parent=None, recursive=False):
+        if isinstance(item, ModelTree):
+            return self._format_node_paths(item)
         ret = []
         if isinstance(item, basestring):
             item = json.loads(item)
@@ -431,6 +542,8 @@ class CliFormatter(object):
         return '\n'.join(ret)
 
     def cb_format_path_completion(self, item, parent=None, recursive=False):
+        if isinstance(item, ModelTree):
+            return self._format_node_paths(item)
         ret = []
         if isinstance(item, basestring):
             item = json.loads(item)
@@ -0,0 +1,179 @@
+"""
+Local SQLite record of plan runs, used by the plan_history action.
+"""
+
+import os
+import sqlite3
+from hashlib import md5
+from time import time
+
+COMPLETED_STATES = ('Success', 'Failed')
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    plan_id TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    state TEXT NOT NULL,
+    tasks INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plan_states (
+    run_id INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    PRIMARY KEY (run_id, state)
+);
+CREATE TABLE IF NOT EXISTS task_states (
+    run_id INTEGER NOT NULL,
+    phase INTEGER NOT NULL,
+    task_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    description TEXT,
+    state TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    PRIMARY KEY (run_id, phase, task_id, state)
+);
+"""
+
+
+class PlanHistory(object):
+    """
+    Records the first time each plan and task state was observed, grouping
+    observations into runs. A new run starts whenever the plan's tasks
+    differ from the latest run, or the plan went back to its initial state,
+    e.g. after remove_plan and create_plan.
+    """
+    def __init__(self, filename):
+        self.filename = os.path.expanduser(filename)
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.filename, timeout=30)
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    @staticmethod
+    def _signature(phases):
+        digest = md5()
+        for phase_no, phase in enumerate(phases):
+            for task_id, _, _, _ in phase:
+                digest.update("%d:%s\n" % (phase_no, task_id))
+        return digest.hexdigest()
+
+    def _find_run(self, plan_id, signature, plan_state, phases):
+        row = self.db.execute(
+            "SELECT id, signature, state FROM runs WHERE plan_id = ?"
+            " ORDER BY id DESC LIMIT 1", (plan_id,)).fetchone()
+        if row is None or row[1] != signature:
+            return None
+        run_id, _, previous_state = row
+        if plan_state == 'initial' and previous_state != 'initial':
+            return None
+        completed = set(task_id for task_id, in self.db.execute(
+            "SELECT task_id FROM task_states WHERE run_id = ?"
+            " AND state IN (?, ?)", (run_id,) + COMPLETED_STATES))
+        for phase in phases:
+            for task_id, _, _, state in phase:
+                if state == 'Initial' and task_id in completed:
+                    return None
+        return run_id
+
+    def record(self, phases, plan_state, plan_id='plan', timestamp=None):
+        """
+        Record one observation of a plan.
+        :param phases: per-phase lists of (task id, path, description, state)
+        :param plan_state: the plan's state property
+        """
+        if timestamp is None:
+            timestamp = time()
+        signature = self._signature(phases)
+        tasks = sum(len(phase) for phase in phases)
+        with self.db:
+            run_id = self._find_run(plan_id, signature, plan_state, phases)
+            if run_id is None:
+                run_id = self.db.execute(
+                    "INSERT INTO runs (plan_id, signature, first_seen,"
+                    " last_seen, state, tasks) VALUES (?, ?, ?, ?, ?, ?)",
+                    (plan_id, signature, timestamp, timestamp, plan_state,
+                     tasks)).lastrowid
+            else:
+                self.db.execute(
+                    "UPDATE runs SET last_seen = ?, state = ? WHERE id = ?",
+                    (timestamp, plan_state, run_id))
+            self.db.execute(
+                "INSERT OR IGNORE INTO plan_states VALUES (?, ?, ?)",
+                (run_id, plan_state, timestamp))
+            self.db.executemany(
+                "INSERT OR IGNORE INTO task_states VALUES"
+                " (?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, phase_no + 1, task_id, path, description, state,
+                  timestamp)
+                 for phase_no, phase in enumerate(phases)
+                 for task_id, path, description, state in phase))
+        return run_id
+
+    def runs(self):
+        cursor = self.db.execute(
+            "SELECT id, plan_id, first_seen, last_seen, state, tasks"
+            " FROM runs ORDER BY id")
+        return [dict(zip(('run', 'plan_id', 'first_seen', 'last_seen',
+                          'state', 'tasks'), row)) for row in cursor]
+
+    def latest_run(self):
+        row = self.db.execute("SELECT MAX(id) FROM runs").fetchone()
+        return row[0]
+
+    def run(self, run_id):
+        for run in self.runs():
+            if run['run'] == run_id:
+                return run
+        return None
+
+    def phase_durations(self, run_id):
+        """
+        Return each phase of a run with the time its first task was seen
+        running and its last task was seen completed.
+        """
+        cursor = self.db.execute(
+            "SELECT phase, COUNT(DISTINCT task_id),"
+            " MIN(CASE WHEN state != 'Initial' THEN first_seen END),"
+            " MAX(CASE WHEN state IN (?, ?) THEN first_seen END),"
+            " COUNT(DISTINCT CASE WHEN state IN (?, ?) THEN task_id END)"
+            " FROM task_states WHERE run_id = ? GROUP BY phase"
+            " ORDER BY phase", COMPLETED_STATES * 2 + (run_id,))
+        phases = []
+        for phase, tasks, started, finished, completed in cursor:
+            duration = None
+            if started is not None and finished is not None and \
+                    completed == tasks:
+                duration = finished - started
+            phases.append({'phase': phase, 'tasks': tasks,
+                           'started': started, 'finished': finished,
+                           'duration': duration})
+        return phases
+
+    def slowest_tasks(self, run_id, limit=10):
+        """
+        Return the tasks of a run that took longest between being seen
+        running and being seen completed.
+        """
+        cursor = self.db.execute(
+            "SELECT phase, path, description, duration FROM ("
+            " SELECT phase, task_id, MAX(path) AS path,"
+            " MAX(description) AS description,"
+            " MAX(CASE WHEN state IN (?, ?) THEN first_seen END) -"
+            " MIN(CASE WHEN state = 'Running' THEN first_seen END)"
+            " AS duration"
+            " FROM task_states WHERE run_id = ? GROUP BY phase, task_id)"
+            " WHERE duration IS NOT NULL ORDER BY duration DESC LIMIT ?",
+            COMPLETED_STATES + (run_id, limit))
+        return [dict(zip(('phase', 'path', 'description', 'duration'), row))
+                for row in cursor]
@@ -0,0 +1,120 @@
+"""
+Incremental JSON parsing of large REST responses.
+"""
+
+import json
+import re
+
+CHUNK_SIZE = 65536
+# Matches any array index in a JsonItemStream prefix
+ANY = None
+
+TOKEN_RE = re.compile(
+    r'\s*(?:("[^"\\]*(?:\\.[^"\\]*)*")|([{}\[\]:,])|([^\s{}\[\]:,"]+))')
+
+
+class JsonItemStream(object):
+    """
+    Parses a JSON document from a file-like object as it is read, yielding
+    each element of the array(s) found at ``prefix`` as soon as the element
+    is complete. Only one element is held in memory at a time.
+
+    Once iteration is exhausted, ``remainder`` holds the rest of the
+    document with the streamed arrays left empty.
+
+    :param fobj: object with a ``read(size)`` method, e.g. an HTTP response
+    :param prefix: sequence of object keys, with ``ANY`` for array indexes,
+        leading from the document root to the arrays to stream
+    """
+    def __init__(self, fobj, prefix, chunk_size=CHUNK_SIZE):
+        self.fobj = fobj
+        self.prefix = tuple(prefix)
+        self.chunk_size = chunk_size
+        self.remainder = None
+        self.bytes_read = 0
+        self._decoder = json.JSONDecoder()
+
+    def _read(self, size=None):
+        chunk = self.fobj.read(size or self.chunk_size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def __iter__(self):
+        buf = ''
+        pos = 0
+        eof = False
+        # Each frame is [container, path, current key, expecting key]
+        stack = []
+        skeleton = []
+        capture = None
+
+        while True:
+            if capture is not None:
+                # Decode at C speed once enough of the element has arrived;
+                # growing the buffer geometrically keeps retries linear
+                try:
+                    element, pos = self._decoder.raw_decode(buf, capture)
+                except ValueError:
+                    if eof:
+                        raise
+                    buf = buf[capture:]
+                    capture = 0
+                    chunk = self._read(max(self.chunk_size, len(buf)))
+                    eof = not chunk
+                    buf += chunk
+                    continue
+                capture = None
+                yield element
+                continue
+
+            match = TOKEN_RE.match(buf, pos)
+            if match is None or (match.group(3) and
+                                 match.end() == len(buf) and not eof):
+                if eof:
+                    if stack or buf[pos:].strip():
+                        raise ValueError("Truncated JSON document")
+                    break
+                buf = buf[pos:]
+                pos = 0
+                chunk = self._read()
+                eof = not chunk
+                buf += chunk
+                continue
+
+            pos = match.end()
+            token = match.group(1) or match.group(2) or match.group(3)
+            frame = stack[-1] if stack else None
+
+            if frame is not None and frame[0] == '[' and \
+                    frame[1] == self.prefix:
+                # Elements of a streamed array never reach the skeleton
+                if token == ']':
+                    skeleton.append(token)
+                    stack.pop()
+                elif token == '{' or token == '[':
+                    capture = match.start(2)
+                elif token != ',':
+                    yield json.loads(token)
+                continue
+
+            skeleton.append(token)
+            if token == '{' or token == '[':
+                if frame is None:
+                    path = ()
+                elif frame[0] == '{':
+                    path = frame[1] + (frame[2],)
+                else:
+                    path = frame[1] + (ANY,)
+                stack.append([token, path, None, token == '{'])
+            elif token == '}' or token == ']':
+                stack.pop()
+            elif frame is None:
+                continue
+            elif token == ':':
+                frame[3] = False
+            elif token == ',':
+                frame[3] = frame[0] == '{'
+            elif frame[3]:
+                frame[2] = json.loads(token)
+
+        self.remainder = json.loads(''.join(skeleton))
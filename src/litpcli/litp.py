@@ -3,15 +3,17 @@ CLI for LITP2.0 REST API.
 """
 
 import argparse
-import base64
 import getpass
 import httplib
 import json
 import os
 import pwd
+import shutil
 import socket
+import sqlite3
 import stat
 import sys
+import tempfile
 import textwrap
 import urlparse
 from ConfigParser import SafeConfigParser, NoOptionError, \
@@ -20,7 +22,6 @@ from gettext import gettext as _
 from hashlib import md5
 from time import time
 import traceback
-import ssl
 
 from litpcli.formatter import CliFormatter
 from litpcli.help import FormattedHelpArgumentParser, \
@@ -28,14 +29,39 @@ from litpcli.help import FormattedHelpArgumentParser, \
 from litpcli.action import TypeAction, FileAction, DepthAction, PathAction, \
     PropertyAction, DeleteAction, valid_create_path, valid_path, valid_depth, \
     validate_opts, UpdateAction, valid_snapshot_name, ExcludeNodesAction, \
-    valid_exclude_nodes, NoLockTasksAction, InitialLockTasksAction
+    valid_exclude_nodes, NoLockTasksAction, InitialLockTasksAction, \
+    valid_timeout, valid_path_template, valid_columns
 from litpcli.group import NestedArgumentsGroup
+from litpcli.connection import UnixSocketConnection, ConnectionPool, \
+    get_ssl_context, basic_auth_headers, \
+    DEFAULT_POOL_SIZE, DEFAULT_IDLE_TIMEOUT
+from litpcli.compression import ACCEPT_ENCODING, GzipWriter
+from litpcli.history import PlanHistory
+from litpcli.metrics import LatencyMetrics, endpoint, COMMAND_METRIC, \
+    REQUEST_METRIC
+from litpcli.jsonstream import JsonItemStream, ANY
+from litpcli.progress import PlanProgress
+from litpcli.retry import Deadline, RetryPolicy, DEFAULT_RETRIES
+from litpcli.download import copy_response, save_response, save_stream, \
+    check_complete, CHUNK_SIZE as DOWNLOAD_CHUNK_SIZE
+from litpcli.timing import Timings
+from litpcli.tracing import Trace, TracedResponse, NULL_TRACE
+from litpcli.profiling import run_profiled
+from litpcli.manifest import ManifestError, load_manifest, plan_operations, \
+    dependencies, subtree_depths, find_item, CREATE, INHERIT, UPDATE, REMOVE
+from litpcli.model import ModelTree, is_model_item, model_node
+from litpcli.rows import RowWriter, FORMATS, DEFAULT_COLUMNS
+from litpcli.xmlsplit import SplitError, item_counts, split_depth, \
+    split_subtrees, subtree_dependencies, stitch_subtrees, can_stitch
+from litpcli.paths import collapse_descendants, expand_glob, has_magic, \
+    model_path, PathTemplate, substitute
+from litpcli.service import DEFAULT_HOST, DEFAULT_PORT, XML_PATH, \
+    REST_URL, UNIX_SOCKET, OK_STATUSES, CREDENTIALS_ERR, LITP_SERVICE_ERR, \
+    LITP_TIMEOUT_ERR, SERVICE_UNAVAILABLE_ERR, INVALID_RESPONSE_ERR, send
+from litpcli.parallel import run_parallel, run_ordered, Skipped, Failed, \
+    RequestProgress, DEFAULT_MAX_PARALLEL
 
 
-DEFAULT_HOST = "localhost"
-DEFAULT_PORT = "9999"
-REST_VERSION = "/litp/rest/v1"
-XML_PATH = "/litp/xml"
 XML_URL = "".join(("https://", DEFAULT_HOST, ":", DEFAULT_PORT, XML_PATH))
 CONFIG_PATH = "/litp/logging"
 UPGRADE_PATH = "/litp/upgrade"
@@ -43,15 +69,13 @@ RESTORE_PATH = "/litp/restore_model"
 SNAPSHOT_PATH = "/snapshots"
 UPGRADE_URL = "".join(
     ("https://", DEFAULT_HOST, ":", DEFAULT_PORT, UPGRADE_PATH))
-REST_URL = "".join(("https://", DEFAULT_HOST, ":", DEFAULT_PORT, REST_VERSION))
 RESTORE_URL = "".join((REST_URL, RESTORE_PATH))
-CREDENTIALS_ERR = "Error 401: Unauthorized access"
 AUTH_ERR = "Authentication Failed. Provide Username and Password:"
 PERMISSION_DENIED_ERR = "Permission denied"
 EXPORT_PLANS_ERR = "Plans cannot be exported"
-LITP_SERVICE_ERR = "litp does not appear to be running/accessible"
-UNIX_SOCKET = '/var/run/litpd/litpd.sock'
 LITPRC_FILENAME = "~/.litprc"
+PLAN_PROGRESS_FILENAME = "~/.litp_plan_progress"
+PLAN_PHASES_PREFIX = ('_embedded', 'item', ANY, '_embedded', 'item')
 HTTPS = 'https'
 UNIX = 'unix'
 
@@ -60,17 +84,6 @@ class AuthenticationException(Exception):
     pass
 
 
-class UnixSocketConnection(httplib.HTTPConnection):
-    def __init__(self, path):
-        self.path = path
-        # '' is a placeholder
-        httplib.HTTPConnection.__init__(self, '')
-
-    def connect(self):
-        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        self.sock.connect(self.path)
-
-
 class SortedChoicesArgumentParser(FormattedHelpArgumentParser):
     def _check_value(self, action, value):
         # Converted value must be one of the choices (if specified)
@@ -85,12 +98,19 @@ class NestedArgumentsEnabledArgumentParser(SortedChoicesArgumentParser):
         super(NestedArgumentsEnabledArgumentParser, self).__init__(
                 *args, **kwargs)
         self._nested_groups = []
+        self._required_any = []
 
     def add_nested_arguments_group(self, *args, **kwargs):
         group = NestedArgumentsGroup(self, *args, **kwargs)
         self._nested_groups.append(group)
         return group
 
+    def require_any(self, *actions):
+        """
+        Require at least one of actions, which may also be given together.
+        """
+        self._required_any.append(actions)
+
     def format_usage(self):
         groups = self._mutually_exclusive_groups + self._nested_groups
         formatter = self._get_formatter()
@@ -135,6 +155,12 @@ class NestedArgumentsEnabledArgumentParser(SortedChoicesArgumentParser):
                     arg_strings, namespace)
         for group in self._nested_groups:
             self.validate_nested_group(group, namespace)
+        for actions in self._required_any:
+            if all(getattr(namespace, action.dest) is None
+                   for action in actions):
+                self.error(_('one of the arguments {0} is required'.format(
+                    ' '.join('/'.join(action.option_strings)
+                             for action in actions))))
         return namespace, extras
 
 
@@ -142,11 +168,29 @@ class LitpCli(object):
     config = None
     conn = None
     conn_type = None
+    deadline = Deadline()
+    request_timeout = None
+    retry_policy = RetryPolicy()
+    trace = NULL_TRACE
+    metrics = None
 
-    def __init__(self):
+    def __init__(self, started=None):
         """
         Create a LitpCli object
+
+        :param started: time at which the litp script started, from which
+            --timing reports the import of the CLI as its first phase; the
+            start-up of the interpreter itself is not covered. Without it
+            the report starts with the construction of the CLI.
+        :type started: float
         """
+        now = time()
+        self.started = now if started is None else started
+        self.import_time = None if started is None else now - started
+        self.timings = Timings(self.started)
+        if self.import_time is not None:
+            self.timings.add('import', self.import_time)
+        started = time()
         self.base_url = REST_URL
         self.xml_url = XML_URL
         self.upgrade_url = UPGRADE_URL
@@ -166,6 +210,22 @@ class LitpCli(object):
                             help="Username to connect to LITP service")
         self.parser.add_argument("-P", "--password", dest="password",
                             help="Password to connect to LITP service")
+        self.parser.add_argument("--timeout", dest="timeout",
+                                 metavar="SECONDS", type=valid_timeout,
+                                 help="Time limit for the whole command,"
+                                      " including retries")
+        self.parser.add_argument("--timing", dest="timing",
+                                 action="store_true",
+                                 help="Print the time spent in each phase of"
+                                      " the command on stderr")
+        self.parser.add_argument("--trace-file", dest="trace_file",
+                                 metavar="FILE",
+                                 help="Write a trace of the command in the"
+                                      " Chrome trace-event format to FILE")
+        self.parser.add_argument("--profile", dest="profile",
+                                 help=argparse.SUPPRESS)
+        self.parser.add_argument("--profile-top", dest="profile_top",
+                                 type=int, help=argparse.SUPPRESS)
 
         subparsers = self.parser.add_subparsers(
             title='Actions',
@@ -174,8 +234,10 @@ class LitpCli(object):
                 " given path. For more information on an action, enter the"
                 " command 'litp <action> -h'."),
             help="",
-            metavar="")
+            metavar="",
+            dest="action")
 
+        self._setup_apply_parser(subparsers)
         self._setup_create_parser(subparsers)
         self._setup_create_plan_parser(subparsers)
         self._setup_create_snapshot_parser(subparsers)
@@ -186,6 +248,8 @@ class LitpCli(object):
         self._setup_import_iso_parser(subparsers)
         self._setup_inherit_parser(subparsers)
         self._setup_load_parser(subparsers)
+        self._setup_metrics_parser(subparsers)
+        self._setup_plan_history_parser(subparsers)
         self._setup_prepare_restore_parser(subparsers)
         self._setup_remove_parser(subparsers)
         self._setup_remove_plan_parser(subparsers)
@@ -199,44 +263,165 @@ class LitpCli(object):
         self._setup_update_parser(subparsers)
         self._setup_upgrade_parser(subparsers)
         self._setup_version_parser(subparsers)
+        self.timings.add('parser build', time() - started)
 
     def _recursive_get(self, item, depth=None, errors=None):
-        if not isinstance(item, list):
-            if '_embedded' in item:
-                fetched_children = []
-                children = item['_embedded'].get('item', [])
-
-                depth_limit = self.get_option('depth')
-                if depth_limit:
-                    if depth is None:
-                        depth = 1
-                    else:
-                        depth += 1
-
-                for child in children:
-
-                    if '_links' in child:
-                        is_unix = self.conn_type == UNIX
-                        headers = self._get_auth_headers(is_unix)
-                        headers.update({"Content-Type": "application/json"})
-                        self.conn.request('GET',
-                                          child['_links']['self']["href"],
-                                          '', headers)
-                        response = self.conn.getresponse()
-                        result = response.read()
-                        new_item = json.loads(result)
-
-                        if response.status != httplib.OK:
-                            if errors is None:
-                                errors = []
-                            errors.append(new_item)
-                        elif depth is None or depth <= depth_limit:
-                            retrieved_item, _ = \
-                                self._recursive_get(new_item, depth, errors)
-                            fetched_children.append(retrieved_item)
-                item['_embedded']['item'] = fetched_children
+        if isinstance(item, list) or '_embedded' not in item:
+            return item, errors
+        with self.trace.span('_recursive_get', 'recursion', depth=depth,
+                             path=item.get('_links', {}).get(
+                                 'self', {}).get('href')):
+            return self._get_children_recursively(item, depth, errors)
+
+    def _get_children_recursively(self, item, depth, errors):
+        fetched_children = []
+        children = item['_embedded'].get('item', [])
+
+        depth_limit = self.get_option('depth')
+        if depth_limit:
+            if depth is None:
+                depth = 1
+            else:
+                depth += 1
+
+        for child in children:
+
+            if '_links' in child:
+                new_item, errors = self._get_child(
+                    child['_links']['self']["href"], errors)
+                if new_item is not None and \
+                        (depth is None or depth <= depth_limit):
+                    retrieved_item, _ = \
+                        self._recursive_get(new_item, depth, errors)
+                    fetched_children.append(retrieved_item)
+        item['_embedded']['item'] = fetched_children
         return item, errors
 
+    def _get_child(self, href, errors):
+        """
+        Return the child item at href and errors, or None and errors with
+        the error reading it added.
+        """
+        response, err = self._execute_request(href, 'GET', None, None)
+        timing = getattr(response, 'timing', None)
+        if err:
+            if errors is None:
+                errors = []
+            error = {'error': err}
+            if err != LITP_TIMEOUT_ERR:
+                error = {'error': "{0}: {1}".format(href, LITP_SERVICE_ERR)}
+            if error not in errors:
+                errors.append(error)
+            return None, errors
+        result = response.read()
+        started = time()
+        try:
+            new_item = json.loads(result)
+            self.timings.add_step('json', time() - started, timing)
+        except ValueError:
+            if response.status == 503:
+                result = SERVICE_UNAVAILABLE_ERR
+            new_item = {'error': "{0}: {1}".format(href, result)}
+
+        if response.status != httplib.OK:
+            if errors is None:
+                errors = []
+            errors.append(new_item)
+            return None, errors
+        return new_item, errors
+
+    def _iter_descendants(self, item, errors, level=1):
+        """
+        Generate the descendants of item down to the depth option, each with
+        its level below item, in the order of litp show -r; each item is read
+        once the previous one has been consumed.
+        """
+        depth_limit = self.get_option('depth')
+        if '_embedded' not in item or (depth_limit and level > depth_limit):
+            return
+        for child in item['_embedded'].get('item', []):
+            if '_links' not in child:
+                continue
+            new_item, _ = self._get_child(child['_links']['self']["href"],
+                                          errors)
+            if new_item is not None:
+                yield new_item, level
+                for descendant in self._iter_descendants(new_item, errors,
+                                                         level + 1):
+                    yield descendant
+
+    def _recursive_get_tree(self, item, errors=None):
+        """
+        Return the item and its descendants as a ModelTree, each item being
+        reduced as soon as it is read, and the errors reading them.
+        """
+        if errors is None:
+            errors = []
+        tree = ModelTree(self.formatter.url)
+        parents = [tree.add(item)]
+        with self.trace.span('_recursive_get', 'recursion',
+                             path=tree.root.path):
+            for descendant, level in self._iter_descendants(item, errors):
+                del parents[level:]
+                parents.append(tree.add(descendant, parents[level - 1]))
+        return tree, errors
+
+    def _print_rows(self, item):
+        """
+        Write a row for the item and, with the recursive option, one for each
+        of its descendants as it is read.
+        """
+        if not is_model_item(item):
+            self._print_err("Format may only be specified for items of the"
+                            " model")
+            return 1
+        writer = RowWriter(sys.stdout, self.get_option('columns') or
+                           DEFAULT_COLUMNS, self.args.format)
+        writer.header()
+        writer.write(model_node(item, self.formatter.url))
+        if self.get_option('recursive'):
+            for descendant, _ in self._iter_descendants(item, self.errors):
+                writer.write(model_node(descendant, self.formatter.url))
+        if self.errors:
+            self._print_err('\n' + '\n'.join(
+                [self.formatter.cb_format_error(err) for err in self.errors]))
+            return 1
+        return 0
+
+    def _setup_apply_parser(self, subparsers):
+        apply_parser = subparsers.add_parser(
+            'apply',
+            formatter_class=RawDescriptionHelpFormatter,
+            help=("Brings the deployment model to the items described in a"
+                  " manifest file."),
+            description=(
+                "Brings the deployment model to the items described in a"
+                " JSON or YAML manifest file, creating, inheriting, updating"
+                " and removing only the items that differ from it."
+                "\n\n"
+                "Items are created after their parent, inherited after"
+                " their source and removed after the items inherited from"
+                " them; other changes are made concurrently, up to"
+                " max_parallel_requests from the ~/.litprc file at a time."),
+            epilog=textwrap.dedent('''\
+                Example manifest:
+
+                {"items": [{"path": "/software/items/vim", "type": "package",
+                            "properties": {"name": "vim-enhanced"}},
+                           {"path": "/ms/items/vim",
+                            "inherit": "/software/items/vim"}],
+                 "remove": ["/software/items/emacs"]}
+
+                Example: litp apply -f site.json'''))
+        apply_parser.set_defaults(func=self.object_apply)
+        required_group = apply_parser.add_argument_group("Required Arguments")
+        required_group.add_argument('-f', '--file', dest="file",
+                                    required="True", action=FileAction,
+                                    help="Manifest file, - for stdin")
+        apply_parser.add_argument('--dry-run', dest="dry_run",
+                                  action="store_true",
+                                  help="List the changes without making them")
+
     def _setup_create_plan_parser(self, subparsers):
         create_parser = subparsers.add_parser(
             "create_plan",
@@ -456,6 +641,82 @@ class LitpCli(object):
             '-a', '--active', dest="active_only",
             action="store_true",
             help='Limit output to active tasks only')
+        show_parser.add_argument(
+            '--eta', dest="eta",
+            action="store_true",
+            help=('Report task throughput and estimated plan completion time'
+                  ' from successive show_plan polls'))
+
+    def _setup_plan_history_parser(self, subparsers):
+        history_parser = subparsers.add_parser(
+            'plan_history',
+            formatter_class=RawDescriptionHelpFormatter,
+            help=("Reports phase durations and the slowest tasks of plan"
+                  " runs recorded in the local plan history."),
+            description=(
+                "Reports phase durations and the slowest tasks of plan runs"
+                " recorded in the local plan history."
+                "\n\n"
+                "Recording is enabled by setting plan_history_file in the"
+                " ~/.litprc file. The plan and task states seen by every"
+                " show_plan and run_plan command are then recorded, and"
+                " kept after the plan is removed."),
+            epilog=textwrap.dedent('''\
+                Examples:
+
+                litp plan_history -l
+
+                litp plan_history -r 3 -t 20
+
+                litp plan_history --compare 2 3'''))
+        history_parser.set_defaults(func=self.object_plan_history)
+        group = history_parser.add_mutually_exclusive_group()
+        group.add_argument('-l', '--list', dest="long",
+                           action="store_true",
+                           help='List the recorded plan runs')
+        group.add_argument('-r', '--run', dest="run", type=int,
+                           help='Run to report on, by default the latest')
+        group.add_argument('--compare', dest="compare", nargs=2, type=int,
+                           metavar="RUN",
+                           help='Compare the phase durations of two runs')
+        history_parser.add_argument('-t', '--top', dest="top", type=int,
+                                    default=10,
+                                    help='Number of slowest tasks to report')
+        history_parser.add_argument('-f', '--file', dest="file",
+                                    help=("Plan history file, by default"
+                                          " plan_history_file from"
+                                          " ~/.litprc"))
+
+    def _setup_metrics_parser(self, subparsers):
+        metrics_parser = subparsers.add_parser(
+            'metrics',
+            formatter_class=RawDescriptionHelpFormatter,
+            help=("Outputs the latency histograms of litp commands in the"
+                  " Prometheus text format."),
+            description=(
+                "Outputs the latency histograms of litp commands and of"
+                " their requests to the LITP service in the Prometheus text"
+                " format, e.g. for the node exporter textfile collector."
+                "\n\n"
+                "Recording is enabled by setting metrics_file in the"
+                " ~/.litprc file. The duration of every command sending"
+                " requests, and the time taken to respond to each request,"
+                " are then recorded by action, endpoint and transport."
+                " Each attempt at a request is recorded, failed ones"
+                " included, with its outcome and whether it is a retry."),
+            epilog=textwrap.dedent('''\
+                Examples:
+
+                litp metrics
+
+                litp metrics -o /var/lib/node_exporter/litp_cli.prom'''))
+        metrics_parser.set_defaults(func=self.object_metrics)
+        metrics_parser.add_argument('-o', '--output', dest="output",
+                                    help=("File to write the metrics to,"
+                                          " replaced atomically"))
+        metrics_parser.add_argument('-f', '--file', dest="file",
+                                    help=("Metrics file, by default"
+                                          " metrics_file from ~/.litprc"))
 
     def _setup_run_plan_parser(self, subparsers):
         run_parser = subparsers.add_parser(
@@ -492,7 +753,19 @@ class LitpCli(object):
             required_group.add_argument('-t', '--type', dest='type',
                                         action=TypeAction, required="True",
                                         help='Type of item to create')
-        if 'path' in args:
+        if 'path' in args and 'match' in args:
+            path_group = required_group.add_mutually_exclusive_group(
+                required=True)
+            path_group.add_argument(
+                '-p', '--path', dest="path",
+                action=PathAction,
+                type=validator,
+                help='Location of item in the LITP model')
+            path_group.add_argument(
+                '--match', dest="match", metavar="PATTERN",
+                help=('Locations of items in the LITP model, as a path whose'
+                      ' elements may hold shell wildcards'))
+        elif 'path' in args:
             required_group.add_argument(
                 '-p', '--path', dest="path", required="True",
                 action=PathAction,
@@ -589,14 +862,25 @@ class LitpCli(object):
             'create',
             help=("Adds a new instance of the specified item to the"
                   " deployment model."),
+            formatter_class=RawDescriptionHelpFormatter,
             description=("Adds a new instance of the specified item to the"
-                         " deployment model."),
-            epilog=("Example: litp create -t node "
-                "-p /deployments/deployment1/clusters/cluster1/nodes/n1 "
-                "-o hostname=node1"))
+                         " deployment model."
+                         "\n\n"
+                         "A path with brace expressions, {1..10} ranges or"
+                         " {a,b} lists, adds an item for each path it expands"
+                         " to, concurrently, up to max_parallel_requests from"
+                         " the ~/.litprc file at a time. In properties, {}"
+                         " stands for the value of the first expression and"
+                         " {N} for that of the expression at index N."),
+            epilog=("Example: litp create -t node -p"
+                    " /deployments/deployment1/clusters/cluster1/nodes/n1"
+                    " -o hostname=node1\n"
+                    "Example: litp create -t node -p"
+                    " '/deployments/deployment1/clusters/cluster1"
+                    "/nodes/n{1..200}' -o hostname='node{}'"))
 
         self._setup_required_group(create_parser, ['type', 'path'],
-                                   valid_path)
+                                   valid_path_template)
         create_parser.set_defaults(func=self.object_create)
         create_parser.add_argument(
             '-o', '--options', dest='properties', action="append",
@@ -639,6 +923,10 @@ class LitpCli(object):
         group.add_argument('-o', '--options', dest='property',
                                  action=PropertyAction,
                                  help='Specific property to display')
+        group.add_argument(
+            '--format', dest="format", choices=FORMATS,
+            help=("Output one row per item, as it is read, with the"
+                  " columns of --columns"))
         show_parser.add_argument('-j', '--json', dest="raw",
                                  action="store_true",
                                  help='Output raw JSON response from server')
@@ -650,20 +938,38 @@ class LitpCli(object):
             '-n', '--depth', dest="depth",
             action=DepthAction,
             type=valid_depth, help='Limit the depth of recursion')
+        show_parser.add_argument(
+            '--columns', dest="columns", type=valid_columns,
+            help=("Comma separated columns of --format, among path, id,"
+                  " type, state, source, reference and properties.NAME;"
+                  " path,type,state by default"))
 
     def _setup_update_parser(self, subparsers):
         update_parser = subparsers.add_parser(
             'update',
             help="Updates the properties of an item.",
-            description=("Updates the properties of an item."),
-            epilog=("Example: litp update -p /infrastructure/networking"
-                    "/networks/mgmt -o name=new_network"))
+            formatter_class=RawDescriptionHelpFormatter,
+            description=("Updates the properties of an item."
+                         "\n\n"
+                         "With --match, every item matching the pattern is"
+                         " updated concurrently, up to max_parallel_requests"
+                         " from the ~/.litprc file at a time."),
+            epilog=("Example: litp update -p"
+                    " /infrastructure/networking/networks/mgmt"
+                    " -o name=new_network\n"
+                    "Example: litp update --match"
+                    " '/deployments/*/clusters/*/nodes/*/items/ntp'"
+                    " -o server=ntp1"))
 
         update_parser.set_defaults(func=self.object_update)
 
         self._setup_required_group(update_parser,
-                                   ['path', 'options', 'delete'],
+                                   ['path', 'match', 'options', 'delete'],
                                    valid_path)
+        update_parser.add_argument('--progress', dest="progress",
+                                   action="store_true",
+                                   help=("Report the progress of the updates"
+                                         " of --match on stderr"))
         update_parser.add_argument('-j', '--json', dest="raw",
                                    action="store_true",
                                    help='Output raw JSON response from server')
@@ -673,17 +979,30 @@ class LitpCli(object):
             'remove',
             help=("Removes the specified item and its children from the"
                   " deployment model."),
+            formatter_class=RawDescriptionHelpFormatter,
             description=("Removes the specified item and its children from the"
-                         " deployment model."),
-            epilog=("Example: litp remove -p "
-                    "/deployments/deployment1/clusters/cluster1"))
-        required_group = delete_parser.add_argument_group("Required Arguments")
+                         " deployment model."
+                         "\n\n"
+                         "Several items are removed concurrently, up to"
+                         " max_parallel_requests from the ~/.litprc file at a"
+                         " time; items below another removed item need no"
+                         " request of their own."),
+            epilog=("Example: litp remove -p"
+                    " /deployments/deployment1/clusters/cluster1\n"
+                    "Example: litp remove -p /software/items/vim"
+                    " -p /software/items/emacs\n"
+                    "Example: litp remove --from-file services.txt"))
         delete_parser.set_defaults(func=self.object_remove)
-        required_group.add_argument(
-            '-p', '--path', dest="path", type=valid_path,
-            action=PathAction,
-            required="True",
-            help=self.path_help)
+        # At least one of -p and --from-file, which may be combined
+        path_group = delete_parser.add_argument_group("Path Arguments")
+        delete_parser.require_any(
+            path_group.add_argument(
+                '-p', '--path', dest="paths", metavar="PATH",
+                type=valid_path, action="append",
+                help="Location of item in the LITP model, may be repeated"),
+            path_group.add_argument(
+                '--from-file', dest="from_file", metavar="FILE",
+                help="File of paths to remove, one per line, - for stdin"))
         delete_parser.add_argument(
             '-j', '--json', dest="raw", action="store_true",
             help='Output raw JSON response from server')
@@ -693,21 +1012,39 @@ class LitpCli(object):
             'inherit',
             help=("Creates a new path in the deployment model which inherits"
                   " property values from the source path."),
+            formatter_class=RawDescriptionHelpFormatter,
             description=("Creates a new path in the deployment model which"
-                         " inherits property values from the source path."),
-            epilog=("Example: litp inherit -p /deployments/deployment1/"
-                    "clusters/cluster1/nodes/node1/storage_profile -s"
-                    " /infrastructure/storage/storage_profiles/profile1")
+                         " inherits property values from the source path."
+                         "\n\n"
+                         "With --to, the source is inherited to many paths"
+                         " concurrently, up to max_parallel_requests from the"
+                         " ~/.litprc file at a time."),
+            epilog=("Example: litp inherit -p /deployments/deployment1"
+                    "/clusters/cluster1/nodes/node1/storage_profile -s"
+                    " /infrastructure/storage/storage_profiles/profile1\n"
+                    "Example: litp inherit --to"
+                    " '/deployments/*/clusters/*/nodes/*/items/vim'"
+                    " -s /software/items/vim\n"
+                    "Example: litp inherit --to nodes.txt"
+                    " -s /software/items/vim")
         )
         inherit_parser.set_defaults(func=self.object_inherit)
         required_group = inherit_parser.add_argument_group(
             "Required Arguments"
         )
-        required_group.add_argument(
-            '-p', '--path', dest='path', required="True",
+        target_group = required_group.add_mutually_exclusive_group(
+            required=True)
+        target_group.add_argument(
+            '-p', '--path', dest='path',
             action=PathAction, type=valid_create_path,
             help="Location of inherit path in the LITP model"
         )
+        target_group.add_argument(
+            '--to', dest='targets', metavar='TARGETS',
+            help=("Locations of the inherit paths: a path whose elements"
+                  " but the last may hold shell wildcards, or a file of"
+                  " such paths, one per line, - for stdin")
+        )
         required_group.add_argument(
             '-s', '--source-path', dest='source_path', required="True",
             type=valid_create_path,
@@ -753,6 +1090,20 @@ class LitpCli(object):
                                  " the specified XML file, removing items"
                                  " not present in the file"))
 
+        load_parser.add_argument('--parallel', dest="parallel",
+                                 action="store_true",
+                                 help=("Merge the XML file into the"
+                                       " deployment model as subtrees loaded"
+                                       " concurrently, up to"
+                                       " max_parallel_requests at a time"))
+        load_parser.add_argument('--compress', dest="compress",
+                                 action="store_true",
+                                 help=("Compress the XML file with gzip for"
+                                       " upload"))
+        load_parser.add_argument('--progress', dest="progress",
+                                 action="store_true",
+                                 help=("Report upload progress and throughput"
+                                       " on stderr"))
         load_parser.add_argument('-j', '--json', dest="raw",
                                  action="store_true",
                                  help='Output raw JSON response from server')
@@ -773,6 +1124,17 @@ class LitpCli(object):
         export_parser.add_argument('-f', '--file', dest="file",
                                    action=FileAction,
                                    help="XML file to which to export")
+        export_parser.add_argument('--compress', dest="compress",
+                                   action="store_true",
+                                   help="Compress the exported XML with gzip")
+        export_parser.add_argument('--parallel', dest="parallel",
+                                   action="store_true",
+                                   help=("Export the children of the item"
+                                         " concurrently, up to"
+                                         " max_parallel_requests at a time,"
+                                         " into the file; not for"
+                                         " collections, inherited items or"
+                                         " items with properties"))
 
     def _setup_debug_parser(self, subparsers):
         '''deprecated - use litp update -p /litp/logging\
@@ -817,8 +1179,8 @@ class LitpCli(object):
                                     action="store_true",
                                     help="Display installed LITP packages")
 
-    def _get_unix_socket_path(self):
-        unix_socket_path = None
+    def _get_litprc_option(self, option):
+        value = None
         filename = os.path.expanduser(LITPRC_FILENAME)
         parser = SafeConfigParser()
         try:
@@ -827,13 +1189,27 @@ class LitpCli(object):
             pass
         else:
             for section in parser.sections():
-                if unix_socket_path is None:
+                if value is None:
                     try:
-                        unix_socket_path = parser.get(section,
-                                                      'unix_socket_path')
+                        value = parser.get(section, option)
                     except NoOptionError:
                         pass
-        return unix_socket_path or UNIX_SOCKET
+        return value
+
+    def _get_unix_socket_path(self):
+        return self._get_litprc_option('unix_socket_path') or UNIX_SOCKET
+
+    def _get_plan_history(self):
+        filename = self._get_litprc_option('plan_history_file')
+        if filename:
+            return PlanHistory(filename)
+        return None
+
+    def _get_metrics(self):
+        filename = self._get_litprc_option('metrics_file')
+        if filename:
+            return LatencyMetrics(filename)
+        return None
 
     def _get_connection(self):
         if self.args.username is not None and self.args.password is not None:
@@ -859,14 +1235,110 @@ class LitpCli(object):
         :param args: list of arguments, typically the contents of sys.argv
         :type args: list
         """
-        self.args = self.parser.parse_args(args)
-        self.conn = self._get_connection()
+        self.args = self.timings.timed('parse_args',
+                                       self.parser.parse_args)(args)
+        started = time()
+        self.timings.enabled = bool(getattr(self.args, 'timing', False) or
+                                    os.environ.get('LITP_CLI_TIMING'))
+        trace_file = getattr(self.args, 'trace_file', None)
+        if trace_file:
+            self.trace = Trace(self.started)
+            if self.import_time is not None:
+                self.trace.add('import', 'cli', self.started,
+                               self.import_time)
+        self.deadline = Deadline(getattr(self.args, 'timeout', None))
+        self.conn = self.timings.timed('connection setup',
+                                       self._get_connection_pool)()
 
         if getattr(self.args, 'path', None) is not None:
             if self.args.path.endswith('/') and len(self.args.path) > 1:
                 self.args.path = self.args.path[0:-1]
         self.formatter = CliFormatter(self.base_url, self.args.__dict__)
-        return self.args.func()
+        self.metrics = self._get_metrics()
+        self.latency_samples = []
+        try:
+            with self.trace.span('run_command', 'cli',
+                                 action=self.args.func.__name__):
+                return self._run_action()
+        finally:
+            if self.timings.enabled:
+                self._print_err(self.timings.report())
+            if trace_file:
+                self._write_trace(trace_file)
+            if self.metrics is not None and self.latency_samples:
+                self.latency_samples.append((COMMAND_METRIC, [
+                    ('action', self.args.action),
+                    ('transport', self.conn_type)], time() - started))
+                self._record_metrics()
+
+    def _run_action(self):
+        """
+        Run the action, under the profiler if a stats file is given with
+        --profile or LITP_CLI_PROFILE; --profile-top or
+        LITP_CLI_PROFILE_TOP also prints the top N functions by
+        cumulative time.
+        """
+        filename = getattr(self.args, 'profile', None) or \
+            os.environ.get('LITP_CLI_PROFILE')
+        if not filename:
+            return self.args.func()
+        top = getattr(self.args, 'profile_top', None)
+        if top is None:
+            try:
+                top = int(os.environ.get('LITP_CLI_PROFILE_TOP', 0))
+            except ValueError:
+                top = None
+        return run_profiled(self.args.func, filename, top, self._print_err)
+
+    def _record_metrics(self):
+        try:
+            self.metrics.record(self.latency_samples)
+        except sqlite3.Error as ex:
+            self._print_err("Unable to record metrics: %s" % ex)
+        finally:
+            self.metrics.close()
+
+    def _write_trace(self, filename):
+        try:
+            self.trace.write(filename)
+        except (IOError, OSError) as e:
+            self._print_err("Cannot write trace file {0}: {1}".format(
+                filename, e.strerror))
+
+    def _get_connection_pool(self):
+        """
+        Pool of connections to the LITP service, sized by the
+        connection_pool_size and connection_idle_timeout options of the
+        litprc file. Each request is limited by the request_timeout option
+        and by the time left before the --timeout deadline, and GET
+        requests are retried up to request_retries times.
+        """
+        try:
+            size = int(self._get_litprc_option('connection_pool_size') or
+                       DEFAULT_POOL_SIZE)
+            idle_timeout = float(
+                self._get_litprc_option('connection_idle_timeout') or
+                DEFAULT_IDLE_TIMEOUT)
+        except ValueError:
+            size, idle_timeout = DEFAULT_POOL_SIZE, DEFAULT_IDLE_TIMEOUT
+        try:
+            request_timeout = self._get_litprc_option('request_timeout')
+            self.request_timeout = float(request_timeout) \
+                if request_timeout else None
+            self.retry_policy = RetryPolicy(int(
+                self._get_litprc_option('request_retries') or
+                DEFAULT_RETRIES))
+        except ValueError:
+            self.request_timeout, self.retry_policy = None, RetryPolicy()
+        factory = self._get_connection
+        if self.timings.enabled:
+            factory = self.timings.timed_connections(factory, 'connect')
+        return ConnectionPool(factory, size, idle_timeout,
+                              connection=factory(),
+                              timeout=self._get_request_timeout)
+
+    def _get_request_timeout(self):
+        return self.deadline.limit(self.request_timeout)
 
     def _create_http_connection(self, host):
         return httplib.HTTPConnection(host)
@@ -885,8 +1357,7 @@ class LitpCli(object):
         return conn
 
     def _create_https_connection(self, host):
-        conn = httplib.HTTPSConnection(host,
-                                   context=ssl._create_unverified_context())
+        conn = httplib.HTTPSConnection(host, context=get_ssl_context())
         return conn
 
     def wrapped_run_command(self, args):
@@ -928,12 +1399,10 @@ class LitpCli(object):
 
             self.set_option("username", username)
             self.set_option("password", password)
-        val = base64.encodestring(
-            "{0}:{1}".format(username, password)).replace('\n', '')
-        return {"Authorization": "Basic {0}".format(val)}
+        return basic_auth_headers(username, password)
 
     def _request(self, url, method=None, data=None, format_func=None,
-                 content_type=None):
+                 content_type=None, stream=False, compress=False):
         base_url = REST_URL
         if XML_URL in url:
             base_url = XML_URL
@@ -949,7 +1418,227 @@ class LitpCli(object):
             method = 'GET'
 
         return self._process_request(
-            url, method, data, format_func, content_type)
+            url, method, data, format_func, content_type, stream, compress)
+
+    def _get_max_parallel(self):
+        try:
+            return max(1, int(self._get_litprc_option('max_parallel_requests')
+                              or DEFAULT_MAX_PARALLEL))
+        except ValueError:
+            return DEFAULT_MAX_PARALLEL
+
+    def _prepare_parallel_requests(self):
+        """
+        Prepare for requests sent by several threads and return how many
+        may be sent at a time: credentials are resolved, possibly from a
+        prompt, before any thread needs them, and the pool keeps enough
+        idle connections for every thread.
+        """
+        self.formatter.url = REST_URL
+        self._get_auth_headers(self.conn_type == UNIX)
+        max_parallel = self._get_max_parallel()
+        self.conn.size = max(self.conn.size, max_parallel)
+        return max_parallel
+
+    def _send(self, url, method='GET', data=None, content_type=None,
+              compress=False):
+        """
+        Send a request and return its status and body; the status is None
+        and the body an error message if no response was received.
+        """
+        response, err = self._execute_request(url, method, data,
+                                              content_type, compress)
+        if err:
+            return self._send_error(err)
+        try:
+            return response.status, response.read()
+        except socket.timeout:
+            return None, LITP_TIMEOUT_ERR
+        except socket.error:
+            return None, LITP_SERVICE_ERR
+        except httplib.HTTPException:
+            return None, INVALID_RESPONSE_ERR
+
+    def _get_items(self, paths, max_parallel, depths=None):
+        """
+        Read the items at paths concurrently and return them by path, None
+        for those not found, with the results of _send by path. The paths
+        whose read failed are left out, and the results of those read with
+        an invalid body are replaced by an error.
+
+        :param depths: levels of descendants embedded in each item by path
+        """
+        def get(path):
+            url = self.base_url + path
+            if depths and depths[path]:
+                url += "?recurse_depth={0}".format(depths[path])
+            return self._send(url)
+        results = run_parallel(paths, get, max_parallel)
+        items = {}
+        for path in paths:
+            if isinstance(results[path], (Skipped, Failed)):
+                continue
+            status, body = results[path]
+            if status == httplib.NOT_FOUND:
+                items[path] = None
+            elif status == httplib.OK:
+                try:
+                    items[path] = json.loads(body)
+                except ValueError:
+                    results[path] = None, INVALID_RESPONSE_ERR
+        return items, results
+
+    @staticmethod
+    def _send_error(err):
+        if err == LITP_TIMEOUT_ERR:
+            return None, LITP_TIMEOUT_ERR
+        return None, LITP_SERVICE_ERR
+
+    def _format_failure(self, result):
+        """
+        Return the error message of a request result of _send, of a Failed
+        result or of a Skipped one.
+        """
+        if isinstance(result, Skipped):
+            return "    Not attempted as {0} failed".format(result.dependency)
+        if isinstance(result, Failed):
+            return ''.join(traceback.format_exception(*result.exc_info))
+        status, body = result
+        if status is None:
+            return body
+        if status == 401:
+            return CREDENTIALS_ERR
+        try:
+            json.loads(body)
+        except ValueError:
+            if status == 503:
+                return SERVICE_UNAVAILABLE_ERR
+            return body
+        return self.formatter.cb_format_error(body)
+
+    @staticmethod
+    def _failed(result):
+        return isinstance(result, (Skipped, Failed)) or \
+            result[0] not in OK_STATUSES
+
+    def _print_failures(self, keys, results, describe=str):
+        """
+        Print the error of each failed result, in the order of keys, and
+        return the number of failures.
+        """
+        failures = 0
+        for key in keys:
+            if self._failed(results[key]):
+                failures += 1
+                self._print_err("Failed to {0}:\n{1}".format(
+                    describe(key), self._format_failure(results[key])))
+        return failures
+
+    def _send_all(self, paths, send, max_parallel, verb, done,
+                  depends_on=None):
+        """
+        Call send concurrently for each of paths, each after the paths it
+        depends on, then print the responses with -j, or the failures and
+        a summary such as "12 removed".
+        """
+        on_result = None
+        if self.get_option('progress'):
+            progress = RequestProgress(len(paths), "requests",
+                                       self._print_err, self._failed)
+            on_result = progress.update
+        results = run_ordered(paths, send, depends_on, max_parallel,
+                              self._failed, on_result)
+        if on_result is not None:
+            progress.finish()
+        if self.get_option('raw'):
+            return self._print_raw_results(paths, results)
+        failures = self._print_failures(
+            paths, results, lambda path: "{0} {1}".format(verb, path))
+        self._print_out("{0} {1}{2}".format(
+            len(paths) - failures, done,
+            ", {0} failed".format(failures) if failures else ""))
+        return 1 if failures else 0
+
+    def _print_raw_results(self, keys, results):
+        """
+        Print the JSON responses of the successful requests by key, and
+        those of the failed ones, or their error messages, on stderr.
+        """
+        succeeded = {}
+        failed = {}
+        for key in keys:
+            result = results[key]
+            if self._failed(result):
+                try:
+                    failed[key] = json.loads(result[1])
+                except (TypeError, ValueError):
+                    failed[key] = self._format_failure(result)
+            else:
+                succeeded[key] = json.loads(result[1])
+        self._print_out(json.dumps(succeeded, indent=4))
+        if failed:
+            self._print_err(json.dumps(failed, indent=4))
+            return 1
+        return 0
+
+    def _read_input(self, filename):
+        if filename == '-':
+            return sys.stdin.read()
+        with open(filename) as fobj:
+            return fobj.read()
+
+    def _read_patterns(self, filename):
+        """
+        Return the lines of a file listing one path or pattern per line;
+        blank lines and lines starting with # are ignored.
+        """
+        patterns = []
+        for line in self._read_input(filename).splitlines():
+            line = line.strip()
+            if line and not line.startswith('#'):
+                patterns.append(line)
+        return patterns
+
+    def _expand_patterns(self, patterns, max_parallel):
+        """
+        Return the paths of the items matching patterns, in order and
+        without duplicates, listing the items at each level of the
+        wildcards concurrently; None once listing errors are printed.
+        """
+        failures = []
+
+        def list_children(paths):
+            items, results = self._get_items(paths, max_parallel)
+            children = dict((path, None) for path in paths)
+            for path in paths:
+                if path not in items:
+                    failures.append(path)
+                elif items[path] is not None:
+                    children[path] = [
+                        child['id'] for child in
+                        items[path].get('_embedded', {}).get('item', [])]
+            self._print_failures(
+                [path for path in paths if path in failures], results,
+                "list {0}".format)
+            return children
+
+        paths = []
+        seen = set()
+        for pattern in patterns:
+            for path in expand_glob(pattern, list_children):
+                if path not in seen:
+                    seen.add(path)
+                    paths.append(path)
+            if failures:
+                return None
+        return paths
+
+    def _read_paths(self, filename):
+        """
+        Return the validated paths of a file listing one path per line;
+        blank lines and lines starting with # are ignored.
+        """
+        return [valid_path(path) for path in self._read_patterns(filename)]
 
     def get_readable_traceback(self):
         """
@@ -957,23 +1646,40 @@ class LitpCli(object):
         """
         return '\n'.join(traceback.format_exception(*(sys.exc_info())))
 
-    def _execute_request(self, url, method, data, content_type):
+    def _execute_request(self, url, method, data, content_type,
+                         compress=False):
         is_unix = self.conn_type == UNIX
-        headers = self._get_auth_headers(is_unix)
-        if content_type is None:
-            content_type = "application/json"
-        headers.update({"Content-Type": content_type})
-        body = None
-        if method in ('POST', 'PUT'):
-            if isinstance(data, str):
-                body = data
-            else:
-                body = json.dumps(data)
-            headers.update({'Content-Length': len(body)})
+        headers = self.timings.timed('auth', self._get_auth_headers)(is_unix)
+        if not is_unix:
+            # Compression only pays off over the network
+            headers.update({"Accept-Encoding": ACCEPT_ENCODING})
+        write_progress = None
+        if self.get_option('progress'):
+            write_progress = self._print_err
+        timing = self.timings.start_request(method, url)
+        span = self.trace.span("{0} {1}".format(
+            method, urlparse.urlparse(url).path), 'request', url=url)
+        observe = None
+        if self.metrics is not None:
+            observe = self._request_observer(method, url)
+
+        def wrap(response):
+            span.args['status'] = response.status
+            if self.trace is not NULL_TRACE:
+                # The bytes of the body are added to the span as it is read
+                response = TracedResponse(response, span)
+            if timing is not None:
+                response = timing.response(response)
+            return response
         try:
             err = ''
-            self.conn.request(method, url, body, headers)
-            result = self.conn.getresponse()
+            with span:
+                result = send(
+                    self.conn, method, url, data, headers, self.retry_policy,
+                    self.deadline, content_type, compress, write_progress,
+                    observe, wrap)
+        except socket.timeout:
+            result, err = None, LITP_TIMEOUT_ERR
         except socket.error:
             result, err = None, self.get_readable_traceback()
         except socket.gaierror:
@@ -982,21 +1688,73 @@ class LitpCli(object):
             result, err = None, self.get_readable_traceback()
         return result, err
 
-    def _process_request(self, url, method, data, format_func, content_type):
-        response, err = self._execute_request(url, method, data, content_type)
+    def _request_observer(self, method, url):
+        """
+        Return a callable recording the latency of each attempt at a
+        request, failed ones included, labelled with its outcome and with
+        whether it is a retry.
+        """
+        labels = [('method', method), ('endpoint', endpoint(url)),
+                  ('transport', self.conn_type)]
+
+        def observe(outcome, seconds, attempt):
+            self.latency_samples.append((REQUEST_METRIC, labels + [
+                ('outcome', outcome),
+                ('retry', 'true' if attempt else 'false')], seconds))
+        return observe
+
+    def _process_request(self, url, method, data, format_func, content_type,
+                         stream=False, compress=False):
+        response, err = self._execute_request(url, method, data, content_type,
+                                              compress)
         if err:
-            self._print_err(LITP_SERVICE_ERR)
+            if err == LITP_TIMEOUT_ERR:
+                self._print_err(LITP_TIMEOUT_ERR)
+            else:
+                self._print_err(LITP_SERVICE_ERR)
             return 1
-        result = response.read()
         self.errors = []
+        timing = getattr(response, 'timing', None)
+        self.timings.current = timing
+        try:
+            if stream and response.status in (200, 201, 202, 205):
+                # format_func consumes the response body incrementally
+                started = time()
+                try:
+                    with self.trace.span(format_func.__name__, 'format'):
+                        return format_func(response)
+                finally:
+                    if timing is not None:
+                        self.timings.add_step(
+                            'format', time() - started - timing.transfer)
+            result = response.read()
+        except socket.timeout:
+            self._print_err(LITP_TIMEOUT_ERR)
+            return 1
+        except socket.error:
+            self._print_err(LITP_SERVICE_ERR)
+            return 1
+        except (ValueError, httplib.HTTPException):
+            # A truncated or malformed body, possibly after part of a
+            # streamed output was printed
+            self._print_err(INVALID_RESPONSE_ERR)
+            return 1
         if response.status not in (200, 201, 202, 205):
-            self._print_request_error_msg(result, response.status)
+            self._print_request_error_msg(result, response.status, url)
             retcode = 1
         else:
             retcode = self._print_request_ok_msg(result, format_func)
         return retcode
 
-    def _print_request_error_msg(self, result, response_status):
+    def _print_request_error_msg(self, result, response_status, url):
+        if response_status == 503:
+            try:
+                json.loads(result)
+            except ValueError:
+                # Not from litpd, e.g. an overloaded proxy in front of it
+                self.errors.append(SERVICE_UNAVAILABLE_ERR)
+                self._print_err(SERVICE_UNAVAILABLE_ERR)
+                return
         if response_status == 401:
             result = CREDENTIALS_ERR
         if self.get_option('raw'):
@@ -1006,26 +1764,52 @@ class LitpCli(object):
             self.errors.append(CREDENTIALS_ERR)
             self._print_err(self.errors[0])
         else:
-            errstr = self.formatter.cb_format_error(result)
+            with self.trace.span('cb_format_error', 'format'):
+                errstr = self.formatter.cb_format_error(result)
             self.errors.append(errstr)
             if len(errstr) < 1:
-                errstr = "Item " + self.args.path + " not found"
+                errstr = "Item " + self._item_path(url) + " not found"
             self._print_err(errstr)
 
+    @staticmethod
+    def _item_path(url):
+        """
+        Return the path of the item at a REST or XML URL.
+        """
+        path = urlparse.urlparse(url).path
+        if path.startswith(XML_PATH):
+            return path[len(XML_PATH):] or '/'
+        return model_path(url)
+
     def _print_request_ok_msg(self, result, format_func):
         retcode = 0
+        if self.get_option('format'):
+            return self._print_rows(json.loads(result))
         if self.get_option('recursive'):
-            item, self.errors = self._recursive_get(
-                json.loads(result), errors=self.errors)
-            result = json.dumps(item, indent=4)
+            started = time()
+            item = json.loads(result)
+            self.timings.add_step('json', time() - started)
+            if not self.get_option('raw') and is_model_item(item):
+                # The formatters read the compact tree directly
+                result, self.errors = self._recursive_get_tree(
+                    item, errors=self.errors)
+            else:
+                item, self.errors = self._recursive_get(item,
+                                                        errors=self.errors)
+                started = time()
+                result = json.dumps(item, indent=4)
+                self.timings.add_step('json', time() - started)
         if self.get_option('raw'):
             self._print_out(json.dumps(json.loads(result), indent=4))
             if self.errors:
                 self._print_err(json.dumps(self.errors, indent=4))
                 retcode = 1
         else:
-            formatted_output = format_func(
-                result, recursive=self.get_option('recursive'))
+            started = time()
+            with self.trace.span(format_func.__name__, 'format'):
+                formatted_output = format_func(
+                    result, recursive=self.get_option('recursive'))
+            self.timings.add_step('format', time() - started)
             retcode = 0
             if formatted_output:
                 if "InvalidPropertyError" in formatted_output:
@@ -1056,6 +1840,13 @@ class LitpCli(object):
             setattr(self.args, option, value)
 
     def object_show(self):
+        if self.get_option('columns') and not self.get_option('format'):
+            self._print_err("Columns may not be specified without format"
+                            " option")
+            return 1
+        if self.get_option('format') and self.get_option('raw'):
+            self._print_err("Format may not be specified with json option")
+            return 1
         format_func = self.formatter.cb_format_show
         if self.get_option('long'):
             format_func = self.formatter.cb_format_path_list
@@ -1097,6 +1888,60 @@ class LitpCli(object):
                     if v is not None else (k.strip().rstrip(','), None)
                     for k, v in data.items())
 
+    def object_apply(self):
+        try:
+            items, removals = load_manifest(self._read_input(self.args.file),
+                                            self.args.file)
+        except (IOError, ManifestError) as e:
+            self._print_err(str(e))
+            return 1
+        max_parallel = self._prepare_parallel_requests()
+        # The current state of every item of the manifest, read with one
+        # request per subtree of the model holding them
+        paths = [item.path for item in items] + removals
+        depths = subtree_depths(paths)
+        tops = [path for path in paths if path in depths]
+        subtrees, fetched = self._get_items(tops, max_parallel, depths)
+        if self._print_failures(
+                [path for path in tops if path not in subtrees], fetched,
+                "read {0}".format):
+            return 1
+        current = dict((path, find_item(subtrees, path)) for path in paths)
+
+        operations, conflicts = plan_operations(items, removals, current)
+        for conflict in conflicts:
+            self._print_err(conflict)
+        if conflicts:
+            return 1
+        if self.get_option('dry_run'):
+            for operation in operations:
+                self._print_out(operation.describe())
+            return 0
+
+        by_path = dict((operation.path, operation)
+                       for operation in operations)
+
+        def apply_operation(path):
+            method, path, data = by_path[path].request()
+            return self._send(self.base_url + path, method, data)
+        keys = [operation.path for operation in operations]
+        results = run_ordered(keys, apply_operation, dependencies(operations),
+                              max_parallel, failed=self._failed)
+        failures = self._print_failures(
+            keys, results, lambda path: by_path[path].describe())
+        counts = dict((kind, 0) for kind in (CREATE, INHERIT, UPDATE, REMOVE))
+        for operation in operations:
+            if not self._failed(results[operation.path]):
+                counts[operation.kind] += 1
+        self._print_out(
+            "{0} created, {1} inherited, {2} updated, {3} removed, {4}"
+            " unchanged{5}".format(
+                counts[CREATE], counts[INHERIT], counts[UPDATE],
+                counts[REMOVE], len(items) - len(
+                    [op for op in operations if op.kind != REMOVE]),
+                ", {0} failed".format(failures) if failures else ""))
+        return 1 if failures else 0
+
     def object_upgrade(self):
         data = {'path': self.args.path, 'hash': md5(str(time())).hexdigest()}
         return self._request(url=UPGRADE_URL, method='POST', data=data)
@@ -1120,6 +1965,8 @@ class LitpCli(object):
         return self._request(url=RESTORE_URL, method='PUT', data=data)
 
     def object_create(self):
+        if isinstance(self.args.path, PathTemplate):
+            return self._create_expansions()
         try:
             if self.args.path.startswith(CONFIG_PATH):
                 path = self.args.path
@@ -1141,7 +1988,29 @@ class LitpCli(object):
         url = self.base_url + path
         return self._request(url, method='POST', data=data)
 
+    def _create_expansions(self):
+        properties = self.props_to_dict()
+        expansions = {}
+        paths = []
+        for path, values in self.args.path.expansions:
+            if path not in expansions:
+                expansions[path] = values
+                paths.append(path)
+
+        def create(path):
+            parent, item_id = path.rsplit('/', 1)
+            return self._send(self.base_url + (parent or '/'), 'POST', {
+                'id': item_id, 'type': self.args.type,
+                'properties': dict(
+                    (name, substitute(value, expansions[path]))
+                    for name, value in properties.items())})
+        max_parallel = self._prepare_parallel_requests()
+        return self._send_all(paths, create, max_parallel, "create",
+                              "created")
+
     def object_inherit(self):
+        if self.args.targets is not None:
+            return self._inherit_to_targets()
         try:
             path, item = self.args.path.rsplit("/", 1)
         except ValueError:
@@ -1154,6 +2023,58 @@ class LitpCli(object):
         url = self.base_url + path
         return self._request(url, method='POST', data=data)
 
+    def _inherit_to_targets(self):
+        if self.args.targets != '-' and \
+                not os.path.isfile(self.args.targets):
+            patterns = [self.args.targets]
+        else:
+            try:
+                patterns = self._read_patterns(self.args.targets)
+            except IOError as e:
+                self._print_err(str(e))
+                return 1
+        for pattern in patterns:
+            if not pattern.startswith('/'):
+                self._print_err("{0} is neither a path nor a file".format(
+                    pattern))
+                return 1
+            if has_magic(pattern.rstrip('/').rsplit('/', 1)[-1]):
+                self._print_err("The last element of {0} must be the id of"
+                                " the item to create".format(pattern))
+                return 1
+        max_parallel = self._prepare_parallel_requests()
+        targets = []
+        seen = set()
+        for pattern in patterns:
+            # Only the parents of the items to create must exist
+            parent, item_id = pattern.rstrip('/').rsplit('/', 1)
+            parents = self._expand_patterns([parent or '/'], max_parallel)
+            if parents is None:
+                return 1
+            for path in parents:
+                target = path.rstrip('/') + '/' + item_id
+                if target not in seen:
+                    seen.add(target)
+                    targets.append(target)
+        try:
+            targets = [valid_create_path(target) for target in targets]
+        except argparse.ArgumentTypeError as e:
+            self._print_err(str(e))
+            return 1
+        if not targets:
+            self._print_err("No path matches {0}".format(self.args.targets))
+            return 1
+
+        properties = self.props_to_dict()
+
+        def inherit(target):
+            path, item_id = target.rsplit('/', 1)
+            return self._send(self.base_url + (path or '/'), 'POST', {
+                'inherit': self.args.source_path, 'id': item_id,
+                'properties': properties})
+        return self._send_all(targets, inherit, max_parallel, "inherit",
+                              "inherited")
+
     def object_update(self):
         data = {}
         properties = {}
@@ -1161,14 +2082,51 @@ class LitpCli(object):
         if self.args.delete_properties:
             properties.update(self.delete_props_to_dict())
         data.update({'properties': properties})
+        if self.args.match is not None:
+            return self._update_matches(data)
         url = self.base_url + self.args.path
         return self._request(url, method='PUT', data=data)
 
+    def _update_matches(self, data):
+        if not self.args.match.startswith('/'):
+            self._print_err("{0} is not a valid path pattern".format(
+                self.args.match))
+            return 1
+        max_parallel = self._prepare_parallel_requests()
+        paths = self._expand_patterns([self.args.match], max_parallel)
+        if paths is None:
+            return 1
+        if not paths:
+            self._print_err("No path matches {0}".format(self.args.match))
+            return 1
+        return self._send_all(
+            paths, lambda path: self._send(self.base_url + path, 'PUT', data),
+            max_parallel, "update", "updated")
+
     def object_remove(self):
-        path = self.base_url + self.args.path
-        return self._request(path, method='DELETE')
+        paths = list(self.args.paths or [])
+        if self.args.from_file is not None:
+            try:
+                paths.extend(self._read_paths(self.args.from_file))
+            except (IOError, argparse.ArgumentTypeError) as e:
+                self._print_err(str(e))
+                return 1
+        if not paths:
+            self._print_err("No path to remove in {0}".format(
+                self.args.from_file))
+            return 1
+        paths = collapse_descendants(paths)
+        if len(paths) == 1:
+            return self._request(self.base_url + paths[0], method='DELETE')
+
+        max_parallel = self._prepare_parallel_requests()
+        return self._send_all(
+            paths, lambda path: self._send(self.base_url + path, 'DELETE'),
+            max_parallel, "remove", "removed")
 
     def object_load(self):
+        if self.get_option('parallel'):
+            return self._load_subtrees()
         self.formatter = CliFormatter(self.xml_url, self.args.__dict__)
         url = self.xml_url + self.args.path
         if self.get_option("merge"):
@@ -1180,18 +2138,206 @@ class LitpCli(object):
         except IOError as e:
             self._print_err(str(e))
             return 1
-        return self._request(url, method='POST',
-                             content_type="application/xml",
-                             data=data)
+        with data:
+            return self._request(url, method='POST',
+                                 content_type="application/xml",
+                                 data=data,
+                                 compress=self.get_option("compress"))
 
     def _load_file(self, filepath):
-        return open(filepath).read()
+        # Streamed from disk as the request is sent
+        return open(filepath, 'rb')
+
+    def _load_subtrees(self):
+        """
+        Merge the XML file into the model as the top of the model, then as
+        the subtrees below it, loaded concurrently; a subtree inheriting
+        from items of another waits for it.
+        """
+        if self.get_option('replace'):
+            self._print_err("--parallel cannot be used with --replace")
+            return 1
+        max_parallel = self._prepare_parallel_requests()
+        self.formatter.url = self.xml_url
+        compress = self.get_option('compress')
+        directory = tempfile.mkdtemp(prefix='.litp_load.')
+        try:
+            try:
+                with self._load_file(self.args.file) as fobj:
+                    depth = split_depth(item_counts(fobj), max_parallel)
+                    fobj.seek(0)
+                    top, subtrees = split_subtrees(
+                        fobj, self.args.path, depth or 1, directory)
+            except IOError as e:
+                self._print_err(str(e))
+                return 1
+            except SyntaxError as e:
+                self._print_err("Invalid XML file {0}: {1}".format(
+                    self.args.file, e))
+                return 1
+            except SplitError as e:
+                self._print_err("{0}; load the file without --parallel"
+                                .format(e))
+                return 1
+
+            def load(path, filename):
+                with open(filename, 'rb') as fobj:
+                    data = fobj.read()
+                return self._send(self.xml_url + path + '?merge=true',
+                                  'POST', data, "application/xml", compress)
+            result = load(self.args.path, top)
+            if self._failed(result):
+                self._print_failures([self.args.path],
+                                     {self.args.path: result},
+                                     "load {0}".format)
+                return 1
+            by_path = dict((subtree.path, subtree) for subtree in subtrees)
+            return self._send_all(
+                [subtree.path for subtree in subtrees],
+                lambda path: load(by_path[path].parent,
+                                  by_path[path].filename),
+                max_parallel, "load", "loaded",
+                subtree_dependencies(subtrees))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
 
     def object_show_plan(self):
         url = self.base_url + "/plans/plan?recurse_depth=1000"
-        return self._request(
-            url,
-            format_func=self.formatter.cb_format_show_plan)
+        if self.get_option("raw"):
+            return self._request(
+                url,
+                format_func=self.formatter.cb_format_show_plan)
+        return self._request(url, format_func=self._stream_show_plan,
+                             stream=True)
+
+    def _stream_show_plan(self, response):
+        """
+        Format the plan phase by phase as it is read from the response so
+        that memory use does not grow with the size of the plan.
+        """
+        plan = JsonItemStream(response, PLAN_PHASES_PREFIX)
+        phases = self.formatter.iter_plan_phases(plan)
+        history = self._get_plan_history()
+        if history is not None:
+            observed_phases = []
+            phases = self._observe_phases(phases, observed_phases)
+        phase_metrics = []
+        for output in self.formatter.iter_show_plan(
+                phases, lambda: plan.remainder, phase_metrics):
+            self._print_out(output)
+        if history is not None:
+            self._record_plan_history(
+                history, observed_phases,
+                self.formatter._get_state(plan.remainder))
+
+        if self.get_option("eta"):
+            plan_state = self.formatter._get_state(plan.remainder)
+            progress = PlanProgress(PLAN_PROGRESS_FILENAME)
+            progress.load()
+            progress.add_sample(phase_metrics)
+            try:
+                progress.save()
+            except (IOError, OSError) as ex:
+                self._print_err(str(ex))
+            self._print_out(self.formatter.cb_format_plan_estimate(
+                progress.estimate(plan_state == 'running'), plan_state))
+        return 0
+
+    @staticmethod
+    def _observe_phases(phases, observed_phases):
+        for phase in phases:
+            observed_phases.append([
+                (task['id'], task['path'], task['description'],
+                 task['state']) for task in phase])
+            yield phase
+
+    def _record_plan_history(self, history, phases, plan_state):
+        try:
+            history.record(phases, plan_state)
+        except sqlite3.Error as ex:
+            self._print_err("Unable to record plan history: %s" % ex)
+        finally:
+            history.close()
+
+    def object_plan_history(self):
+        if self.get_option("file"):
+            history = PlanHistory(self.args.file)
+        else:
+            history = self._get_plan_history()
+        if history is None:
+            self._print_err("Plan history is not recorded, set"
+                            " plan_history_file in %s" % LITPRC_FILENAME)
+            return 1
+        try:
+            if self.get_option("long"):
+                output = self.formatter.cb_format_plan_runs(history.runs())
+            elif self.get_option("compare"):
+                runs = [history.run(run_id) for run_id in self.args.compare]
+                if None in runs:
+                    self._print_err("Plan run not found")
+                    return 1
+                output = self.formatter.cb_format_plan_comparison(
+                    runs, [history.phase_durations(run_id)
+                           for run_id in self.args.compare])
+            else:
+                run_id = self.get_option("run") or history.latest_run()
+                run = history.run(run_id)
+                if run is None:
+                    self._print_err("Plan run not found")
+                    return 1
+                output = self.formatter.cb_format_plan_history(
+                    run, history.phase_durations(run_id),
+                    history.slowest_tasks(run_id, self.args.top))
+        except sqlite3.Error as ex:
+            self._print_err("Unable to read plan history: %s" % ex)
+            return 1
+        finally:
+            history.close()
+        self._print_out(output)
+        return 0
+
+    def object_metrics(self):
+        if self.get_option("file"):
+            metrics = LatencyMetrics(self.args.file)
+        else:
+            metrics = self._get_metrics()
+        if metrics is None:
+            self._print_err("Metrics are not recorded, set metrics_file in"
+                            " %s" % LITPRC_FILENAME)
+            return 1
+        try:
+            output = metrics.render()
+        except sqlite3.Error as ex:
+            self._print_err("Unable to read metrics: %s" % ex)
+            return 1
+        finally:
+            metrics.close()
+        if not self.get_option("output"):
+            self._print_out(output)
+            return 0
+        try:
+            self._write_metrics(self.args.output, output + "\n")
+        except (IOError, OSError) as ex:
+            self._print_err("Unable to write metrics to %s: %s" % (
+                self.args.output, ex.strerror))
+            return 1
+        return 0
+
+    @staticmethod
+    def _write_metrics(filename, output):
+        # The textfile collector must never read a partly written file
+        filename = os.path.abspath(filename)
+        fd, tmp_filename = tempfile.mkstemp(
+            dir=os.path.dirname(filename),
+            prefix='.' + os.path.basename(filename) + '.')
+        try:
+            with os.fdopen(fd, 'w') as fobj:
+                fobj.write(output)
+            os.chmod(tmp_filename, 0644)
+            os.rename(tmp_filename, filename)
+        except BaseException:
+            os.unlink(tmp_filename)
+            raise
 
     def object_create_plan(self):
         data = {
@@ -1308,7 +2454,19 @@ class LitpCli(object):
         if self.args.resume:
             plan_properties["properties"]["resume"] = "true"
 
-        return self._request(url, method='PUT', data=plan_properties)
+        retcode = self._request(url, method='PUT', data=plan_properties)
+        history = self._get_plan_history()
+        if retcode == 0 and history is not None:
+            response, err = self._execute_request(
+                url + "?recurse_depth=1000", 'GET', None, None)
+            if not err and response.status == httplib.OK:
+                plan = json.loads(response.read())
+                phases = [[(task['id'], task['path'], task['description'],
+                            task['state']) for task in phase]
+                          for phase in self.formatter._get_plan(plan)]
+                self._record_plan_history(
+                    history, phases, self.formatter._get_state(plan))
+        return retcode
 
     def object_stop_plan(self):
         url = self.base_url + "/plans/plan"
@@ -1316,19 +2474,128 @@ class LitpCli(object):
             url, method='PUT', data={"properties": {"state": "stopped"}})
 
     def object_export_xml(self):
-        format_func = None
-        if self.get_option("file"):
-            def cb_format_xml_file(data, recursive=False):
-                try:
-                    with open(self.args.file, 'w') as fobj:
-                        fobj.write(data)
-                except IOError as ex:
-                    self._print_err(str(ex))
-                    sys.exit(1)
-            format_func = cb_format_xml_file
+        if self.get_option('parallel'):
+            return self._export_subtrees()
         url = self.xml_url + self.args.path
-        return self._request(url, format_func=format_func,
-            content_type="application/xml")
+        return self._request(url, format_func=self._stream_export,
+                             content_type="application/xml", stream=True)
+
+    def _stream_export(self, response):
+        """
+        Write the exported XML to the file or stdout as it is received.
+        """
+        if self.get_option("file"):
+            try:
+                save_response(response, self.args.file,
+                              self.get_option("compress"))
+            except socket.error:
+                # Reported by _process_request
+                raise
+            except (IOError, OSError) as ex:
+                self._print_err(str(ex))
+                return 1
+        elif self.get_option("compress"):
+            writer = GzipWriter(sys.stdout)
+            copy_response(response, writer)
+            writer.close()
+            sys.stdout.flush()
+        else:
+            self._stream_export_to_stdout(response)
+        return 0
+
+    def _export_subtrees(self):
+        """
+        Export the children of the item concurrently to temporary files,
+        then write them to the file within the element of the item, as the
+        export of the item would be.
+        """
+        if not self.get_option('file'):
+            self._print_err("--parallel requires -f")
+            return 1
+        max_parallel = self._prepare_parallel_requests()
+        result = self._send(self.base_url + self.args.path)
+        if self._failed(result):
+            self._print_failures([self.args.path], {self.args.path: result},
+                                 "export {0}".format)
+            return 1
+        item = json.loads(result[1])
+        children = [child['id'] for child in
+                    item.get('_embedded', {}).get('item', [])]
+        if not children:
+            self.args.parallel = False
+            return self.object_export_xml()
+        if not can_stitch(item):
+            self._print_err(
+                "--parallel cannot export {0}: the element of a collection,"
+                " of an inherited item or of an item with properties cannot"
+                " be rebuilt, export it without --parallel".format(
+                    self.args.path))
+            return 1
+
+        self.formatter.url = self.xml_url
+        directory = tempfile.mkdtemp(
+            prefix='.litp_export.',
+            dir=os.path.dirname(os.path.abspath(self.args.file)))
+        parent = self.args.path.rstrip('/')
+
+        def export(child):
+            response, err = self._execute_request(
+                self.xml_url + parent + '/' + child, 'GET', None,
+                "application/xml")
+            if err:
+                return self._send_error(err)
+            try:
+                if response.status != httplib.OK:
+                    return response.status, response.read()
+                with open(os.path.join(directory, child), 'wb') as fobj:
+                    copy_response(response, fobj)
+            except socket.timeout:
+                return None, LITP_TIMEOUT_ERR
+            except socket.error:
+                return None, LITP_SERVICE_ERR
+            except httplib.HTTPException:
+                # Cut short, so that the item is not exported without it
+                return None, INVALID_RESPONSE_ERR
+            return response.status, ''
+        try:
+            results = run_parallel(children, export, max_parallel)
+            if self._print_failures(
+                    children, results,
+                    lambda child: "export {0}/{1}".format(parent, child)):
+                return 1
+            try:
+                save_stream(self.args.file, lambda fobj: stitch_subtrees(
+                    fobj, item, [os.path.join(directory, child)
+                                 for child in children]),
+                    self.get_option('compress'))
+            except (IOError, OSError) as e:
+                self._print_err(str(e))
+                return 1
+            return 0
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _stream_export_to_stdout(self, response):
+        # Like _print_out, without leading or trailing blank lines
+        started = False
+        pending = ''
+        while True:
+            chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if not started:
+                chunk = chunk.lstrip('\n')
+                started = bool(chunk)
+            text = chunk.rstrip('\n')
+            if text:
+                sys.stdout.write(pending + text)
+                pending = chunk[len(text):]
+            else:
+                pending += chunk
+        check_complete(response)
+        if started:
+            sys.stdout.write('\n')
+        sys.stdout.flush()
 
     def get_user_passwd(self, username, password):
         '''
@@ -0,0 +1,313 @@
+"""
+Model manifests of litp apply: the desired items of the model, and the
+operations bringing the model to them.
+
+A manifest is a JSON or YAML document such as::
+
+    items:
+      - path: /software/items/vim
+        type: package
+        properties:
+          name: vim-enhanced
+      - path: /ms/items/vim
+        inherit: /software/items/vim
+    remove:
+      - /software/items/emacs
+
+A list of items is also accepted as a manifest without removals.
+"""
+
+import argparse
+import json
+import os
+
+from litpcli.action import valid_create_path
+from litpcli.paths import parent_path, nearest_ancestor, is_descendant, \
+    model_path, collapse_descendants
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+CREATE = 'create'
+INHERIT = 'inherit'
+UPDATE = 'update'
+REMOVE = 'remove'
+YAML_EXTENSIONS = ('.yaml', '.yml')
+
+
+class ManifestError(Exception):
+    pass
+
+
+def property_value(value):
+    """
+    Return a property value of a manifest as the string held by the model,
+    or None for a property to delete.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+def _parse(text, filename):
+    if os.path.splitext(filename)[1].lower() in YAML_EXTENSIONS:
+        if yaml is None:
+            raise ManifestError("PyYAML is required to read the YAML"
+                                " manifest {0}".format(filename))
+        try:
+            return yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ManifestError("Invalid manifest {0}: {1}".format(
+                filename, e))
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        raise ManifestError("Invalid manifest {0}: {1}".format(filename, e))
+
+
+def _path(value, filename):
+    if not isinstance(value, basestring) or value == '/':
+        raise ManifestError("Invalid path {0!r} in manifest {1}".format(
+            value, filename))
+    try:
+        return str(valid_create_path(value))
+    except (argparse.ArgumentTypeError, UnicodeError) as e:
+        raise ManifestError("{0} in manifest {1}".format(e, filename))
+
+
+class DesiredItem(object):
+    """
+    An item of a manifest, created with item_type or inherited from source.
+    """
+    __slots__ = ('path', 'item_type', 'source', 'properties')
+
+    def __init__(self, path, item_type=None, source=None, properties=None):
+        self.path = path
+        self.item_type = item_type
+        self.source = source
+        self.properties = properties or {}
+
+
+def load_manifest(text, filename):
+    """
+    Return the desired items and the paths to remove of a manifest.
+    """
+    document = _parse(text, filename)
+    removals = []
+    if isinstance(document, dict):
+        removals = document.get('remove') or []
+        document = document.get('items') or []
+    if not isinstance(document, list) or not isinstance(removals, list):
+        raise ManifestError("Invalid manifest {0}: expected a list of"
+                            " items".format(filename))
+    items = []
+    seen = set()
+    for entry in document:
+        if not isinstance(entry, dict):
+            raise ManifestError("Invalid item {0!r} in manifest {1}".format(
+                entry, filename))
+        path = _path(entry.get('path'), filename)
+        if path in seen:
+            raise ManifestError("Item {0} is repeated in manifest {1}".format(
+                path, filename))
+        seen.add(path)
+        item_type, source = entry.get('type'), entry.get('inherit')
+        if (item_type is None) == (source is None):
+            raise ManifestError("Item {0} of manifest {1} needs either a type"
+                                " or an inherit source".format(path, filename))
+        properties = entry.get('properties') or {}
+        if not isinstance(properties, dict):
+            raise ManifestError("Invalid properties of item {0} in manifest"
+                                " {1}".format(path, filename))
+        items.append(DesiredItem(
+            path, item_type and str(item_type),
+            source and _path(source, filename),
+            dict((str(name), property_value(value))
+                 for name, value in properties.items())))
+    removals = collapse_descendants(
+        [_path(path, filename) for path in removals])
+    for item in items:
+        for path in removals:
+            if item.path == path or is_descendant(item.path, path):
+                raise ManifestError("Item {0} is below removed item {1}"
+                                    .format(item.path, path))
+    return items, removals
+
+
+class Operation(object):
+    """
+    A change to one item of the model.
+    """
+    __slots__ = ('kind', 'path', 'item_type', 'source', 'properties')
+
+    def __init__(self, kind, path, item_type=None, source=None,
+                 properties=None):
+        self.kind = kind
+        self.path = path
+        self.item_type = item_type
+        self.source = source
+        self.properties = properties
+
+    def request(self):
+        """
+        Return the method, path and body of the request of the operation.
+        """
+        item_id = self.path.rsplit('/', 1)[1]
+        if self.kind == CREATE:
+            return 'POST', parent_path(self.path), {
+                'id': item_id, 'type': self.item_type,
+                'properties': self.properties}
+        if self.kind == INHERIT:
+            return 'POST', parent_path(self.path), {
+                'inherit': self.source, 'id': item_id,
+                'properties': self.properties}
+        if self.kind == UPDATE:
+            return 'PUT', self.path, {'properties': self.properties}
+        return 'DELETE', self.path, None
+
+    def describe(self):
+        if self.kind == INHERIT:
+            return "inherit {0} from {1}".format(self.path, self.source)
+        if self.kind == UPDATE:
+            return "update {0}: {1}".format(self.path, ', '.join(
+                "{0}={1}".format(name, value) if value is not None
+                else "-{0}".format(name)
+                for name, value in sorted(self.properties.items())))
+        return "{0} {1}".format(self.kind, self.path)
+
+
+def _changed_properties(desired, current):
+    properties = current.get('properties') or {}
+    overwritten = current.get('properties-overwritten')
+    changed = {}
+    for name, value in desired.properties.items():
+        if value is None:
+            # Only set and, for inherited items, overwritten properties
+            # can be deleted
+            if name in properties and (overwritten is None or
+                                       name in overwritten):
+                changed[name] = None
+        elif properties.get(name) != value:
+            changed[name] = value
+    return changed
+
+
+def plan_operations(items, removals, current):
+    """
+    Return the operations bringing the model to the manifest, and the
+    conflicts between the manifest and the model preventing it.
+
+    :param current: the items of the model at the paths of items and
+        removals, None for items that do not exist
+    """
+    operations = []
+    conflicts = []
+    for item in items:
+        existing = current.get(item.path)
+        if existing is None:
+            properties = dict((name, value) for name, value
+                              in item.properties.items() if value is not None)
+            if item.source is not None:
+                operations.append(Operation(INHERIT, item.path,
+                                            source=item.source,
+                                            properties=properties))
+            else:
+                operations.append(Operation(CREATE, item.path,
+                                            item_type=item.item_type,
+                                            properties=properties))
+            continue
+        links = existing.get('_links', {})
+        if item.source is not None:
+            inherited_from = links.get('inherited-from', {}).get('href')
+            if inherited_from is None or \
+                    model_path(inherited_from) != item.source:
+                conflicts.append("{0} exists and is not inherited from {1}"
+                                 .format(item.path, item.source))
+                continue
+        elif existing.get('item-type-name') not in (None, item.item_type):
+            conflicts.append("{0} exists with type {1}, not {2}".format(
+                item.path, existing['item-type-name'], item.item_type))
+            continue
+        changed = _changed_properties(item, existing)
+        if changed:
+            operations.append(Operation(UPDATE, item.path,
+                                        properties=changed))
+    for path in removals:
+        if current.get(path) is not None:
+            operations.append(Operation(REMOVE, path))
+    return operations, conflicts
+
+
+def subtree_depths(paths):
+    """
+    Return the topmost of paths by path, each with the number of levels of
+    its descendants to read to reach the others of paths below it.
+    """
+    depths = dict((path, 0) for path in collapse_descendants(paths))
+    for path in paths:
+        top = path if path in depths else nearest_ancestor(path, depths)
+        depths[top] = max(depths[top], path.count('/') - top.count('/'))
+    return depths
+
+
+def find_item(subtrees, path):
+    """
+    Return the item at path, or None if it does not exist, from subtrees:
+    the items at the topmost paths of subtree_depths by path, None for
+    those not found, with their descendants embedded.
+    """
+    top = path if path in subtrees else nearest_ancestor(path, subtrees)
+    item = subtrees[top]
+    ancestor = top
+    for item_id in path[len(top):].split('/')[1:]:
+        if item is None:
+            return None
+        ancestor = ancestor + '/' + item_id
+        item = next((child for child in
+                     item.get('_embedded', {}).get('item', [])
+                     if model_path(child.get('_links', {}).get(
+                         'self', {}).get('href', '')) == ancestor), None)
+    return item
+
+
+def dependencies(operations):
+    """
+    Return the paths of the operations each operation waits for: an item is
+    created after its parent, and inherited after its source is created or
+    changed, if they are changed by operations too; an item is removed after
+    the items inherited from it or from its descendants.
+    """
+    created = set(operation.path for operation in operations
+                  if operation.kind in (CREATE, INHERIT))
+    changed = set(operation.path for operation in operations
+                  if operation.kind != REMOVE)
+    removed = set(operation.path for operation in operations
+                  if operation.kind == REMOVE)
+    depends_on = {}
+    for operation in operations:
+        if operation.kind not in (CREATE, INHERIT):
+            continue
+        waits_for = set()
+        parent = nearest_ancestor(operation.path, created)
+        if parent is not None:
+            waits_for.add(parent)
+        if operation.source is not None:
+            if operation.source in changed:
+                waits_for.add(operation.source)
+            else:
+                source_parent = nearest_ancestor(operation.source, created)
+                if source_parent is not None:
+                    waits_for.add(source_parent)
+            source_removed = operation.source if operation.source in \
+                removed else nearest_ancestor(operation.source, removed)
+            if source_removed is not None:
+                depends_on.setdefault(source_removed, set()).add(
+                    operation.path)
+        depends_on[operation.path] = waits_for
+    return depends_on
@@ -0,0 +1,143 @@
+"""
+Local SQLite record of the latencies of litp commands and of their requests
+to litpd, kept as histograms and rendered for the Prometheus textfile
+collector by the metrics action.
+"""
+
+import os
+import sqlite3
+import urlparse
+
+COMMAND_METRIC = 'litp_cli_command_duration_seconds'
+REQUEST_METRIC = 'litp_cli_request_duration_seconds'
+METRICS = (
+    (COMMAND_METRIC, "Duration of litp commands."),
+    (REQUEST_METRIC, "Time taken by each attempt at a request of litp"
+                     " commands, by outcome."),
+)
+# Upper bounds in seconds of the histogram buckets; larger observations
+# are only counted in the +Inf bucket
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+           30.0, 60.0)
+REST_PREFIX = '/litp/rest/v1'
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    metric TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    le REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (metric, labels, le)
+);
+CREATE TABLE IF NOT EXISTS totals (
+    metric TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    PRIMARY KEY (metric, labels)
+);
+"""
+
+
+def endpoint(url):
+    """
+    Return the endpoint of a request URL that latencies are grouped by: the
+    top level of the model, e.g. /deployments or /plans, or the service,
+    e.g. /litp/xml, so that the number of endpoints stays small.
+    """
+    path = urlparse.urlparse(url).path
+    if path.startswith(REST_PREFIX):
+        return '/' + path[len(REST_PREFIX):].strip('/').split('/', 1)[0]
+    return '/' + '/'.join(path.strip('/').split('/')[:2])
+
+
+def format_labels(labels):
+    """
+    Return labels, a list of (name, value) pairs, in the Prometheus text
+    format.
+    """
+    return ','.join('{0}="{1}"'.format(name, str(value).replace(
+        '\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels)
+
+
+class LatencyMetrics(object):
+    """
+    Latency histograms of commands and requests. Each observation only
+    increments a bucket count, so the store does not grow with the number
+    of commands; SQLite locking serialises concurrent litp commands.
+    """
+    def __init__(self, filename):
+        self.filename = os.path.expanduser(filename)
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.filename, timeout=30)
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def record(self, samples):
+        """
+        Record observations in one transaction.
+        :param samples: (metric, labels, seconds) tuples, labels being a
+            list of (name, value) pairs
+        """
+        with self.db:
+            for metric, labels, seconds in samples:
+                labels = format_labels(labels)
+                self.db.execute(
+                    "INSERT OR IGNORE INTO totals VALUES (?, ?, 0, 0)",
+                    (metric, labels))
+                self.db.execute(
+                    "UPDATE totals SET count = count + 1, sum = sum + ?"
+                    " WHERE metric = ? AND labels = ?",
+                    (seconds, metric, labels))
+                bucket = [le for le in BUCKETS if seconds <= le]
+                if not bucket:
+                    continue
+                self.db.execute(
+                    "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?, 0)",
+                    (metric, labels, bucket[0]))
+                self.db.execute(
+                    "UPDATE buckets SET count = count + 1"
+                    " WHERE metric = ? AND labels = ? AND le = ?",
+                    (metric, labels, bucket[0]))
+
+    def render(self):
+        """
+        Return the histograms in the Prometheus text exposition format.
+        """
+        counts = {}
+        for metric, labels, le, count in self.db.execute(
+                "SELECT metric, labels, le, count FROM buckets"):
+            counts[(metric, labels, le)] = count
+        totals = {}
+        for metric, labels, count, total in self.db.execute(
+                "SELECT metric, labels, count, sum FROM totals"
+                " ORDER BY metric, labels"):
+            totals.setdefault(metric, []).append((labels, count, total))
+        lines = []
+        for metric, description in METRICS:
+            if metric not in totals:
+                continue
+            lines.append("# HELP {0} {1}".format(metric, description))
+            lines.append("# TYPE {0} histogram".format(metric))
+            for labels, count, total in totals[metric]:
+                cumulative = 0
+                for le in BUCKETS:
+                    cumulative += counts.get((metric, labels, le), 0)
+                    lines.append('{0}_bucket{{{1},le="{2}"}} {3}'.format(
+                        metric, labels, repr(le), cumulative))
+                lines.append('{0}_bucket{{{1},le="+Inf"}} {2}'.format(
+                    metric, labels, count))
+                lines.append('{0}_sum{{{1}}} {2!r}'.format(
+                    metric, labels, total))
+                lines.append('{0}_count{{{1}}} {2}'.format(
+                    metric, labels, count))
+        return '\n'.join(lines)
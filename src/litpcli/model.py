@@ -0,0 +1,142 @@
+"""
+Compact in-memory representation of the items of the model read by
+litp show -r, in place of their REST representations, so that large
+trees of items fit in memory; litp show --format writes the items from
+the same representation.
+
+Each item keeps only what the formatters show. Paths are relative to the
+REST URL, and strings repeated across items, such as type names, property
+names and values and the paths that items link to, are shared. Children
+are indexes in the list of items of the tree rather than nested items.
+"""
+
+from array import array
+
+from litpcli.paths import model_path
+
+TYPE_PATHS = ('/item-types', '/property-types')
+_NO_CHILDREN = ()
+
+
+def is_model_item(item):
+    """
+    Tell whether a REST representation is that of an item of the model, as
+    opposed to item or property types.
+    """
+    if not isinstance(item, dict):
+        return False
+    href = item.get('_links', {}).get('self', {}).get('href')
+    return href is not None and \
+        not model_path(href).startswith(TYPE_PATHS)
+
+
+class ModelNode(object):
+    """
+    An item of a ModelTree.
+    """
+    __slots__ = ('path', 'item_type', 'reference', 'source', 'version',
+                 'state', 'determinable', 'properties', 'overwritten',
+                 'children')
+
+    def __init__(self, path, item_type=None, reference=None, source=None,
+                 version=None, state=None, determinable=True,
+                 properties=None, overwritten=None):
+        self.path = path
+        self.item_type = item_type
+        self.reference = reference
+        self.source = source
+        self.version = version
+        self.state = state
+        self.determinable = determinable
+        self.properties = properties
+        self.overwritten = overwritten
+        self.children = _NO_CHILDREN
+
+
+def _unshared(text):
+    return text
+
+
+def _link(links, name, url, share):
+    link = links.get(name)
+    if not link:
+        return None
+    return share(link['href'].replace(url, ''))
+
+
+def model_node(item, url, share=_unshared):
+    """
+    Return the ModelNode of an item from its REST representation read from
+    url.
+
+    :param share: callable returning the shared copy of a string
+    """
+    links = item['_links']
+    properties = item.get('properties')
+    if properties:
+        properties = dict((share(name), share(value))
+                          for name, value in properties.iteritems())
+    overwritten = item.get('properties-overwritten')
+    if overwritten is not None:
+        overwritten = tuple(share(name) for name in overwritten)
+    return ModelNode(
+        _link(links, 'self', url, share),
+        item_type=share(item.get('item-type-name')),
+        reference=_link(links, 'reference-to', url, share),
+        source=_link(links, 'inherited-from', url, share),
+        version=item.get('version'),
+        state=share(item.get('state')),
+        determinable=item.get('applied_properties_determinable', True),
+        properties=properties or None,
+        overwritten=overwritten)
+
+
+class ModelTree(object):
+    """
+    Items read from the REST API at url, the first one added being the top
+    of the tree.
+    """
+    def __init__(self, url):
+        self.url = url
+        self.nodes = []
+        self._strings = {}
+
+    def _share(self, text):
+        if text is None:
+            return None
+        return self._strings.setdefault(text, text)
+
+    @property
+    def root(self):
+        return self.nodes[0]
+
+    def add(self, item, parent=None):
+        """
+        Add an item from its REST representation, as a child of the item at
+        index parent, and return its index.
+        """
+        node = model_node(item, self.url, self._share)
+        index = len(self.nodes)
+        self.nodes.append(node)
+        if parent is not None:
+            parent = self.nodes[parent]
+            if parent.children is _NO_CHILDREN:
+                parent.children = array('l')
+            parent.children.append(index)
+        return index
+
+    def add_tree(self, item, parent=None):
+        """
+        Add an item and the descendants embedded in it, as returned by
+        litp show -r -j, and return its index.
+        """
+        index = self.add(item, parent)
+        for child in item.get('_embedded', {}).get('item', []):
+            self.add_tree(child, index)
+        return index
+
+    def children(self, node):
+        return [self.nodes[index] for index in node.children]
+
+    def __len__(self):
+        return len(self.nodes)
@@ -0,0 +1,193 @@
+"""
+Bounded concurrent execution of the requests of bulk litp commands, over
+the thread-safe connection pool.
+"""
+
+import Queue
+import sys
+import threading
+from time import time
+
+DEFAULT_MAX_PARALLEL = 8
+REPORT_INTERVAL = 1.0
+# Waits are timed so that the main thread stays interruptible
+POLL_INTERVAL = 1.0
+_STOP = object()
+
+
+class Skipped(object):
+    """
+    Result of an operation not run because one it depends on failed.
+    """
+    def __init__(self, dependency):
+        self.dependency = dependency
+
+    def __repr__(self):
+        return "Skipped({0!r})".format(self.dependency)
+
+
+class Failed(object):
+    """
+    Result of an operation that raised an exception.
+    """
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+    def __repr__(self):
+        return "Failed({0!r})".format(self.exc_info[1])
+
+
+def run_ordered(keys, func, depends_on=None, max_parallel=DEFAULT_MAX_PARALLEL,
+                failed=None, on_result=None):
+    """
+    Call func(key) for each of keys with up to max_parallel threads, each
+    key only once the keys it depends on are done, and return a dict of
+    the results by key.
+
+    :param depends_on: dict of the keys each key waits for; keys not
+        among keys are ignored
+    :param failed: callable telling whether a result is a failure; the keys
+        depending on a failed key, or on a key whose func raised, are not
+        run and get a Skipped result, and a raising func gets a Failed one
+    :param on_result: callable called in the calling thread with each key
+        and result as they complete, e.g. to report progress
+    """
+    keys = list(keys)
+    depends_on = depends_on or {}
+    key_set = set(keys)
+    waiting = dict((key, set(depends_on.get(key, ())) & key_set - set([key]))
+                   for key in keys)
+    dependents = {}
+    for key, dependencies in waiting.items():
+        for dependency in dependencies:
+            dependents.setdefault(dependency, []).append(key)
+    if failed is None:
+        failed = lambda result: False
+
+    tasks = Queue.Queue()
+    done = Queue.Queue()
+
+    def work():
+        while True:
+            key = tasks.get()
+            if key is _STOP:
+                return
+            try:
+                result = func(key)
+            except Exception:
+                result = Failed(sys.exc_info())
+            done.put((key, result))
+
+    threads = []
+    for _ in range(min(max(1, max_parallel), len(keys))):
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    results = {}
+    submitted = [0]
+
+    def submit(key):
+        submitted[0] += 1
+        tasks.put(key)
+
+    def complete(key, result):
+        results[key] = result
+        if on_result is not None:
+            on_result(key, result)
+        unsuccessful = isinstance(result, (Skipped, Failed)) or \
+            failed(result)
+        for dependent in dependents.get(key, ()):
+            if dependent in results:
+                continue
+            if unsuccessful:
+                complete(dependent, Skipped(key))
+            else:
+                waiting[dependent].discard(key)
+                if not waiting[dependent]:
+                    submit(dependent)
+
+    try:
+        for key in keys:
+            if not waiting[key]:
+                submit(key)
+        received = 0
+        while len(results) < len(keys):
+            if received == submitted[0]:
+                # Nothing left to run: the remaining keys wait on each other
+                for key in keys:
+                    if key not in results:
+                        complete(key, Skipped(sorted(waiting[key])[0]))
+                break
+            try:
+                key, result = done.get(True, POLL_INTERVAL)
+            except Queue.Empty:
+                continue
+            received += 1
+            complete(key, result)
+    finally:
+        for _ in threads:
+            tasks.put(_STOP)
+    # The threads are idle once every result is in; waiting for them to
+    # stop keeps them from being woken during interpreter shutdown
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run_parallel(keys, func, max_parallel=DEFAULT_MAX_PARALLEL,
+                 on_result=None):
+    """
+    Call func(key) for each of keys with up to max_parallel threads and
+    return a dict of the results by key.
+    """
+    return run_ordered(keys, func, max_parallel=max_parallel,
+                       on_result=on_result)
+
+
+class RequestProgress(object):
+    """
+    Reports how many of the requests of a bulk command are done, at most
+    once every REPORT_INTERVAL seconds; update is the on_result callback of
+    run_parallel or run_ordered.
+    """
+    def __init__(self, total, noun, write, failed=None, clock=time):
+        self.total = total
+        self.noun = noun
+        self.write = write
+        self.failed = failed or (lambda result: False)
+        self.clock = clock
+        self.done = 0
+        self.failures = 0
+        self.started = clock()
+        self.reported = self.started
+
+    def _rate(self, now):
+        elapsed = now - self.started
+        if elapsed <= 0:
+            return 0.0
+        return self.done / elapsed
+
+    def _failures(self):
+        if not self.failures:
+            return ""
+        return ", {0} failed".format(self.failures)
+
+    def update(self, key, result):
+        self.done += 1
+        if isinstance(result, (Skipped, Failed)) or self.failed(result):
+            self.failures += 1
+        now = self.clock()
+        if now - self.reported >= REPORT_INTERVAL:
+            self.reported = now
+            self.write("Completed {0} of {1} {2} ({3}%){4}, {5:.1f}/s".format(
+                self.done, self.total, self.noun,
+                100 * self.done / self.total, self._failures(),
+                self._rate(now)))
+
+    def finish(self):
+        now = self.clock()
+        self.write("Completed {0} {1} in {2:.1f}s{3}, {4:.1f}/s".format(
+            self.done, self.noun, now - self.started, self._failures(),
+            self._rate(now)))
@@ -0,0 +1,196 @@
+"""
+Operations on paths of items of the LITP model.
+"""
+
+import fnmatch
+import itertools
+import re
+import urlparse
+
+REST_PREFIX = '/litp/rest/v1'
+GLOB_CHARS = '*?['
+BRACE_RE = re.compile(r'\{([^{}]*)\}')
+RANGE_RE = re.compile(r'^(-?\d+)\.\.(-?\d+)$')
+PLACEHOLDER_RE = re.compile(r'\{(\d*)\}')
+# Paths a brace template may expand to, so that a mistyped range does not
+# send millions of requests
+MAX_EXPANSIONS = 10000
+
+
+def model_path(href):
+    """
+    Return the path in the model of the item at a REST URL.
+    """
+    path = urlparse.urlparse(href).path
+    if path.startswith(REST_PREFIX):
+        path = path[len(REST_PREFIX):]
+    return path.rstrip('/') or '/'
+
+
+def parent_path(path):
+    """
+    Return the path of the parent of the item at path, '/' for a top level
+    item and None for the root.
+    """
+    path = path.rstrip('/')
+    if not path:
+        return None
+    return path.rsplit('/', 1)[0] or '/'
+
+
+def is_descendant(path, ancestor):
+    """
+    Tell whether the item at path is below the item at ancestor.
+    """
+    ancestor = ancestor.rstrip('/')
+    return path.startswith(ancestor + '/') and path != ancestor + '/'
+
+
+def nearest_ancestor(path, paths):
+    """
+    Return the longest of paths that is an ancestor of path, or None.
+    """
+    ancestor = parent_path(path)
+    while ancestor is not None:
+        if ancestor in paths:
+            return ancestor
+        ancestor = parent_path(ancestor)
+    return None
+
+
+def collapse_descendants(paths):
+    """
+    Return paths without duplicates and without the paths below another of
+    paths, in their original order; removing an item removes its
+    descendants too.
+    """
+    unique = []
+    seen = set()
+    for path in paths:
+        path = path.rstrip('/') or '/'
+        if path not in seen:
+            seen.add(path)
+            unique.append(path)
+    return [path for path in unique if nearest_ancestor(path, seen) is None]
+
+
+def has_magic(path):
+    """
+    Tell whether path holds shell wildcards.
+    """
+    return any(char in path for char in GLOB_CHARS)
+
+
+def expand_glob(pattern, list_children):
+    """
+    Return the paths of the items matching pattern, whose elements may
+    hold shell wildcards, e.g. /deployments/*/clusters/*/nodes/node*.
+
+    :param list_children: callable returning a dict of the ids of the
+        children of each of a list of paths, None for paths that do not
+        exist; it is called once per element with wildcards, and for the
+        last element of a pattern with wildcards, with every path matched
+        so far, so that it can list them concurrently
+    """
+    elements = pattern.strip('/').split('/')
+    has_wildcards = any(has_magic(element) for element in elements)
+    matches = ['']
+    for index, element in enumerate(elements):
+        if not matches:
+            break
+        # Listing the parents of the last element also checks that the
+        # items at the literal elements before it exist
+        is_last = index == len(elements) - 1
+        if not has_magic(element) and not (is_last and has_wildcards):
+            matches = [match + '/' + element for match in matches]
+            continue
+        children = list_children([match or '/' for match in matches])
+        matches = [match + '/' + child for match in matches
+                   for child in children[match or '/'] or ()
+                   if fnmatch.fnmatchcase(child, element)]
+    return matches
+
+
+def _brace_count(expression):
+    match = RANGE_RE.match(expression)
+    if match:
+        return abs(int(match.group(2)) - int(match.group(1))) + 1
+    if ',' in expression:
+        return expression.count(',') + 1
+    return 1
+
+
+def _brace_alternatives(expression):
+    match = RANGE_RE.match(expression)
+    if match:
+        start, end = match.group(1), match.group(2)
+        # As in bash, {01..10} pads the numbers to the width of the bounds
+        width = 0
+        if any(len(bound.lstrip('-')) > 1 and bound.lstrip('-')[0] == '0'
+               for bound in (start, end)):
+            width = max(len(start), len(end))
+        step = 1 if int(end) >= int(start) else -1
+        return ['{0:0{1}d}'.format(number, width)
+                for number in range(int(start), int(end) + step, step)]
+    if ',' in expression:
+        return expression.split(',')
+    return ['{' + expression + '}']
+
+
+def has_braces(text):
+    """
+    Tell whether text holds brace expressions such as {1..10} or {a,b}.
+    """
+    return any(RANGE_RE.match(expression) or ',' in expression
+               for expression in BRACE_RE.findall(text))
+
+
+def expand_braces(template, limit=None):
+    """
+    Return the expansions of the brace expressions of template, {1..10}
+    ranges or {a,b} lists, as in bash: a list of each expanded string with
+    the values taken by its expressions, in order.
+
+    :raise ValueError: if there would be more than limit expansions
+    """
+    parts = BRACE_RE.split(template)
+    if limit is not None:
+        count = 1
+        for expression in parts[1::2]:
+            count *= _brace_count(expression)
+        if count > limit:
+            raise ValueError("{0} expands to {1} paths, more than {2}".format(
+                template, count, limit))
+    literals = parts[0::2]
+    alternatives = [_brace_alternatives(expression)
+                    for expression in parts[1::2]]
+    expansions = []
+    for values in itertools.product(*alternatives):
+        text = literals[0] + ''.join(value + literal for value, literal
+                                     in zip(values, literals[1:]))
+        expansions.append((text, values))
+    return expansions
+
+
+class PathTemplate(str):
+    """
+    A path holding brace expressions, along with its expansions as returned
+    by expand_braces.
+    """
+    def __new__(cls, template, expansions):
+        path = super(PathTemplate, cls).__new__(cls, template)
+        path.expansions = expansions
+        return path
+
+
+def substitute(text, values):
+    """
+    Return text with the {} placeholders replaced by the first of values,
+    and the {N} ones by the value at index N.
+    """
+    def value(match):
+        index = int(match.group(1) or 0)
+        if index >= len(values):
+            return match.group(0)
+        return values[index]
+    return PLACEHOLDER_RE.sub(value, text)
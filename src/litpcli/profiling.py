@@ -0,0 +1,47 @@
+"""
+Profiling of litp actions, enabled with LITP_CLI_PROFILE or --profile.
+"""
+
+import pstats
+try:
+    from cProfile import Profile
+except ImportError:
+    from profile import Profile
+
+
+def run_profiled(func, filename, top=None, write=None):
+    """
+    Call func under the profiler and return its result, writing the stats
+    to filename even if func raises. With top, the top functions by
+    cumulative time are also written with write, a callable taking text.
+    """
+    profiler = Profile()
+    try:
+        return profiler.runcall(func)
+    finally:
+        try:
+            profiler.dump_stats(filename)
+        except (IOError, OSError) as e:
+            if write is not None:
+                write("Cannot write profile {0}: {1}".format(
+                    filename, e.strerror))
+        if top and write is not None:
+            write(format_top(profiler, top))
+
+
+class _Output(object):
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text)
+
+
+def format_top(profiler, top):
+    """
+    Return the top functions of profiler by cumulative time.
+    """
+    output = _Output()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats('cumulative').print_stats(top)
+    return ''.join(output.chunks).strip('\n')
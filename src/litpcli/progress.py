@@ -0,0 +1,111 @@
+"""
+Plan progress sampling used by show_plan to report throughput and ETA.
+"""
+
+import json
+import os
+from time import time
+
+COMPLETED_STATES = ('success', 'failed')
+MAX_SAMPLES = 500
+
+
+class PlanEstimate(object):
+    """
+    Throughput and completion estimate derived from two or more samples.
+    """
+    def __init__(self, total, completed, elapsed, rate, phase_rates,
+                 eta=None):
+        self.total = total
+        self.completed = completed
+        self.remaining = total - completed
+        self.elapsed = elapsed
+        self.rate = rate
+        self.phase_rates = phase_rates
+        self.eta = eta
+
+
+class PlanProgress(object):
+    """
+    Keeps the per-phase completion counts seen by successive show_plan
+    polls in a small per-user file, so that rates can be derived across
+    separate CLI invocations.
+    """
+    def __init__(self, filename):
+        self.filename = os.path.expanduser(filename)
+        self.samples = []
+
+    def load(self):
+        try:
+            with open(self.filename) as fobj:
+                self.samples = json.load(fobj).get('samples', [])
+        except (IOError, ValueError, AttributeError):
+            self.samples = []
+        return self.samples
+
+    def save(self):
+        tmp_filename = self.filename + '.tmp'
+        fd = os.open(tmp_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                     0600)
+        with os.fdopen(fd, 'w') as fobj:
+            json.dump({'samples': self.samples[-MAX_SAMPLES:]}, fobj)
+        os.rename(tmp_filename, self.filename)
+
+    def add_sample(self, phase_metrics, timestamp=None):
+        """
+        Record the completed/total task counts of every phase.
+        :param phase_metrics: per-phase state counts, as appended to the
+            phase_metrics of CliFormatter.iter_show_plan by
+            CliFormatter._get_phase_metrics
+        """
+        if timestamp is None:
+            timestamp = time()
+        phases = [[self._completed(metrics), metrics['total']]
+                  for metrics in phase_metrics]
+        if self.samples and not self._same_plan(self.samples[-1], phases):
+            self.samples = []
+        self.samples.append({'time': timestamp, 'phases': phases})
+
+    @staticmethod
+    def _completed(metrics):
+        return sum(metrics.get(state, 0) for state in COMPLETED_STATES)
+
+    @staticmethod
+    def _same_plan(previous, phases):
+        # A different phase layout or fewer completed tasks than last time
+        # means the plan was removed and recreated since the last poll
+        if [total for _, total in previous['phases']] != \
+                [total for _, total in phases]:
+            return False
+        return all(done >= old_done for (done, _), (old_done, _) in
+                   zip(phases, previous['phases']))
+
+    def estimate(self, running=True):
+        """
+        Return a PlanEstimate, or None if fewer than two samples exist.
+        """
+        if len(self.samples) < 2:
+            return None
+        first, last = self.samples[0], self.samples[-1]
+        elapsed = last['time'] - first['time']
+        if elapsed <= 0:
+            return None
+        minutes = elapsed / 60.0
+
+        total = sum(phase_total for _, phase_total in last['phases'])
+        completed = sum(done for done, _ in last['phases'])
+        rate = (completed - sum(done for done, _ in first['phases'])) / \
+            minutes
+
+        phase_rates = []
+        for phase_no, ((done, phase_total), (first_done, _)) in \
+                enumerate(zip(last['phases'], first['phases'])):
+            if done > first_done:
+                phase_rates.append(
+                    (phase_no + 1, (done - first_done) / minutes, done,
+                     phase_total))
+
+        eta = None
+        if running and rate > 0:
+            eta = last['time'] + (total - completed) / rate * 60
+        return PlanEstimate(total, completed, elapsed, rate, phase_rates, eta)
@@ -0,0 +1,162 @@
+"""
+Deadlines and retry backoff for requests to the LITP service.
+"""
+
+import errno
+import httplib
+import random
+import socket
+import sys
+from email.utils import mktime_tz, parsedate_tz
+from time import time, sleep
+
+DEFAULT_RETRIES = 2
+BASE_DELAY = 0.5
+MAX_DELAY = 10.0
+
+
+class DeadlineExceeded(socket.timeout):
+    pass
+
+
+class Deadline(object):
+    """
+    Point in time by which a command must complete; no limit if timeout is
+    None.
+    """
+    def __init__(self, timeout=None, clock=time):
+        self.clock = clock
+        self.timeout = timeout
+        self.expires = None
+        if timeout is not None:
+            self.expires = clock() + timeout
+
+    def remaining(self):
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - self.clock())
+
+    def expired(self):
+        return self.expires is not None and self.remaining() <= 0
+
+    def limit(self, timeout):
+        """
+        Return the lesser of timeout and the remaining time, where None
+        stands for no limit.
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        if timeout is None:
+            return remaining
+        return min(timeout, remaining)
+
+
+class RetryPolicy(object):
+    """
+    Bounded retries with exponential backoff and full jitter, so that
+    clients retrying against an overloaded service do not do so in step.
+    """
+    def __init__(self, retries=DEFAULT_RETRIES, base_delay=BASE_DELAY,
+                 max_delay=MAX_DELAY, rand=random.uniform):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rand = rand
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Return the seconds to wait before retry number attempt + 1; a
+        Retry-After delay sent by the server takes precedence.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return self.rand(0, min(self.max_delay,
+                                self.base_delay * 2 ** attempt))
+
+
+def parse_retry_after(value, now=None):
+    """
+    Return the delay in seconds of a Retry-After header holding either
+    seconds or an HTTP date, or None if it cannot be parsed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    if now is None:
+        now = time()
+    return max(0.0, mktime_tz(parsed) - now)
+
+
+def _retryable(error):
+    # A service that is not running is not worth waiting for
+    if isinstance(error, (socket.timeout, httplib.BadStatusLine)):
+        # Timed out, or the connection was closed without a response
+        return True
+    if isinstance(error, httplib.HTTPException):
+        return False
+    return getattr(error, 'errno', None) not in (errno.ECONNREFUSED,
+                                                 errno.ENOENT)
+
+
+def _attempt(conn, method, url, body, headers, observe, attempt):
+    if observe is None:
+        conn.request(method, url, body, headers)
+        return conn.getresponse()
+    started = time()
+    try:
+        conn.request(method, url, body, headers)
+        response = conn.getresponse()
+    except Exception as ex:
+        observe(type(ex).__name__, time() - started, attempt)
+        raise
+    observe(response.status, time() - started, attempt)
+    return response
+
+
+def send_request(conn, method, url, body, headers, policy, deadline,
+                 retries=0, observe=None):
+    """
+    Send a request and return its response, retrying up to retries times
+    on timeouts, dropped connections and 503 responses while the deadline
+    allows. The last 503 response is returned and the last error raised
+    once retries are exhausted.
+
+    :param observe: callable given the outcome of each attempt, its
+        response status or the class name of its error, the seconds it
+        took and its number, 0 for the first attempt
+    """
+    attempt = 0
+    while True:
+        if deadline.expired():
+            raise DeadlineExceeded("Deadline of {0} seconds exceeded".format(
+                deadline.timeout))
+        response, error, retry_after = None, None, None
+        try:
+            response = _attempt(conn, method, url, body, headers, observe,
+                                attempt)
+        except (socket.error, httplib.HTTPException):
+            error = sys.exc_info()
+            if not _retryable(error[1]) or attempt >= retries:
+                raise
+        else:
+            if response.status != 503 or attempt >= retries:
+                return response
+            if hasattr(response, 'getheader'):
+                retry_after = parse_retry_after(
+                    response.getheader('retry-after'))
+        delay = policy.delay(attempt, retry_after)
+        remaining = deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            if error is not None:
+                raise error[0], error[1], error[2]
+            return response
+        if response is not None:
+            response.read()
+        sleep(delay)
+        attempt += 1
@@ -0,0 +1,106 @@
+"""
+Rows of litp show --format: one line per item with a fixed set of columns,
+written as CSV, TSV or an aligned table as each item is read, so that
+reports need neither the whole tree in memory nor parsing of litp show.
+"""
+
+import csv
+
+CSV = 'csv'
+TSV = 'tsv'
+TABLE = 'table'
+FORMATS = (CSV, TSV, TABLE)
+# source is the item an item is inherited from, reference the item it
+# links to
+COLUMNS = ('path', 'id', 'type', 'state', 'source', 'reference')
+PROPERTY_PREFIX = 'properties.'
+DEFAULT_COLUMNS = ('path', 'type', 'state')
+# Table columns are not sized from their values, which are not all read
+# when the first rows are written; longer values push the following
+# columns of their row to the right
+TABLE_WIDTHS = {'path': 50, 'id': 16, 'type': 24, 'state': 10,
+                'source': 50, 'reference': 50}
+DEFAULT_TABLE_WIDTH = 16
+TABLE_SEPARATOR = '  '
+
+
+def parse_columns(text):
+    """
+    Return the columns of a comma separated list such as
+    path,type,properties.hostname.
+
+    :raise ValueError: for unknown columns
+    """
+    columns = [column.strip() for column in text.split(',')
+               if column.strip()]
+    if not columns:
+        raise ValueError("No columns given")
+    for column in columns:
+        if column not in COLUMNS and not (
+                column.startswith(PROPERTY_PREFIX) and
+                len(column) > len(PROPERTY_PREFIX)):
+            raise ValueError(
+                "{0} is not a valid column, expected one of {1} or {2}NAME"
+                .format(column, ', '.join(COLUMNS), PROPERTY_PREFIX))
+    return columns
+
+
+def node_value(node, column):
+    """
+    Return the value of a column for a ModelNode, '' if it has none.
+    """
+    if column.startswith(PROPERTY_PREFIX):
+        value = (node.properties or {}).get(column[len(PROPERTY_PREFIX):])
+    elif column == 'path':
+        value = node.path
+    elif column == 'id':
+        value = node.path.rstrip('/').rsplit('/', 1)[-1]
+    elif column == 'type':
+        value = node.item_type
+    elif column == 'state':
+        value = node.state
+    elif column == 'source':
+        value = node.source
+    else:
+        value = node.reference
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+class RowWriter(object):
+    """
+    Writes the columns of items to fobj in one of FORMATS, flushing each
+    row so that it is seen as soon as the item is read.
+    """
+    def __init__(self, fobj, columns, output_format):
+        self.fobj = fobj
+        self.columns = columns
+        self.output_format = output_format
+        self._writer = None
+        if output_format == CSV:
+            self._writer = csv.writer(fobj, lineterminator='\n')
+        elif output_format == TSV:
+            self._writer = csv.writer(fobj, delimiter='\t',
+                                      quoting=csv.QUOTE_NONE,
+                                      escapechar='\\', lineterminator='\n')
+        self.widths = [max(len(column),
+                           TABLE_WIDTHS.get(column, DEFAULT_TABLE_WIDTH))
+                       for column in columns]
+
+    def _write(self, values):
+        if self._writer is not None:
+            self._writer.writerow(values)
+        else:
+            cells = [value.ljust(width)
+                     for value, width in zip(values, self.widths)]
+            self.fobj.write(TABLE_SEPARATOR.join(cells).rstrip() + '\n')
+        self.fobj.flush()
+
+    def header(self):
+        self._write(self.columns)
+
+    def write(self, node):
+        self._write([node_value(node, column) for column in self.columns])
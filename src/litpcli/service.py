@@ -0,0 +1,73 @@
+"""
+Addresses of the LITP service, the messages reporting failures to reach it,
+and the sending of requests to it, shared by the litp command and
+litpcli.client.
+"""
+
+import json
+
+from litpcli.compression import decode_response, gzip_compress
+from litpcli.retry import send_request
+from litpcli.upload import file_body
+
+DEFAULT_HOST = "localhost"
+DEFAULT_PORT = "9999"
+REST_VERSION = "/litp/rest/v1"
+XML_PATH = "/litp/xml"
+REST_URL = "".join(("https://", DEFAULT_HOST, ":", DEFAULT_PORT, REST_VERSION))
+UNIX_SOCKET = '/var/run/litpd/litpd.sock'
+OK_STATUSES = (200, 201, 202, 205)
+CREDENTIALS_ERR = "Error 401: Unauthorized access"
+LITP_SERVICE_ERR = "litp does not appear to be running/accessible"
+LITP_TIMEOUT_ERR = "litp did not respond before the timeout expired"
+SERVICE_UNAVAILABLE_ERR = "Error 503: litp is busy, try again later"
+INVALID_RESPONSE_ERR = "litp returned an incomplete or invalid response"
+
+
+def send(conn, method, url, data, headers, policy, deadline,
+         content_type=None, compress=False, write_progress=None,
+         observe=None, wrap=None):
+    """
+    Send a request to the LITP service and return its response, whose body
+    is decoded as it is read. The body of a POST or PUT is data, read from
+    disk if it is a file and JSON encoded unless it is a string; with
+    compress it is sent compressed, and sent again uncompressed if the
+    server does not accept compressed bodies. Only reads are retried.
+
+    :param conn: connection, or pool of connections, to send it on
+    :param headers: headers of the request other than those describing
+        its body
+    :param write_progress: callable reporting the upload of a file
+    :param observe: callable recording the latency of each attempt
+    :param wrap: callable wrapping the response before its body is decoded
+    :raise socket.error, httplib.HTTPException: if no response was received
+    """
+    request_headers = dict(headers)
+    request_headers['Content-Type'] = content_type or 'application/json'
+    body = None
+    if method in ('POST', 'PUT') and hasattr(data, 'read'):
+        body = file_body(data, compress, write_progress)
+        if compress:
+            request_headers['Content-Encoding'] = 'gzip'
+        request_headers['Content-Length'] = body.size
+    elif method in ('POST', 'PUT'):
+        if isinstance(data, str):
+            body = data
+        else:
+            body = json.dumps(data)
+        if compress:
+            body = gzip_compress(body)
+            request_headers['Content-Encoding'] = 'gzip'
+        request_headers['Content-Length'] = len(body)
+    # Only reads are safe to repeat
+    retries = policy.retries if method == 'GET' else 0
+    response = send_request(conn, method, url, body, request_headers,
+                            policy, deadline, retries, observe)
+    if compress and response.status == 415:
+        # The server does not accept compressed bodies
+        response.read()
+        return send(conn, method, url, data, headers, policy, deadline,
+                    content_type, False, write_progress, observe, wrap)
+    if wrap is not None:
+        response = wrap(response)
+    return decode_response(response)
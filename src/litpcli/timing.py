@@ -0,0 +1,189 @@
+"""
+Time spent in each phase of a litp command, reported with --timing.
+"""
+
+import urlparse
+from time import time
+
+# Requests listed one by one in the report, beyond which only their
+# percentiles are
+MAX_LISTED_REQUESTS = 10
+PERCENTILES = (50, 90, 99)
+KIB = 1024.0
+
+
+def percentile(values, percent):
+    """
+    Return the nearest-rank percentile of a list of values.
+    """
+    ordered = sorted(values)
+    rank = max(1, int(-(-percent * len(ordered) // 100)))
+    return ordered[rank - 1]
+
+
+def _ms(seconds):
+    return "{0:.1f}ms".format(seconds * 1000)
+
+
+class RequestTiming(object):
+    """
+    Timing of one request: the wait for the response headers, the reading
+    of the body and the decoding and formatting of the result.
+    """
+    def __init__(self, method, url, clock=time):
+        self.method = method
+        self.url = url
+        self.clock = clock
+        self.started = clock()
+        self.status = None
+        self.first_byte = None
+        self.transfer = 0.0
+        self.bytes = 0
+        self.json = 0.0
+        self.format = 0.0
+
+    def response(self, response):
+        """
+        Record the arrival of response and return it wrapped to time the
+        reading of its body.
+        """
+        self.first_byte = self.clock() - self.started
+        self.status = getattr(response, 'status', None)
+        return TimedResponse(response, self)
+
+    def describe(self):
+        path = urlparse.urlparse(self.url).path or self.url
+        line = "{0} {1} {2}: first byte {3}".format(
+            self.method, path, self.status, _ms(self.first_byte or 0))
+        line += ", transfer {0}, {1:.1f} KiB".format(
+            _ms(self.transfer), self.bytes / KIB)
+        if self.json:
+            line += ", json {0}".format(_ms(self.json))
+        if self.format:
+            line += ", format {0}".format(_ms(self.format))
+        return line
+
+
+class TimedResponse(object):
+    """
+    Wraps an HTTP response to count the bytes of its body and the time
+    spent reading them.
+    """
+    def __init__(self, response, timing):
+        self._response = response
+        self.timing = timing
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def read(self, amt=None):
+        started = self.timing.clock()
+        if amt is None:
+            data = self._response.read()
+        else:
+            data = self._response.read(amt)
+        self.timing.transfer += self.timing.clock() - started
+        self.timing.bytes += len(data)
+        return data
+
+
+class Timings(object):
+    """
+    Durations of the phases of a command, some of which, such as connecting
+    or resolving credentials, may be repeated, and timings of each of its
+    requests. Requests are only timed when enabled.
+    """
+    def __init__(self, started=None, clock=time):
+        self.clock = clock
+        self.started = clock() if started is None else started
+        self.enabled = False
+        self.phases = []
+        self._phases = {}
+        self.requests = []
+        self.current = None
+
+    def add(self, name, seconds):
+        if name not in self._phases:
+            self.phases.append(name)
+            self._phases[name] = [0.0, 0]
+        self._phases[name][0] += seconds
+        self._phases[name][1] += 1
+
+    def timed(self, name, func):
+        """
+        Return func wrapped to add the time of each of its calls to the
+        phase name.
+        """
+        def wrapper(*args, **kwargs):
+            started = self.clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(name, self.clock() - started)
+        return wrapper
+
+    def timed_connections(self, factory, name):
+        """
+        Return the connection factory wrapped so that connecting each new
+        connection, TLS handshake included, is timed as the phase name.
+        """
+        def create():
+            conn = factory()
+            conn.connect = self.timed(name, conn.connect)
+            return conn
+        return create
+
+    def start_request(self, method, url):
+        """
+        Return the RequestTiming of a request being sent, or None if
+        disabled.
+        """
+        if not self.enabled:
+            return None
+        timing = RequestTiming(method, url, self.clock)
+        self.requests.append(timing)
+        return timing
+
+    def add_step(self, name, seconds, timing=None):
+        """
+        Add seconds spent decoding ('json') or formatting ('format') the
+        result of the request timing, by default of the current request.
+        """
+        if timing is None:
+            timing = self.current
+        if timing is not None:
+            setattr(timing, name, getattr(timing, name) + seconds)
+
+    def report(self):
+        lines = ["Timing:"]
+        for name in self.phases:
+            seconds, count = self._phases[name]
+            line = "  {0:<20}{1:>10}".format(name, _ms(seconds))
+            if count > 1:
+                line += " ({0} times)".format(count)
+            lines.append(line)
+        for timing in self.requests[:MAX_LISTED_REQUESTS]:
+            lines.append("  " + timing.describe())
+        if len(self.requests) > MAX_LISTED_REQUESTS:
+            lines.append("  ... {0} more requests".format(
+                len(self.requests) - MAX_LISTED_REQUESTS))
+        if len(self.requests) > 1:
+            lines.extend(self._summarize_requests())
+        lines.append("  {0:<20}{1:>10}".format(
+            "total", _ms(self.clock() - self.started)))
+        return "\n".join(lines)
+
+    def _summarize_requests(self):
+        first_bytes = [timing.first_byte for timing in self.requests
+                       if timing.first_byte is not None]
+        lines = ["  requests: {0}, {1:.1f} KiB, transfer {2}".format(
+            len(self.requests),
+            sum(timing.bytes for timing in self.requests) / KIB,
+            _ms(sum(timing.transfer for timing in self.requests)))]
+        if first_bytes:
+            lines.append("  first byte: " + ", ".join(
+                ["p{0} {1}".format(percent,
+                                   _ms(percentile(first_bytes, percent)))
+                 for percent in PERCENTILES] +
+                ["max " + _ms(max(first_bytes))]))
+        return lines
@@ -0,0 +1,109 @@
+"""
+Spans of the execution of a litp command, written with --trace-file in the
+Chrome trace-event format for timeline and flame graph viewers, e.g.
+chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import json
+import os
+import thread
+from time import time
+
+
+class Span(object):
+    """
+    A timed section of a command; its args are attributes shown by the
+    viewer and may be added to until the span is closed.
+    """
+    def __init__(self, trace, name, category, args):
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.args = args
+        self.started = None
+
+    def __enter__(self):
+        self.started = self.trace.clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace.add(self.name, self.category, self.started,
+                       self.trace.clock() - self.started, self.args)
+
+
+class Trace(object):
+    """
+    Collects the spans of a command as complete ('X') trace events. Spans
+    of a thread nest by time, so a span opened within another is shown
+    below it.
+    """
+    def __init__(self, started=None, clock=time):
+        self.clock = clock
+        self.started = clock() if started is None else started
+        self.pid = os.getpid()
+        self.events = []
+
+    def span(self, name, category, **args):
+        return Span(self, name, category, args)
+
+    def add(self, name, category, started, duration, args=None):
+        # Trace-event times are in microseconds
+        self.events.append({
+            'name': name, 'cat': category, 'ph': 'X',
+            'ts': int(round((started - self.started) * 1e6)),
+            'dur': int(round(duration * 1e6)),
+            'pid': self.pid, 'tid': thread.get_ident(),
+            'args': args or {}})
+
+    def write(self, filename):
+        with open(filename, 'w') as fobj:
+            json.dump({'traceEvents': self.events,
+                       'displayTimeUnit': 'ms'}, fobj)
+
+
+class NullTrace(object):
+    """
+    Trace discarding its spans, used unless a trace file is requested.
+    """
+    def span(self, name, category, **args):
+        # Each span gets its own args, which callers may set from several
+        # threads
+        return NullSpan()
+
+    def add(self, name, category, started, duration, args=None):
+        pass
+
+
+class NullSpan(object):
+    def __init__(self):
+        self.args = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+class TracedResponse(object):
+    """
+    Wraps an HTTP response to add the bytes of its body to a span.
+    """
+    def __init__(self, response, span):
+        self._response = response
+        self._span = span
+        span.args.setdefault('bytes', 0)
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def read(self, amt=None):
+        if amt is None:
+            data = self._response.read()
+        else:
+            data = self._response.read(amt)
+        self._span.args['bytes'] += len(data)
+        return data
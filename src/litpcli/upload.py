@@ -0,0 +1,108 @@
+"""
+Streaming of request bodies read from local files, used by litp load.
+"""
+
+import os
+import tempfile
+from time import time
+
+from litpcli.compression import gzip_compress_file
+
+MIB = 1024.0 * 1024
+REPORT_INTERVAL = 1.0
+
+
+def body_size(fobj):
+    """
+    Return the size of the file underlying fobj, from its current position.
+    """
+    size = getattr(fobj, 'size', None)
+    if size is None:
+        size = os.fstat(fobj.fileno()).st_size - fobj.tell()
+    return size
+
+
+class UploadProgress(object):
+    """
+    Reports the progress and throughput of an upload on a stream, at most
+    once every REPORT_INTERVAL seconds.
+    """
+    def __init__(self, total, write, clock=time):
+        self.total = total
+        self.write = write
+        self.clock = clock
+        self.sent = 0
+        self.started = clock()
+        self.reported = self.started
+
+    def _rate(self, now):
+        elapsed = now - self.started
+        if elapsed <= 0:
+            return 0.0
+        return self.sent / MIB / elapsed
+
+    def update(self, sent):
+        self.sent += sent
+        now = self.clock()
+        if now - self.reported >= REPORT_INTERVAL:
+            self.reported = now
+            percent = 100 * self.sent / self.total if self.total else 100
+            self.write("Uploaded {0:.1f} of {1:.1f} MiB ({2}%), {3:.1f} MiB/s"
+                       .format(self.sent / MIB, self.total / MIB, percent,
+                               self._rate(now)))
+
+    def finish(self):
+        now = self.clock()
+        self.write("Uploaded {0:.1f} MiB in {1:.1f}s, {2:.1f} MiB/s".format(
+            self.sent / MIB, now - self.started, self._rate(now)))
+
+
+class UploadBody(object):
+    """
+    File body read by httplib in blocks as the request is sent, so that the
+    file is never held in memory; reports each block to an optional
+    UploadProgress.
+    """
+    def __init__(self, fobj, progress=None):
+        self.fobj = fobj
+        self.size = body_size(fobj)
+        self.progress = progress
+        self._finished = False
+
+    def read(self, amt=-1):
+        data = self.fobj.read(amt)
+        if self.progress is not None:
+            if data:
+                self.progress.update(len(data))
+            elif not self._finished:
+                self._finished = True
+                self.progress.finish()
+        return data
+
+    def seek(self, offset, whence=0):
+        self.fobj.seek(offset, whence)
+        if self.progress is not None and self.fobj.tell() == 0:
+            # The body is being resent from the start
+            self.progress.sent = 0
+            self._finished = False
+
+    def tell(self):
+        return self.fobj.tell()
+
+
+def file_body(fobj, compress=False, write_progress=None):
+    """
+    Return an UploadBody streaming the whole file from disk, compressed
+    through a temporary file if required, and reporting progress with
+    write_progress if given.
+    """
+    fobj.seek(0)
+    if compress:
+        compressed = tempfile.TemporaryFile()
+        gzip_compress_file(fobj, compressed)
+        compressed.seek(0)
+        fobj = compressed
+    body = UploadBody(fobj)
+    if write_progress is not None:
+        body.progress = UploadProgress(body.size, write_progress)
+    return body
@@ -0,0 +1,273 @@
+"""
+Splitting of model XML files into subtrees, used by litp load --parallel to
+load independent parts of the model concurrently, and stitching of
+subtrees exported concurrently by litp export --parallel.
+
+Items are the elements with an id attribute; their other child elements
+are properties. The file is parsed incrementally and each subtree is
+written to its own file as soon as it ends, so that at most one subtree
+is held in memory.
+"""
+
+import os
+import re
+from xml.sax.saxutils import quoteattr
+
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+from litpcli.paths import nearest_ancestor
+
+ROOT_TAG = 'root'
+SOURCE_ATTRIBUTE = 'source_path'
+COLLECTION_TYPE_PREFIXES = ('collection-of-', 'ref-collection-of-')
+DEFAULT_INDENT = '  '
+START_TAG_RE = re.compile(r'<([\w.-]+:)?[\w.-]+')
+ID_ATTRIBUTE_RE = re.compile(r'\sid="[^"]*"')
+SOURCE_ATTRIBUTE_RE = re.compile(r'\ssource_path="[^"]*"')
+NAMESPACE_ATTRIBUTE_RE = re.compile(
+    r'\s+(?:xmlns(?::[\w.-]+)?|xsi:schemaLocation)="[^"]*"')
+EMPTY_ELEMENT_RE = re.compile(r'\s*/>(\s*)$')
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _is_item(element):
+    return element.get('id') is not None
+
+
+def item_counts(fobj):
+    """
+    Return the number of items at each depth of an XML file, the depth of
+    the top element being 0.
+    """
+    counts = []
+    depth = -1
+    for event, element in ElementTree.iterparse(fobj,
+                                                events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if _is_item(element):
+                if len(counts) <= depth:
+                    counts.append(0)
+                counts[depth] += 1
+        else:
+            depth -= 1
+            element.clear()
+    return counts
+
+
+def split_depth(counts, min_subtrees):
+    """
+    Return the shallowest depth with at least min_subtrees items, or the
+    depth with the most items below the top element.
+    """
+    for depth, count in enumerate(counts[1:], 1):
+        if count >= min_subtrees:
+            return depth
+    if len(counts) < 2:
+        return None
+    return max(range(1, len(counts)), key=lambda depth: counts[depth])
+
+
+class SplitError(Exception):
+    pass
+
+
+class Subtree(object):
+    """
+    An item and its descendants, written to filename, to load below the
+    item at parent; sources are the paths of the items it inherits from.
+    """
+    __slots__ = ('path', 'parent', 'filename', 'sources')
+
+    def __init__(self, path, parent, filename, sources):
+        self.path = path
+        self.parent = parent
+        self.filename = filename
+        self.sources = sources
+
+
+def _write(element, filename):
+    element.tail = None
+    with open(filename, 'wb') as fobj:
+        ElementTree.ElementTree(element).write(fobj, encoding='utf-8')
+
+
+def split_subtrees(fobj, load_path, depth, directory):
+    """
+    Split an XML file loaded at load_path into the subtrees of its items at
+    depth, written to directory, and the top of the model above them.
+
+    :return: the filename of the top of the model, the subtrees in
+        document order
+    """
+    stack = []
+    paths = []
+    subtrees = []
+    sources = set()
+    top_sources = set()
+    root = None
+    for event, element in ElementTree.iterparse(
+            fobj, events=('start', 'end', 'start-ns')):
+        if event == 'start-ns':
+            prefix, uri = element
+            if prefix:
+                # The subtrees are written with the prefixes of the file
+                ElementTree.register_namespace(prefix, uri)
+            continue
+        if event == 'start':
+            stack.append(element)
+            if root is None:
+                root = element
+                if _local_name(element.tag) == ROOT_TAG:
+                    paths.append('/')
+                else:
+                    paths.append(load_path.rstrip('/') + '/' +
+                                 element.get('id', ''))
+            elif _is_item(element):
+                paths.append(paths[-1].rstrip('/') + '/' + element.get('id'))
+            else:
+                paths.append(paths[-1])
+            source = element.get(SOURCE_ATTRIBUTE)
+            if source is not None:
+                if len(stack) > depth:
+                    sources.add(source.rstrip('/'))
+                else:
+                    top_sources.add((paths[-1], source.rstrip('/')))
+            continue
+        stack.pop()
+        path = paths.pop()
+        if len(stack) != depth or not _is_item(element):
+            continue
+        # Subtrees are standalone documents, with the schema of the file
+        for name, value in root.attrib.items():
+            if name != 'id' and element.get(name) is None:
+                element.set(name, value)
+        filename = os.path.join(directory, '{0}.xml'.format(len(subtrees)))
+        _write(element, filename)
+        subtrees.append(Subtree(path, paths[-1], filename, sources))
+        sources = set()
+        stack[-1].remove(element)
+    # The top of the model is loaded before the subtrees
+    subtree_paths = set(subtree.path for subtree in subtrees)
+    for path, source in top_sources:
+        if _containing(source, subtree_paths) is not None:
+            raise SplitError("{0} inherits from {1}, which is loaded after"
+                             " it".format(path, source))
+    top = os.path.join(directory, 'top.xml')
+    _write(root, top)
+    return top, subtrees
+
+
+def _containing(path, paths):
+    if path in paths:
+        return path
+    return nearest_ancestor(path, paths)
+
+
+def subtree_dependencies(subtrees):
+    """
+    Return the paths of the subtrees each subtree waits for: those holding
+    the items it inherits from.
+    """
+    paths = set(subtree.path for subtree in subtrees)
+    depends_on = {}
+    for subtree in subtrees:
+        waits_for = set(_containing(source, paths)
+                        for source in subtree.sources)
+        waits_for.discard(None)
+        waits_for.discard(subtree.path)
+        depends_on[subtree.path] = waits_for
+    return depends_on
+
+
+def _read_start_tag(fobj):
+    """
+    Return the XML declaration of an exported file and the start tag of its
+    top element, which may span several lines.
+    """
+    declaration = None
+    start_tag = ''
+    for line in fobj:
+        if not start_tag and declaration is None and \
+                line.startswith('<?xml'):
+            declaration = line
+            continue
+        start_tag += line
+        if start_tag.rstrip().endswith('>') and start_tag.count('"') % 2 == 0:
+            break
+    return declaration, start_tag
+
+
+def _head(filename):
+    """
+    Return the XML declaration, the start tag of the top element and the
+    indentation of an exported file.
+    """
+    indent = DEFAULT_INDENT
+    with open(filename, 'rb') as fobj:
+        declaration, start_tag = _read_start_tag(fobj)
+        line = next(fobj, '')
+        content = line.lstrip(' ')
+        if content.startswith('<') and len(content) < len(line):
+            indent = line[:len(line) - len(content)]
+    return declaration, start_tag, indent
+
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+def can_stitch(item):
+    """
+    Tell whether the element of an item in an export is known from its
+    REST representation alone, so that stitch_subtrees reproduces the
+    export of the item exactly. The element of a collection is named in
+    the XSD after its parent rather than after its item type, that of an
+    inherited item carries its source and the order of the properties is
+    that of the XSD, none of which the REST API tells.
+    """
+    return not item.get('item-type-name', '').startswith(
+        COLLECTION_TYPE_PREFIXES) and \
+        'inherited-from' not in item.get('_links', {}) and \
+        not item.get('properties')
+
+
+def stitch_subtrees(fobj, item, filenames):
+    """
+    Write to fobj the XML export of an item from the exports of each of its
+    children, in the layout of the exports: the top element of the item
+    takes the place of that of the first export, with its namespace
+    declarations, and the children are indented below it.
+
+    :param item: the REST representation of the item, for which can_stitch
+        holds
+    """
+    declaration, top, indent = _head(filenames[0])
+    prefix = START_TAG_RE.match(top.lstrip()).group(1) or ''
+    tag = prefix + item['item-type-name']
+    attributes = ' id=' + quoteattr(_encode(item.get('id') or ROOT_TAG))
+    top = SOURCE_ATTRIBUTE_RE.sub('', top.lstrip())
+    top = ID_ATTRIBUTE_RE.sub(lambda match: attributes, top, 1)
+    top = EMPTY_ELEMENT_RE.sub(r'>\1', START_TAG_RE.sub('<' + tag, top, 1))
+
+    if declaration is not None:
+        fobj.write(declaration)
+    fobj.write(top)
+    for filename in filenames:
+        with open(filename, 'rb') as part:
+            start_tag = _read_start_tag(part)[1]
+            fobj.write(indent + NAMESPACE_ATTRIBUTE_RE.sub('', start_tag))
+            for line in part:
+                # Lines continuing multi-line values are left as they are
+                if line.lstrip(' ').startswith('<'):
+                    line = indent + line
+                fobj.write(line)
+    fobj.write('</{0}>\n'.format(tag))
@@ -0,0 +1,389 @@
+"""
+Benchmark of the CliFormatter callbacks over generated fixtures of growing
+size, recording the time and peak memory of each callback and flagging
+regressions against a stored baseline. Example::
+
+    PYTHONPATH=src python test/bench_formatter.py --sizes 1000,10000 \\
+        --baseline /tmp/bench_formatter.json --update-baseline
+
+and, after a formatter change::
+
+    PYTHONPATH=src python test/bench_formatter.py \\
+        --baseline /tmp/bench_formatter.json
+
+which exits with 1 if any callback got slower or bigger by more than the
+tolerance. Baselines are specific to the machine they were recorded on.
+
+The fixtures follow the shapes of test/sample_json_output.py and are
+passed to the callbacks as JSON, as the litp command does, or as the
+ModelTree that litp show -r reads. Each callback
+runs in a forked process so that the peak memory of one does not hide
+that of the next.
+
+Not shipped in the RPM.
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import sys
+from time import time
+
+from litpcli.formatter import CliFormatter
+from litpcli.model import ModelTree
+
+BASE_URL = "https://localhost:9999/litp/rest/v1"
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.25
+# Differences below these are noise, whatever the tolerance
+TIME_NOISE = 0.01
+MEMORY_NOISE_KIB = 1024
+ITEMS_PER_NODE = 10
+TASK_STATES = ('Initial', 'Running', 'Success', 'Failed')
+
+
+def links(path, item_type):
+    return {"self": {"href": BASE_URL + path},
+            "item-type": {"href": BASE_URL + "/item-types/" + item_type}}
+
+
+def item(path, item_type, properties=None, children=None):
+    data = {"_links": links(path, item_type),
+            "id": path.rsplit('/', 1)[-1],
+            "item-type-name": item_type,
+            "state": "Initial",
+            "applied_properties_determinable": True}
+    if properties is not None:
+        data["properties"] = properties
+    if children is not None:
+        data["_embedded"] = {"item": children}
+    return data
+
+
+def collection(path, item_type, children):
+    data = item(path, "collection-of-" + item_type, children=children)
+    data["_links"]["collection-of"] = {
+        "href": BASE_URL + "/item-types/" + item_type}
+    return data
+
+
+def package(path, number):
+    return item(path, "package", {"name": "package-%d" % number,
+                                  "version": "1.0.%d" % number,
+                                  "ensure": "installed"})
+
+
+def show_flat_fixture(size):
+    """
+    A collection of size packages, as shown by litp show.
+    """
+    path = "/software/items"
+    return collection(path, "software-item", [
+        item("%s/package%d" % (path, number), "package")
+        for number in xrange(size)])
+
+
+def show_recursive_fixture(size):
+    """
+    A deployment of size items in nodes of ITEMS_PER_NODE packages each, as
+    embedded by litp show -r.
+    """
+    nodes = []
+    path = "/deployments/d1/clusters/c1/nodes"
+    for node_no in xrange(max(1, size // (ITEMS_PER_NODE + 2))):
+        node_path = "%s/node%d" % (path, node_no)
+        items = [package("%s/items/package%d" % (node_path, number), number)
+                 for number in xrange(ITEMS_PER_NODE)]
+        nodes.append(item(node_path, "node",
+                          {"hostname": "node%d" % node_no},
+                          [collection(node_path + "/items", "software-item",
+                                      items)]))
+    return item("/deployments/d1", "deployment", {}, [
+        item("/deployments/d1/clusters/c1", "cluster", {"ha_manager": ""},
+             [collection(path, "node", nodes)])])
+
+
+def show_tree_fixture(size):
+    """
+    The deployment of show_recursive_fixture, as read by litp show -r.
+    """
+    tree = ModelTree(BASE_URL)
+    tree.add_tree(show_recursive_fixture(size))
+    return tree
+
+
+def path_completion_fixture(size):
+    """
+    A collection of size packages and references, as listed for completion.
+    """
+    fixture = show_flat_fixture(size)
+    for number, child in enumerate(fixture["_embedded"]["item"]):
+        if number % 2:
+            child["item-type-name"] = "reference-to-package"
+            child["_links"]["reference-to"] = {
+                "href": BASE_URL + "/item-types/package"}
+    return fixture
+
+
+def item_type_fixture(size):
+    """
+    An item type of size properties and structured fields.
+    """
+    path = "/item-types/big-item"
+    fields = [{"_links": {"self": {"href": BASE_URL + path + "/f%d" % n},
+                          "collection-of": {
+                              "href": BASE_URL + "/item-types/package"}},
+               "id": "f%d" % n, "min": 0, "max": 9999}
+              for n in xrange(size // 2)]
+    properties = dict(("p%d" % n, {
+        "_links": {"self": {"href": BASE_URL + path + "/p%d" % n},
+                   "reference-to": {
+                       "href": BASE_URL + "/property-types/basic_string"}},
+        "description": "Property %d." % n, "required": False,
+        "site_specific": False, "regex": "^.*$"})
+        for n in xrange(size - size // 2))
+    data = {"_links": {"self": {"href": BASE_URL + path}},
+            "id": "big-item", "description": "Benchmark item type.",
+            "properties": properties}
+    data["_embedded"] = {"item": fields}
+    return data
+
+
+def show_plan_fixture(size):
+    """
+    A plan of size tasks in phases of ten tasks each.
+    """
+    url = BASE_URL + "/plans/plan"
+    phases = []
+    for phase_no in xrange(max(1, size // 10)):
+        phase_url = "%s/phases/%d" % (url, phase_no + 1)
+        tasks = [{"_links": {"self": {"href": "%s/tasks/t%d" % (phase_url,
+                                                                 task_no)},
+                             "rel": {"href": BASE_URL +
+                                     "/deployments/d1/clusters/c1/nodes/"
+                                     "node%d/items/package%d" % (phase_no,
+                                                                 task_no)}},
+                  "id": "t%d" % task_no, "item-type-name": "task",
+                  "state": TASK_STATES[task_no % len(TASK_STATES)],
+                  "description": "Install package %d on node %d" % (
+                      task_no, phase_no)}
+                 for task_no in xrange(10)]
+        phases.append({"_links": {"self": {"href": phase_url}},
+                       "_embedded": {"item": [{
+                           "_links": {"self": {"href": phase_url + "/tasks"}},
+                           "_embedded": {"item": tasks},
+                           "id": "tasks",
+                           "item-type-name": "collection-of-task"}]},
+                       "id": str(phase_no + 1), "item-type-name": "phase"})
+    return {"_links": {"self": {"href": url}},
+            "_embedded": {"item": [{
+                "_links": {"self": {"href": url + "/phases"}},
+                "_embedded": {"item": phases},
+                "id": "phases", "item-type-name": "collection-of-phase"}]},
+            "id": "plan", "item-type-name": "plan",
+            "properties": {"state": "running"}}
+
+
+def error_fixture(size):
+    """
+    A validation error response of size messages.
+    """
+    return {"messages": [{
+        "_links": {"self": {"href": BASE_URL +
+                            "/software/items/package%d" % n}},
+        "type": "ValidationError", "property_name": "name",
+        "message": "Invalid value 'package %d'." % n}
+        for n in xrange(size)]}
+
+
+# name: (callback, fixture, keyword arguments of the callback)
+BENCHMARKS = [
+    ('show', 'cb_format_show', show_flat_fixture, {}),
+    ('show_recursive', 'cb_format_show', show_recursive_fixture,
+     {'recursive': True}),
+    ('show_tree', 'cb_format_show', show_tree_fixture, {'recursive': True}),
+    ('paths_as_tree', 'cb_format_paths_as_tree', show_recursive_fixture,
+     {'recursive': True}),
+    ('path_list', 'cb_format_path_list', show_recursive_fixture,
+     {'recursive': True}),
+    ('path_list_tree', 'cb_format_path_list', show_tree_fixture,
+     {'recursive': True}),
+    ('path_completion', 'cb_format_path_completion',
+     path_completion_fixture, {}),
+    # cb_format_item_type is reached through cb_format_show, which decodes
+    # the item type for it
+    ('item_type', 'cb_format_show', item_type_fixture, {}),
+    ('show_plan', 'cb_format_show_plan', show_plan_fixture, {}),
+    ('error', 'cb_format_error', error_fixture, {}),
+]
+
+
+def _memory_kib(field):
+    # Resident and peak resident memory in KiB, from /proc where available
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except IOError:
+        pass
+    return None
+
+
+def _reset_peak_memory():
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except IOError:
+        return False
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def measure(callback, fixture, kwargs, size, repeat):
+    """
+    Return the median time in seconds of repeat calls of the callback on a
+    fixture of size items, and the peak memory in KiB used by the calls.
+    """
+    formatter = CliFormatter(BASE_URL, {})
+    data = fixture(size)
+    if not isinstance(data, ModelTree):
+        data = json.dumps(data)
+    gc.collect()
+    if _reset_peak_memory():
+        before = _memory_kib('VmRSS')
+    else:
+        # Only a growth beyond the peak of building the fixture is seen
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    for _ in xrange(repeat):
+        started = time()
+        getattr(formatter, callback)(data, **kwargs)
+        times.append(time() - started)
+    peak = _memory_kib('VmHWM')
+    if peak is None or before is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'time': median(times), 'peak_kib': max(0, peak - before)}
+
+
+def measure_in_child(callback, fixture, kwargs, size, repeat):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        status = 0
+        try:
+            result = measure(callback, fixture, kwargs, size, repeat)
+            os.write(write_fd, json.dumps(result))
+        except BaseException as e:
+            os.write(write_fd, json.dumps({'error': repr(e)}))
+            status = 1
+        os._exit(status)
+    os.close(write_fd)
+    chunks = []
+    while True:
+        chunk = os.read(read_fd, 4096)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    if not chunks:
+        return {'error': 'benchmark process died'}
+    return json.loads(''.join(chunks))
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return a message for each result more than tolerance worse than its
+    baseline, and by more than the noise of its measurement.
+    """
+    regressions = []
+    for name, sizes in sorted(results.items()):
+        for size, result in sorted(sizes.items(), key=lambda s: int(s[0])):
+            base = baseline.get(name, {}).get(size)
+            if not base or 'error' in result or 'error' in base:
+                continue
+            for key, unit, noise in (('time', 's', TIME_NOISE),
+                                     ('peak_kib', ' KiB', MEMORY_NOISE_KIB)):
+                if result[key] - base[key] <= noise:
+                    continue
+                if result[key] > base[key] * (1 + tolerance):
+                    regressions.append(
+                        "{0} ({1} items): {2} {3:.3f}{4} was {5:.3f}{4}"
+                        .format(name, size, key, result[key], unit,
+                                base[key]))
+    return regressions
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the litp output formatters")
+    parser.add_argument('--sizes', default=','.join(
+        str(size) for size in DEFAULT_SIZES),
+        help="Comma separated fixture sizes, e.g. 1000,10000,1000000")
+    parser.add_argument('--only', action='append', metavar='NAME',
+                        choices=[bench[0] for bench in BENCHMARKS],
+                        help="Benchmark to run, all by default")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="Calls per measurement, the median is kept")
+    parser.add_argument('--baseline', metavar='FILE',
+                        help="Baseline JSON file to compare against")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Write the results to the baseline file")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown or growth, "
+                             "default %(default)s")
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = {}
+    print "%-18s%10s%12s%14s" % ('callback', 'items', 'time (s)', 'peak (KiB)')
+    for name, callback, fixture, kwargs in BENCHMARKS:
+        if args.only and name not in args.only:
+            continue
+        for size in sizes:
+            result = measure_in_child(callback, fixture, kwargs, size,
+                                      args.repeat)
+            results.setdefault(name, {})[str(size)] = result
+            if 'error' in result:
+                print "%-18s%10d  %s" % (name, size, result['error'])
+            else:
+                print "%-18s%10d%12.4f%14d" % (name, size, result['time'],
+                                                result['peak_kib'])
+            sys.stdout.flush()
+
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as fobj:
+                baseline = json.load(fobj)
+        for name, sizes in results.items():
+            baseline.setdefault(name, {}).update(sizes)
+        with open(args.baseline, 'w') as fobj:
+            json.dump(baseline, fobj, indent=4, sort_keys=True)
+        return 0
+    with open(args.baseline) as fobj:
+        regressions = compare(results, json.load(fobj), args.tolerance)
+    for regression in regressions:
+        print >> sys.stderr, "Regression: " + regression
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
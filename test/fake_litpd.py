@@ -0,0 +1,636 @@
+"""
+Fake litpd serving a synthetic deployment model, for benchmarking the CLI's
+I/O paths and for offline testing without a management server.
+
+It follows the REST shapes the CLI expects for items, item types, plans
+and XML, over a unix socket and/or HTTPS, with keep-alive connections and
+gzip responses. Latency, 503 errors and dropped connections can be
+injected. Example::
+
+    python test/fake_litpd.py --unix-socket /tmp/litpd.sock --nodes 200 \\
+        --latency 0.005 --error-rate 0.01
+
+and, with ``unix_socket_path = /tmp/litpd.sock`` in ~/.litprc::
+
+    PYTHONPATH=src python src/litpcli/litp.py show -p / -r
+
+Not shipped in the RPM.
+"""
+
+import argparse
+import BaseHTTPServer
+import json
+import os
+import random
+import shutil
+import socket
+import SocketServer
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urlparse
+import zlib
+from xml.sax.saxutils import escape, quoteattr
+
+REST_PATH = "/litp/rest/v1"
+XML_PATH = "/litp/xml"
+DEFAULT_BASE = "https://localhost:9999"
+GZIP_MIN_SIZE = 1024
+SHUTDOWN_POLL_INTERVAL = 0.05
+XMLNS = "http://www.ericsson.com/litp"
+
+ITEM_TYPES = {
+    'root': 'Root of the deployment model.',
+    'deployment': 'A deployment of clusters.',
+    'cluster': 'A cluster of nodes.',
+    'node': 'A managed node.',
+    'ms': 'The management server.',
+    'package': 'A software package.',
+    'ip-range': 'A range of IP addresses.',
+    'collection-of-node': 'Collection of node items.',
+    'collection-of-cluster': 'Collection of cluster items.',
+    'collection-of-deployment': 'Collection of deployment items.',
+    'collection-of-software-item': 'Collection of software items.',
+    'software': 'Software of the deployment.',
+}
+
+
+class Item(object):
+    __slots__ = ('item_id', 'item_type', 'state', 'properties', 'children')
+
+    def __init__(self, item_id, item_type, properties=None,
+                 state='Applied'):
+        self.item_id = item_id
+        self.item_type = item_type
+        self.state = state
+        self.properties = properties or {}
+        self.children = []
+
+
+class Model(object):
+    """
+    Synthetic deployment model of nodes, each with items, plus a plan of
+    tasks spread over phases.
+    """
+    def __init__(self, nodes=10, items_per_node=20, phases=5,
+                 tasks_per_node=10, tasks_per_poll=10):
+        self.lock = threading.Lock()
+        self.items = {}
+        self.tasks_per_poll = tasks_per_poll
+        self.nodes = nodes
+        self.phases = phases
+        self.tasks_per_node = tasks_per_node
+        self.plan = None
+
+        self._add('', Item('', 'root'))
+        self._add('/ms', Item('ms', 'ms', {'hostname': 'ms1'}))
+        self._add('/software', Item('software', 'software'))
+        self._add('/software/items',
+                  Item('items', 'collection-of-software-item'))
+        self._add('/deployments',
+                  Item('deployments', 'collection-of-deployment'))
+        self._add('/deployments/d1', Item('d1', 'deployment'))
+        self._add('/deployments/d1/clusters',
+                  Item('clusters', 'collection-of-cluster'))
+        self._add('/deployments/d1/clusters/c1', Item('c1', 'cluster'))
+        self._add('/deployments/d1/clusters/c1/nodes',
+                  Item('nodes', 'collection-of-node'))
+        for node_no in range(1, nodes + 1):
+            path = '/deployments/d1/clusters/c1/nodes/node%d' % node_no
+            self._add(path, Item('node%d' % node_no, 'node',
+                                 {'hostname': 'node%d' % node_no}))
+            for item_no in range(1, items_per_node + 1):
+                self._add('%s/ip%d' % (path, item_no), Item(
+                    'ip%d' % item_no, 'ip-range',
+                    {'network_name': 'net%d' % item_no,
+                     'address': '10.%d.%d.%d' % (item_no // 250,
+                                                 item_no % 250,
+                                                 node_no % 250)}))
+
+    def _add(self, path, item):
+        self.items[path] = item
+        if path:
+            parent = self.items[path.rsplit('/', 1)[0]]
+            parent.children.append(item.item_id)
+
+    def get(self, path):
+        return self.items.get(path.rstrip('/'))
+
+    def create(self, parent_path, item_id, item_type, properties):
+        path = parent_path.rstrip('/') + '/' + item_id
+        if path in self.items:
+            return None
+        item = Item(item_id, item_type, properties, 'Initial')
+        self._add(path, item)
+        return path
+
+    def remove(self, path):
+        path = path.rstrip('/')
+        for child_path in [p for p in self.items if
+                           p.startswith(path + '/')]:
+            del self.items[child_path]
+        item = self.items.pop(path)
+        parent = self.items[path.rsplit('/', 1)[0]]
+        parent.children.remove(item.item_id)
+
+    def create_plan(self):
+        tasks = []
+        for node_no in range(1, self.nodes + 1):
+            for task_no in range(1, self.tasks_per_node + 1):
+                tasks.append({
+                    'id': 'task_node%d_%d' % (node_no, task_no),
+                    'state': 'Initial',
+                    'description': 'Configure item %d on node%d' % (
+                        task_no, node_no),
+                    'rel': '/deployments/d1/clusters/c1/nodes/node%d' %
+                           node_no})
+        phases = [[] for _ in range(self.phases)]
+        for task_no, task in enumerate(tasks):
+            phases[task_no * self.phases // len(tasks)].append(task)
+        self.plan = {'state': 'initial', 'phases': phases}
+
+    def advance_plan(self):
+        """
+        Complete the next tasks_per_poll tasks of a running plan.
+        """
+        if self.plan is None or self.plan['state'] != 'running':
+            return
+        remaining = self.tasks_per_poll
+        for phase in self.plan['phases']:
+            for task in phase:
+                if task['state'] in ('Initial', 'Running') and remaining:
+                    task['state'] = 'Success'
+                    remaining -= 1
+            if remaining == 0:
+                for task in phase:
+                    if task['state'] == 'Initial':
+                        task['state'] = 'Running'
+                return
+        self.plan['state'] = 'successful'
+
+
+def links(base, path, item_type):
+    return {'self': {'href': base + REST_PATH + path},
+            'item-type': {'href': base + REST_PATH + '/item-types/' +
+                          item_type}}
+
+
+def item_json(base, path, item, embed_children=True, model=None, depth=0):
+    data = {
+        'id': item.item_id or 'root',
+        'item-type-name': item.item_type,
+        'state': item.state,
+        'applied_properties_determinable': True,
+        'properties': item.properties,
+        '_links': links(base, path, item.item_type),
+        'messages': []}
+    if embed_children:
+        children = []
+        for child_id in item.children:
+            child_path = path.rstrip('/') + '/' + child_id
+            child = model.items[child_path]
+            if depth > 0:
+                children.append(item_json(base, child_path, child,
+                                          model=model, depth=depth - 1))
+                continue
+            children.append({
+                'id': child.item_id,
+                'item-type-name': child.item_type,
+                'state': child.state,
+                '_links': links(base, child_path, child.item_type)})
+        data['_embedded'] = {'item': children}
+    return data
+
+
+def plan_json(base, plan):
+    url = base + REST_PATH + '/plans/plan'
+    phases = []
+    for phase_no, phase in enumerate(plan['phases']):
+        phase_url = '%s/phases/%d' % (url, phase_no + 1)
+        tasks = [{
+            '_links': {
+                'self': {'href': '%s/tasks/%s' % (phase_url, task['id'])},
+                'type': {'href': base + REST_PATH + '/item-types/task'},
+                'rel': {'href': base + REST_PATH + task['rel']}},
+            'id': task['id'], 'item-type-name': 'task',
+            'state': task['state'], 'description': task['description'],
+            'call_id': task['id'], 'call_type': 'fake'} for task in phase]
+        phases.append({
+            '_links': {'self': {'href': phase_url}},
+            '_embedded': {'item': [{
+                '_links': {'self': {'href': phase_url + '/tasks'}},
+                '_embedded': {'item': tasks},
+                'id': str(phase_no + 1),
+                'item-type-name': 'collection-of-task',
+                'state': 'Initial', 'properties': {}}]},
+            'id': str(phase_no + 1), 'item-type-name': 'phase',
+            'state': 'Initial', 'properties': {}})
+    return {
+        '_links': {'self': {'href': url}},
+        '_embedded': {'item': [{
+            '_links': {'self': {'href': url + '/phases'}},
+            '_embedded': {'item': phases},
+            'id': 'phases', 'item-type-name': 'collection-of-phase',
+            'state': 'Initial', 'properties': {}}]},
+        'id': 'plan', 'item-type-name': 'plan',
+        'properties': {'state': plan['state']}, 'messages': []}
+
+
+def xml_tag(model, path, item):
+    # As in the XSD of litpd, collections are named after their parent and
+    # their id rather than after their item type
+    if item.item_type.startswith('collection-of-'):
+        parent = model.items[path.rsplit('/', 1)[0]]
+        return 'litp:%s-%s-collection' % (parent.item_type, item.item_id)
+    return 'litp:' + item.item_type
+
+
+def item_xml(model, path, item, out, indent=0):
+    pad = ' ' * indent
+    tag = xml_tag(model, path, item)
+    if indent == 0:
+        out.append('%s<%s xmlns:litp=%s id=%s>' % (
+            pad, tag, quoteattr(XMLNS), quoteattr(item.item_id or 'root')))
+    else:
+        out.append('%s<%s id=%s>' % (pad, tag, quoteattr(item.item_id)))
+    for name, value in sorted(item.properties.items()):
+        out.append('%s  <%s>%s</%s>' % (pad, name, escape(str(value)), name))
+    for child_id in item.children:
+        child_path = path.rstrip('/') + '/' + child_id
+        item_xml(model, child_path, model.items[child_path], out, indent + 2)
+    out.append('%s</%s>' % (pad, tag))
+
+
+def error_json(base, path, error_type, message):
+    return {'messages': [{
+        '_links': {'self': {'href': base + REST_PATH + path}},
+        'type': error_type, 'message': message}]}
+
+
+class FaultInjector(object):
+    """
+    Random latency, 503 responses and dropped connections.
+    """
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0,
+                 drop_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def _draw(self):
+        with self.lock:
+            return self.random.random(), self.random.random(), \
+                self.random.uniform(-self.jitter, self.jitter)
+
+    def apply(self):
+        """
+        Sleep for the injected latency and return 'drop', 'error' or None.
+        """
+        drop, error, jitter = self._draw()
+        delay = self.latency + jitter
+        if delay > 0:
+            time.sleep(delay)
+        if drop < self.drop_rate:
+            return 'drop'
+        if error < self.error_rate:
+            return 'error'
+        return None
+
+
+class FakeLitpdHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'fake_litpd/1.0'
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return str(self.client_address or 'unix')
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(
+                self, fmt, *args)
+
+    def _base(self, url):
+        if url.netloc:
+            return '%s://%s' % (url.scheme or 'https', url.netloc)
+        host = self.headers.get('host')
+        if host and not self.server.unix:
+            return 'https://' + host
+        return DEFAULT_BASE
+
+    def _read_body(self):
+        length = int(self.headers.get('content-length') or 0)
+        body = self.rfile.read(length) if length else ''
+        if self.headers.get('content-encoding') == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        return body
+
+    def _send(self, status, body, content_type='application/json',
+              headers=None):
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        accept = self.headers.get('accept-encoding') or ''
+        gzipped = 'gzip' in accept and len(body) >= GZIP_MIN_SIZE and \
+            self.server.compression
+        if gzipped:
+            compressor = zlib.compressobj(6, zlib.DEFLATED,
+                                          16 + zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        url = urlparse.urlparse(self.path)
+        base = self._base(url)
+        body = self._read_body()
+        fault = self.server.faults.apply()
+        if fault == 'drop':
+            self.close_connection = 1
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        if fault == 'error':
+            return self._send(503, error_json(
+                base, url.path.replace(REST_PATH, '', 1),
+                'ServerUnavailableError', 'Fake litpd is busy'),
+                headers={'Retry-After': '1'})
+        with self.server.model.lock:
+            if url.path.startswith(XML_PATH):
+                return self._handle_xml(method, base,
+                                        url.path[len(XML_PATH):], body)
+            if url.path.startswith(REST_PATH):
+                return self._handle_rest(method, base,
+                                         url.path[len(REST_PATH):], body,
+                                         urlparse.parse_qs(url.query))
+        self._send(404, {'messages': [{'type': 'InvalidLocationError',
+                                       'message': 'Not found'}]})
+
+    def _not_found(self, base, path):
+        self._send(404, error_json(base, path, 'InvalidLocationError',
+                                   'Not found'))
+
+    def _handle_xml(self, method, base, path, body):
+        model = self.server.model
+        item = model.get(path)
+        if item is None:
+            return self._not_found(base, path)
+        if method == 'GET':
+            out = ['<?xml version="1.0" encoding="utf-8"?>']
+            item_xml(model, path.rstrip('/'), item, out)
+            return self._send(200, '\n'.join(out) + '\n', 'application/xml')
+        if method == 'POST':
+            return self._send(201, item_json(base, path.rstrip('/'), item,
+                                             model=model))
+        self._send(405, error_json(base, path, 'MethodNotAllowedError',
+                                   'Method not allowed'))
+
+    def _handle_rest(self, method, base, path, body, query):
+        model = self.server.model
+        path = path.rstrip('/') or '/'
+        if path.startswith('/item-types'):
+            return self._handle_item_types(base, path)
+        if path.startswith('/plans'):
+            return self._handle_plans(method, base, path, body)
+        item_path = '' if path == '/' else path
+        item = model.get(item_path)
+        if method == 'POST':
+            if item is None:
+                return self._not_found(base, path)
+            data = json.loads(body or '{}')
+            item_type = data.get('type') or 'inherited'
+            new_path = model.create(item_path, data.get('id'), item_type,
+                                    data.get('properties'))
+            if new_path is None:
+                return self._send(422, error_json(
+                    base, path, 'ItemExistsError', 'Item already exists'))
+            return self._send(201, item_json(base, new_path,
+                                             model.get(new_path),
+                                             model=model))
+        if item is None:
+            return self._not_found(base, path)
+        if method == 'GET':
+            depth = int(query.get('recurse_depth', ['0'])[0])
+            return self._send(200, item_json(base, item_path or '/', item,
+                                             model=model, depth=depth))
+        if method == 'PUT':
+            data = json.loads(body or '{}')
+            for name, value in data.get('properties', {}).items():
+                if value is None:
+                    item.properties.pop(name, None)
+                else:
+                    item.properties[name] = value
+            item.state = 'Updated'
+            return self._send(200, item_json(base, item_path, item,
+                                             model=model))
+        if method == 'DELETE':
+            data = item_json(base, item_path, item, model=model)
+            model.remove(item_path)
+            return self._send(200, data)
+
+    def _handle_item_types(self, base, path):
+        url = base + REST_PATH + '/item-types'
+        if path == '/item-types':
+            return self._send(200, {
+                '_links': {'self': {'href': url}},
+                '_embedded': {'item-type': [
+                    {'_links': {'self': {'href': url + '/' + name}},
+                     'id': name, 'description': description}
+                    for name, description in sorted(ITEM_TYPES.items())]},
+                'id': 'item-types', 'messages': []})
+        name = path.rsplit('/', 1)[-1]
+        if name not in ITEM_TYPES:
+            return self._not_found(base, path)
+        self._send(200, {
+            '_links': {'self': {'href': url + '/' + name}},
+            '_embedded': {},
+            'id': name, 'description': ITEM_TYPES[name], 'messages': []})
+
+    def _handle_plans(self, method, base, path, body):
+        model = self.server.model
+        if method == 'POST' and path == '/plans':
+            model.create_plan()
+            return self._send(201, plan_json(base, model.plan))
+        if model.plan is None or path != '/plans/plan':
+            return self._send(404, error_json(
+                base, path, 'InvalidLocationError', 'Plan does not exist'))
+        if method == 'GET':
+            model.advance_plan()
+            return self._send(200, plan_json(base, model.plan))
+        if method == 'PUT':
+            state = json.loads(body or '{}').get('properties', {}).get(
+                'state')
+            if state in ('running', 'stopped'):
+                model.plan['state'] = state
+            return self._send(200, plan_json(base, model.plan))
+        if method == 'DELETE':
+            data = plan_json(base, model.plan)
+            model.plan = None
+            return self._send(200, data)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+class _ServerMixin(SocketServer.ThreadingMixIn):
+    daemon_threads = True
+    unix = False
+    verbose = False
+    compression = True
+
+
+class UnixHTTPServer(_ServerMixin, SocketServer.UnixStreamServer):
+    unix = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        SocketServer.UnixStreamServer.server_bind(self)
+        # BaseHTTPRequestHandler expects a TCP server's attributes
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+class HTTPSServer(_ServerMixin, BaseHTTPServer.HTTPServer):
+    allow_reuse_address = True
+
+    def __init__(self, address, handler, certfile, keyfile):
+        BaseHTTPServer.HTTPServer.__init__(self, address, handler)
+        self.socket = ssl.wrap_socket(self.socket, certfile=certfile,
+                                      keyfile=keyfile, server_side=True)
+
+
+def self_signed_certificate(directory):
+    """
+    Create a throwaway self-signed certificate with the openssl command.
+    """
+    certfile = os.path.join(directory, 'cert.pem')
+    keyfile = os.path.join(directory, 'key.pem')
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(
+            ['openssl', 'req', '-x509', '-nodes', '-newkey', 'rsa:2048',
+             '-days', '1', '-subj', '/CN=localhost', '-keyout', keyfile,
+             '-out', certfile], stdout=devnull, stderr=devnull)
+    return certfile, keyfile
+
+
+class FakeLitpd(object):
+    """
+    Runs the fake service on a unix socket and/or HTTPS port in background
+    threads.
+    """
+    def __init__(self, model=None, faults=None, compression=True,
+                 verbose=False):
+        self.model = model or Model()
+        self.faults = faults or FaultInjector()
+        self.compression = compression
+        self.verbose = verbose
+        self.servers = []
+        self._tmpdir = None
+
+    def _start(self, server):
+        server.model = self.model
+        server.faults = self.faults
+        server.compression = self.compression
+        server.verbose = self.verbose
+        thread = threading.Thread(target=server.serve_forever,
+                                  args=(SHUTDOWN_POLL_INTERVAL,))
+        thread.daemon = True
+        thread.start()
+        self.servers.append(server)
+        return server
+
+    def serve_unix(self, path):
+        return self._start(UnixHTTPServer(path, FakeLitpdHandler))
+
+    def serve_https(self, host='localhost', port=9999, certfile=None,
+                    keyfile=None):
+        if certfile is None:
+            self._tmpdir = tempfile.mkdtemp()
+            certfile, keyfile = self_signed_certificate(self._tmpdir)
+        return self._start(HTTPSServer((host, port), FakeLitpdHandler,
+                                       certfile, keyfile))
+
+    def shutdown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+            if server.unix and os.path.exists(server.server_address):
+                os.unlink(server.server_address)
+        self.servers = []
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir)
+            self._tmpdir = None
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--unix-socket', help='Path of the unix socket')
+    parser.add_argument('--https-port', type=int,
+                        help='Port to serve HTTPS on')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--certfile', help='Default: self-signed')
+    parser.add_argument('--keyfile')
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--items-per-node', type=int, default=20)
+    parser.add_argument('--phases', type=int, default=5)
+    parser.add_argument('--tasks-per-node', type=int, default=10)
+    parser.add_argument('--tasks-per-poll', type=int, default=10,
+                        help='Tasks a running plan completes per GET')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Random +/- seconds added to the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with 503')
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help='Fraction of connections dropped unanswered')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--no-compression', action='store_true')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(args)
+    if not args.unix_socket and not args.https_port:
+        parser.error('one of --unix-socket or --https-port is required')
+
+    litpd = FakeLitpd(
+        Model(args.nodes, args.items_per_node, args.phases,
+              args.tasks_per_node, args.tasks_per_poll),
+        FaultInjector(args.latency, args.jitter, args.error_rate,
+                      args.drop_rate, args.seed),
+        not args.no_compression, args.verbose)
+    if args.unix_socket:
+        litpd.serve_unix(args.unix_socket)
+    if args.https_port:
+        litpd.serve_https(args.host, args.https_port, args.certfile,
+                          args.keyfile)
+    sys.stderr.write("fake litpd serving %d items\n" % len(
+        litpd.model.items))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        litpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
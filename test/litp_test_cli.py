@@ -4,9 +4,15 @@ import urllib2
 import httplib
 from StringIO import StringIO
 import socket
+import tempfile
+import zlib
+import os
+import shutil
 import json
 import sys
 import argparse
+import pstats
+import time
 from ConfigParser import SafeConfigParser, NoOptionError
 
 from litpcli import litp
@@ -65,13 +71,22 @@ class MockHTTPRequest():
         self.headers = headers
 
 class MockHTTPResponse():
-    def __init__(self, data, status, reason):
+    def __init__(self, data, status, reason, headers=None):
         self.data = data
         self.status = status
         self.reason = reason
+        self.headers = headers or {}
+        self.offset = 0
 
-    def read(self):
-        return self.data
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+    def read(self, amt=None):
+        if amt is None:
+            return self.data
+        chunk = self.data[self.offset:self.offset + amt]
+        self.offset += len(chunk)
+        return chunk
 
 
 class MockHTTPSConnection(httplib.HTTPSConnection):
@@ -84,9 +99,10 @@ class MockHTTPSConnection(httplib.HTTPSConnection):
         self.status = status
         self.reason = reason
 
-    def add_to_expected_responses(self, data, status=200, reason='OK'):
+    def add_to_expected_responses(self, data, status=200, reason='OK',
+                                  headers=None):
         self.expected_responses.insert(
-            0, MockHTTPResponse(data, status, reason))
+            0, MockHTTPResponse(data, status, reason, headers))
 
     def getresponse(self):
         if len(self.expected_responses) == 0:
@@ -97,6 +113,28 @@ class MockHTTPSConnection(httplib.HTTPSConnection):
     def request(self, method, url, data, headers):
         self.request_received = MockHTTPRequest(method, url, data, headers)
 
+    def close(self):
+        pass
+
+
+class FakeSocket(object):
+    def __init__(self, data):
+        self.data = data
+
+    def makefile(self, *args, **kwargs):
+        return StringIO(self.data)
+
+
+def short_response(body, length):
+    """
+    Return a real HTTPResponse whose connection drops after body, before
+    the length announced in its Content-Length.
+    """
+    response = httplib.HTTPResponse(FakeSocket(
+        "HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (length, body)))
+    response.begin()
+    return response
+
 
 class MockArgumentParser(object):
     def __init__(self, attrs=None):
@@ -299,6 +337,88 @@ class LitpCLITests(unittest.TestCase):
 
         self.assertEqual(expected_string, self.stdout.getvalue())
 
+    def test_recursive_show_json(self):
+        first_data = sample_json_output.ms_ipaddresses_first_output
+        second_data = sample_json_output.ms_ipaddresses_second_output
+
+        sys.argv = ["-u", "foo", "-P", "bar", "show",
+                    "-p", "/ms/ipaddresses", "-rj"]
+
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            cli._get_auth_headers = mock_get_auth_headers
+            self.mock_https_connection.add_to_expected_responses(
+                json.dumps(first_data))
+            self.mock_https_connection.add_to_expected_responses(
+                json.dumps(second_data))
+            self.assertEqual(0, cli.run_command(sys.argv))
+
+        # The full items are output, not the compact tree of litp show -r
+        child = json.loads(self.stdout.getvalue())['_embedded']['item'][0]
+        self.assertEqual(second_data['_links'], child['_links'])
+        self.assertEqual(second_data['properties'], child['properties'])
+
+    def _show_rows(self, *args):
+        sys.argv = ["-u", "foo", "-P", "bar", "show",
+                    "-p", "/ms/ipaddresses"] + list(args)
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            cli._get_auth_headers = mock_get_auth_headers
+            self.mock_https_connection.add_to_expected_responses(
+                json.dumps(sample_json_output.ms_ipaddresses_first_output))
+            self.mock_https_connection.add_to_expected_responses(
+                json.dumps(sample_json_output.ms_ipaddresses_second_output))
+            return cli.run_command(sys.argv)
+
+    def test_recursive_show_csv(self):
+        self.assertEqual(0, self._show_rows(
+            "-r", "--format", "csv", "--columns",
+            "path,type,properties.address"))
+        self.assertEqual("path,type,properties.address\n"
+                         "/ms/ipaddresses,ip-range,\n"
+                         "/ms/ipaddresses/ip1,ip-range,10.10.10.100\n",
+                         self.stdout.getvalue())
+
+    def test_show_format_with_other_output(self):
+        for option, name in (("-l", "-l/--list"), ("-T", "-T/--tree"),
+                             ("-L", "-L/--completion")):
+            self.stderr.truncate(0)
+            try:
+                self._show_rows("--format", "csv", option)
+            except SystemExit as e:
+                self.assertEqual(2, e.code)
+            else:
+                self.fail('Should have failed with SystemExit')
+            self.assertEqual("litp show: error: argument {0}: not allowed"
+                             " with argument --format".format(name),
+                             self.stderr.getvalue().splitlines()[-1])
+        self.stderr.truncate(0)
+        self.assertEqual(1, self._show_rows("--format", "csv", "-j"))
+        self.assertEqual("Format may not be specified with json option\n",
+                         self.stderr.getvalue())
+
+    def test_show_format_of_item_types(self):
+        sys.argv = ["-u", "foo", "-P", "bar", "show", "-p", "/item-types",
+                    "--format", "csv"]
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            cli._get_auth_headers = mock_get_auth_headers
+            self.mock_https_connection.set_expected_response(json.dumps({
+                '_links': {'self': {'href': litp.REST_URL + '/item-types'}},
+                '_embedded': {'item-type': []}, 'id': 'item-types'}))
+            self.assertEqual(1, cli.run_command(sys.argv))
+        self.assertEqual("", self.stdout.getvalue())
+        self.assertEqual("Format may only be specified for items of the"
+                         " model\n", self.stderr.getvalue())
+
+    def test_show_columns_without_format(self):
+        self.assertEqual(1, self._show_rows("-r", "--columns", "path"))
+        self.assertEqual("Columns may not be specified without format"
+                         " option\n", self.stderr.getvalue())
+
     def test_recursive_show_with_depth_limit(self):
         first_data = sample_json_output.ms_ipaddresses_first_output
         second_data = sample_json_output.ms_ipaddresses_second_output
@@ -343,6 +463,438 @@ class LitpCLITests(unittest.TestCase):
 
         self.assertEqual(expected_string, self.stderr.getvalue())
 
+    def test_show_plan(self):
+        data = sample_json_output.plan_output
+        sys.argv = ["-u", "foo", "-P", "bar", "show_plan"]
+
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            self.mock_https_connection.set_expected_response(data)
+            self.assertEqual(0, cli.run_command(sys.argv))
+
+        expected_string = (
+            "Phase 1\n\tTask status\n\t-----------\n\tInitial\t\t/ms\n"
+            "\t\t\tMock task done on node2\n\n"
+            "Tasks: 1 | Initial: 1 | Running: 0 | Success: 0 | Failed: 0"
+            " | Stopped: 0\n"
+            "Plan Status: Initial\n")
+        self.assertEqual(expected_string, self.stdout.getvalue())
+
+    def test_show_plan_truncated(self):
+        data = sample_json_output.plan_output
+        sys.argv = ["-u", "foo", "-P", "bar", "show_plan"]
+
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            self.mock_https_connection.set_expected_response(
+                data[:len(data) // 2])
+            self.assertEqual(1, cli.run_command(sys.argv))
+        self.assertEqual(litp.INVALID_RESPONSE_ERR + "\n",
+                         self.stderr.getvalue())
+
+    def test_show_plan_eta(self):
+        data = sample_json_output.plan_output
+        sys.argv = ["-u", "foo", "-P", "bar", "show_plan", "--eta"]
+
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection, \
+                patch.object(litp.PlanProgress, 'load'), \
+                patch.object(litp.PlanProgress, 'save') as save:
+            _get_connection.return_value = self.mock_https_connection
+            self.mock_https_connection.set_expected_response(data)
+            self.assertEqual(0, cli.run_command(sys.argv))
+            self.assertTrue(save.called)
+
+        output = self.stdout.getvalue().split('\n')
+        self.assertEqual("Plan Status: Initial", output[-3])
+        self.assertTrue(output[-2].startswith("Throughput: "))
+
+    def test_show_plan_records_history(self):
+        data = sample_json_output.plan_output
+        sys.argv = ["-u", "foo", "-P", "bar", "show_plan"]
+
+        cli = litp.LitpCli()
+        history = Mock()
+        with patch.object(cli, '_get_connection') as _get_connection, \
+                patch.object(cli, '_get_plan_history') as _get_plan_history:
+            _get_connection.return_value = self.mock_https_connection
+            _get_plan_history.return_value = history
+            self.mock_https_connection.set_expected_response(data)
+            self.assertEqual(0, cli.run_command(sys.argv))
+
+        history.record.assert_called_once_with(
+            [[('a_mock_task', '/ms', 'Mock task done on node2',
+               'Initial')]], 'initial')
+        self.assertTrue(history.close.called)
+
+    def test_plan_history_not_enabled(self):
+        sys.argv = ["plan_history"]
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_litprc_option') as _get_litprc_option:
+            _get_litprc_option.return_value = None
+            self.assertEqual(1, cli.run_command(sys.argv))
+        self.assertEqual("Plan history is not recorded, set plan_history_file"
+                         " in ~/.litprc\n", self.stderr.getvalue())
+
+    @patch('litpcli.litp.PlanHistory')
+    def test_plan_history_list(self, patched_history):
+        patched_history.return_value.runs.return_value = []
+        sys.argv = ["plan_history", "-l", "-f", "history.db"]
+        cli = litp.LitpCli()
+        self.assertEqual(0, cli.run_command(sys.argv))
+        patched_history.assert_called_once_with("history.db")
+        self.assertEqual("No plan runs recorded\n", self.stdout.getvalue())
+
+    def test_show_records_latency_metrics(self):
+        sys.argv = ["-u", "foo", "-P", "bar", "show", "-p", "/software"]
+        cli = litp.LitpCli()
+        metrics = Mock()
+        with patch.object(cli, '_get_connection') as _get_connection, \
+                patch.object(cli, '_get_metrics') as _get_metrics:
+            _get_connection.return_value = self.mock_https_connection
+            _get_metrics.return_value = metrics
+            cli._get_auth_headers = mock_get_auth_headers
+            cli.conn_type = litp.HTTPS
+            self.mock_https_connection.set_expected_response(
+                json.dumps(sample_json_output.software_output))
+            self.assertEqual(0, cli.run_command(sys.argv))
+        samples = metrics.record.call_args[0][0]
+        self.assertEqual(
+            [('litp_cli_request_duration_seconds',
+              [('method', 'GET'), ('endpoint', '/software'),
+               ('transport', 'https'), ('outcome', 200),
+               ('retry', 'false')]),
+             ('litp_cli_command_duration_seconds',
+              [('action', 'show'), ('transport', 'https')])],
+            [sample[:2] for sample in samples])
+        self.assertTrue(metrics.close.called)
+
+    def test_metrics_written_to_file(self):
+        metrics_dir = tempfile.mkdtemp()
+        filename = os.path.join(metrics_dir, 'litp_cli.prom')
+        sys.argv = ["metrics", "-f", os.path.join(metrics_dir, 'metrics.db'),
+                    "-o", filename]
+        cli = litp.LitpCli()
+        self.assertEqual(0, cli.run_command(sys.argv))
+        self.assertEqual(['litp_cli.prom', 'metrics.db'],
+                         sorted(os.listdir(metrics_dir)))
+        self.assertEqual("\n", open(filename).read())
+        shutil.rmtree(metrics_dir)
+
+    def test_metrics_not_enabled(self):
+        sys.argv = ["metrics"]
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_litprc_option') as _get_litprc_option:
+            _get_litprc_option.return_value = None
+            self.assertEqual(1, cli.run_command(sys.argv))
+        self.assertEqual("Metrics are not recorded, set metrics_file"
+                         " in ~/.litprc\n", self.stderr.getvalue())
+
+    def test_apply(self):
+        manifest = tempfile.NamedTemporaryFile(suffix='.json')
+        manifest.write(json.dumps({
+            'items': [{'path': '/software/items/vim', 'type': 'package',
+                       'properties': {'name': 'vim-enhanced'}},
+                      {'path': '/ms', 'type': 'ms',
+                       'properties': {'hostname': 'ms2'}}],
+            'remove': ['/software/items/emacs']}))
+        manifest.flush()
+        error = json.dumps({'messages': [{
+            'type': 'ValidationError', 'message': 'Invalid hostname',
+            '_links': {'self': {
+                'href': 'https://localhost:9999/litp/rest/v1/ms'}}}]})
+        sys.argv = ["-u", "foo", "-P", "bar", "apply", "-f", manifest.name]
+        cli = litp.LitpCli()
+        cli._get_auth_headers = mock_get_auth_headers
+        for data, status in (
+                ('{}', 404),
+                (json.dumps({'item-type-name': 'ms',
+                             'properties': {'hostname': 'ms1'}}), 200),
+                (json.dumps({'item-type-name': 'package'}), 200),
+                ('{}', 201), (error, 422), ('{}', 200)):
+            self.mock_https_connection.add_to_expected_responses(
+                data, status=status)
+        with patch.object(cli, '_get_connection') as _get_connection:
+            with patch.object(cli, '_get_max_parallel') as _get_max_parallel:
+                _get_connection.return_value = self.mock_https_connection
+                _get_max_parallel.return_value = 1
+                self.assertEqual(1, cli.run_command(sys.argv))
+        self.assertEqual("1 created, 0 inherited, 0 updated, 1 removed,"
+                         " 0 unchanged, 1 failed\n", self.stdout.getvalue())
+        self.assertEqual("Failed to update /ms: hostname=ms2:\n/ms\n"
+                         "    ValidationError    Invalid hostname\n",
+                         self.stderr.getvalue())
+        self.assertEqual('DELETE',
+                         self.mock_https_connection.request_received.method)
+
+    def test_apply_reads_subtrees(self):
+        manifest = tempfile.NamedTemporaryFile(suffix='.json')
+        manifest.write(json.dumps([
+            {'path': '/ms', 'type': 'ms', 'properties': {'hostname': 'ms2'}},
+            {'path': '/ms/items/ntp', 'type': 'package',
+             'properties': {'name': 'ntp'}},
+            {'path': '/ms/items/vim', 'type': 'package',
+             'properties': {'name': 'vim-enhanced'}}]))
+        manifest.flush()
+
+        def item(path, item_type, properties, *children):
+            return {'_links': {'self': {'href': litp.REST_URL + path}},
+                    'item-type-name': item_type, 'properties': properties,
+                    '_embedded': {'item': list(children)}}
+        ms = item('/ms', 'ms', {'hostname': 'ms1'}, item(
+            '/ms/items', 'collection-of-software-item', {}, item(
+                '/ms/items/vim', 'package', {'name': 'vim-enhanced'})))
+        sys.argv = ["-u", "foo", "-P", "bar", "apply", "-f", manifest.name]
+        cli = litp.LitpCli()
+        cli._get_auth_headers = mock_get_auth_headers
+        for data, status in ((json.dumps(ms), 200), ('{}', 200),
+                             ('{}', 201)):
+            self.mock_https_connection.add_to_expected_responses(
+                data, status=status)
+        connection = self.mock_https_connection
+        with patch.object(cli, '_get_connection') as _get_connection:
+            with patch.object(cli, '_get_max_parallel') as _get_max_parallel:
+                with patch.object(connection, 'request',
+                                  wraps=connection.request) as request:
+                    _get_connection.return_value = connection
+                    _get_max_parallel.return_value = 1
+                    self.assertEqual(0, cli.run_command(sys.argv))
+        self.assertEqual("1 created, 0 inherited, 1 updated, 0 removed,"
+                         " 1 unchanged\n", self.stdout.getvalue())
+        self.assertEqual(
+            [('GET', litp.REST_URL + '/ms?recurse_depth=2'),
+             ('PUT', litp.REST_URL + '/ms'),
+             ('POST', litp.REST_URL + '/ms/items')],
+            [(call[0][0], call[0][1]) for call in request.call_args_list])
+
+    def test_apply_invalid_response(self):
+        manifest = tempfile.NamedTemporaryFile(suffix='.json')
+        manifest.write(json.dumps([{'path': '/ms', 'type': 'ms'}]))
+        manifest.flush()
+        sys.argv = ["-u", "foo", "-P", "bar", "apply", "-f", manifest.name]
+        cli = litp.LitpCli()
+        cli._get_auth_headers = mock_get_auth_headers
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            self.mock_https_connection.set_expected_response('<html>', 200)
+            self.assertEqual(1, cli.run_command(sys.argv))
+        self.assertEqual("Failed to read /ms:\n{0}\n".format(
+            litp.INVALID_RESPONSE_ERR), self.stderr.getvalue())
+
+    def test_apply_dry_run(self):
+        manifest = tempfile.NamedTemporaryFile(suffix='.json')
+        manifest.write(json.dumps([{'path': '/ms/items/vim',
+                                    'inherit': '/software/items/vim'}]))
+        manifest.flush()
+        sys.argv = ["-u", "foo", "-P", "bar", "apply", "--dry-run", "-f",
+                    manifest.name]
+        cli = litp.LitpCli()
+        cli._get_auth_headers = mock_get_auth_headers
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            self.mock_https_connection.set_expected_response('{}', 404)
+            self.assertEqual(0, cli.run_command(sys.argv))
+        self.assertEqual("inherit /ms/items/vim from /software/items/vim\n",
+                         self.stdout.getvalue())
+        self.assertEqual('GET',
+                         self.mock_https_connection.request_received.method)
+
+    def test_remove_without_error_message(self):
+        sys.argv = ["-u", "foo", "-P", "bar", "remove", "-p",
+                    "/software/items/vim"]
+        cli = litp.LitpCli()
+        cli._get_auth_headers = mock_get_auth_headers
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            self.mock_https_connection.set_expected_response('{}', 404)
+            self.assertEqual(1, cli.run_command(sys.argv))
+        self.assertEqual("Item /software/items/vim not found\n",
+                         self.stderr.getvalue())
+
+    def test_remove_many(self):
+        paths = tempfile.NamedTemporaryFile()
+        paths.write("# services\n/software/items/vim/\n\n"
+                    "/software/items/emacs\n/software/items/vim/files\n")
+        paths.flush()
+        error = json.dumps({'messages': [{
+            'type': 'InvalidLocationError', 'message': 'Not found',
+            '_links': {'self': {'href': 'https://localhost:9999/litp/rest/v1'
+                                        '/software/items/emacs'}}}]})
+        sys.argv = ["-u", "foo", "-P", "bar", "remove", "-p", "/ms/items/vim",
+                    "--from-file", paths.name]
+        cli = litp.LitpCli()
+        cli._get_auth_headers = mock_get_auth_headers
+        for data, status in (('{}', 200), ('{}', 200), (error, 404)):
+            self.mock_https_connection.add_to_expected_responses(
+                data, status=status)
+        with patch.object(cli, '_get_connection') as _get_connection:
+            with patch.object(cli, '_get_max_parallel') as _get_max_parallel:
+                _get_connection.return_value = self.mock_https_connection
+                _get_max_parallel.return_value = 1
+                self.assertEqual(1, cli.run_command(sys.argv))
+        self.assertEqual("2 removed, 1 failed\n", self.stdout.getvalue())
+        self.assertEqual("Failed to remove /software/items/emacs:\n"
+                         "/software/items/emacs\n"
+                         "    InvalidLocationError    Not found\n",
+                         self.stderr.getvalue())
+        self.assertEqual([], self.mock_https_connection.expected_responses)
+
+    def test_remove_without_path(self):
+        sys.argv = ["-u", "foo", "-P", "bar", "remove"]
+        cli = litp.LitpCli()
+        try:
+            cli.run_command(sys.argv)
+        except SystemExit as e:
+            self.assertEqual(2, e.code)
+        else:
+            self.fail('Should have failed with SystemExit')
+        self.assertEqual("litp remove: error: one of the arguments -p/--path"
+                         " --from-file is required",
+                         self.stderr.getvalue().splitlines()[-1])
+
+    def test_inherit_to_many(self):
+        targets = tempfile.NamedTemporaryFile()
+        targets.write("/deployments/d1/nodes/*/items/vim\n")
+        targets.flush()
+        nodes = json.dumps({'_embedded': {'item': [{'id': 'node1'},
+                                                   {'id': 'node2'}]}})
+        sys.argv = ["-u", "foo", "-P", "bar", "inherit", "-s",
+                    "/software/items/vim", "--to", targets.name,
+                    "-o", "version=1.2"]
+        cli = litp.LitpCli()
+        cli._get_auth_headers = mock_get_auth_headers
+        items = json.dumps({'_embedded': {'item': [{'id': 'items'}]}})
+        for data, status in ((nodes, 200), (items, 200), (items, 200),
+                             ('{}', 201), ('{}', 201)):
+            self.mock_https_connection.add_to_expected_responses(
+                data, status=status)
+        with patch.object(cli, '_get_connection') as _get_connection:
+            with patch.object(cli, '_get_max_parallel') as _get_max_parallel:
+                _get_connection.return_value = self.mock_https_connection
+                _get_max_parallel.return_value = 1
+                self.assertEqual(0, cli.run_command(sys.argv))
+        self.assertEqual("", self.stderr.getvalue())
+        self.assertEqual("2 inherited\n", self.stdout.getvalue())
+        request = self.mock_https_connection.request_received
+        self.assertEqual('POST', request.method)
+        self.assertTrue(request.url.endswith('/deployments/d1/nodes/node2/items'))
+        self.assertEqual({'inherit': '/software/items/vim', 'id': 'vim',
+                          'properties': {'version': '1.2'}},
+                         json.loads(request.data))
+
+    def test_inherit_to_invalid_listing(self):
+        sys.argv = ["-u", "foo", "-P", "bar", "inherit", "-s",
+                    "/software/items/vim", "--to",
+                    "/deployments/d1/nodes/*/items/vim"]
+        cli = litp.LitpCli()
+        cli._get_auth_headers = mock_get_auth_headers
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            self.mock_https_connection.set_expected_response('<html>', 200)
+            self.assertEqual(1, cli.run_command(sys.argv))
+        self.assertEqual("Failed to list /deployments/d1/nodes:\n{0}\n".format(
+            litp.INVALID_RESPONSE_ERR), self.stderr.getvalue())
+
+    def test_inherit_to_wildcard_id(self):
+        sys.argv = ["-u", "foo", "-P", "bar", "inherit", "-s",
+                    "/software/items/vim", "--to", "/deployments/d1/*"]
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            self.assertEqual(1, cli.run_command(sys.argv))
+        self.assertEqual("The last element of /deployments/d1/* must be the"
+                         " id of the item to create\n", self.stderr.getvalue())
+
+    def test_update_matches(self):
+        nodes = json.dumps({'_embedded': {'item': [{'id': 'node1'},
+                                                   {'id': 'node2'},
+                                                   {'id': 'ms1'}]}})
+        sys.argv = ["-u", "foo", "-P", "bar", "update", "--match",
+                    "/deployments/d1/nodes/node*/items/ntp",
+                    "-o", "server=ntp1", "-d", "pool"]
+        cli = litp.LitpCli()
+        cli._get_auth_headers = mock_get_auth_headers
+        items = json.dumps({'_embedded': {'item': [{'id': 'ntp'}]}})
+        no_items = json.dumps({'_embedded': {'item': []}})
+        for data, status in ((nodes, 200), (items, 200), (no_items, 200),
+                             ('{}', 200)):
+            self.mock_https_connection.add_to_expected_responses(
+                data, status=status)
+        with patch.object(cli, '_get_connection') as _get_connection:
+            with patch.object(cli, '_get_max_parallel') as _get_max_parallel:
+                _get_connection.return_value = self.mock_https_connection
+                _get_max_parallel.return_value = 1
+                self.assertEqual(0, cli.run_command(sys.argv))
+        self.assertEqual("1 updated\n", self.stdout.getvalue())
+        request = self.mock_https_connection.request_received
+        self.assertEqual('PUT', request.method)
+        self.assertTrue(request.url.endswith(
+            '/deployments/d1/nodes/node1/items/ntp'))
+        self.assertEqual({'properties': {'server': 'ntp1', 'pool': None}},
+                         json.loads(request.data))
+
+    def test_create_expansions(self):
+        sys.argv = ["-u", "foo", "-P", "bar", "create", "-t", "node", "-p",
+                    "/deployments/d1/clusters/c1/nodes/n{1..3}",
+                    "-o", "hostname=node{}"]
+        cli = litp.LitpCli()
+        cli._get_auth_headers = mock_get_auth_headers
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            self.mock_https_connection.set_expected_response('{}', 201)
+            self.assertEqual(0, cli.run_command(sys.argv))
+        self.assertEqual("3 created\n", self.stdout.getvalue())
+        request = self.mock_https_connection.request_received
+        self.assertTrue(request.url.endswith('/deployments/d1/clusters/c1'
+                                             '/nodes'))
+        body = json.loads(request.data)
+        self.assertEqual('node{0}'.format(body['id'][1:]),
+                         body['properties']['hostname'])
+
+    def test_create_expansions_validated(self):
+        self._catch_sys_exit()
+        sys.argv = ["-u", "foo", "-P", "bar", "create", "-t", "node", "-p",
+                    "/deployments/d1/nodes/n{1,2/}"]
+        cli = litp.LitpCli()
+        cli.wrapped_run_command(sys.argv)
+        self.assertTrue("/deployments/d1/nodes/n2/ is not a valid path"
+                        " argument" in self.stderr.getvalue())
+
+    def test_create_expansions_limited(self):
+        self._catch_sys_exit()
+        sys.argv = ["-u", "foo", "-P", "bar", "create", "-t", "node", "-p",
+                    "/deployments/d1/nodes/n{1..1000}/eth{0..99}"]
+        cli = litp.LitpCli()
+        cli.wrapped_run_command(sys.argv)
+        self.assertTrue("/deployments/d1/nodes/n{1..1000}/eth{0..99} expands"
+                        " to 100000 paths, more than 10000"
+                        in self.stderr.getvalue())
+
+    def test_load_parallel(self):
+        site = tempfile.NamedTemporaryFile(suffix='.xml')
+        site.write('<litp:root xmlns:litp="http://www.ericsson.com/litp"'
+                   ' id="root"><litp:ms id="ms"><hostname>ms1</hostname>'
+                   '</litp:ms><litp:software id="software"/></litp:root>')
+        site.flush()
+        sys.argv = ["-u", "foo", "-P", "bar", "load", "-p", "/", "-f",
+                    site.name, "--parallel"]
+        cli = litp.LitpCli()
+        cli._get_auth_headers = mock_get_auth_headers
+        for status in (201, 201, 201):
+            self.mock_https_connection.add_to_expected_responses(
+                '{}', status=status)
+        with patch.object(cli, '_get_connection') as _get_connection:
+            with patch.object(cli, '_get_max_parallel') as _get_max_parallel:
+                _get_connection.return_value = self.mock_https_connection
+                _get_max_parallel.return_value = 1
+                self.assertEqual(0, cli.run_command(sys.argv))
+        self.assertEqual("2 loaded\n", self.stdout.getvalue())
+        request = self.mock_https_connection.request_received
+        self.assertTrue(request.url.endswith('/litp/xml/?merge=true'))
+        self.assertTrue(request.data.startswith('<litp:software'))
+
     def test_create(self):
         data = sample_json_output.create_response
 
@@ -647,7 +1199,7 @@ class LitpCLITests(unittest.TestCase):
             self.mock_https_connection.set_expected_response(json.dumps(data),
                                                              status=201)
             cli.run_command(sys.argv)
-        req = cli.conn.request_received
+        req = self.mock_https_connection.request_received
         expected_string = ""
         data = json.loads(req.data)
         self.assertEqual(expected_string, self.stdout.getvalue())
@@ -721,8 +1273,8 @@ class LitpCLITests(unittest.TestCase):
             pass
         result = self.stderr.getvalue().splitlines()[0]
         argparse.ArgumentParser.exit = self.exit
-        self.assertEqual("Usage: litp [-h] [-u USERNAME] [-P PASSWORD]  ...",
-                         result)
+        self.assertEqual("Usage: litp [-h] [-u USERNAME] [-P PASSWORD] "
+                         "[--timeout SECONDS] [--timing]", result)
 
     def test_bad_option(self):
         sys.argv = ["-u", "foo", "-P", "bar", "show", "--X", "-p"
@@ -735,8 +1287,8 @@ class LitpCLITests(unittest.TestCase):
             pass
         result = self.stderr.getvalue().splitlines()[0]
         argparse.ArgumentParser.exit = self.exit
-        self.assertEqual("Usage: litp [-h] [-u USERNAME] [-P PASSWORD]  ...",
-                         result)
+        self.assertEqual("Usage: litp [-h] [-u USERNAME] [-P PASSWORD] "
+                         "[--timeout SECONDS] [--timing]", result)
 
     def test_invalid_path(self):
         sys.argv = ["-u", "foo", "-P", "bar", "show", "-p",
@@ -1571,6 +2123,319 @@ class LitpCLITests(unittest.TestCase):
                           'with argument --replace\n']
 
 
+    def test_get_retried_on_503(self):
+        sys.argv = ["-u", "foo", "-P", "bar", "show", "-p", "/", "-j"]
+        self.mock_https_connection.add_to_expected_responses(
+            "<html>Service Unavailable</html>", 503,
+            headers={'retry-after': '3'})
+        self.mock_https_connection.add_to_expected_responses(
+            "<html>Service Unavailable</html>", 503)
+        self.mock_https_connection.add_to_expected_responses(
+            json.dumps(sample_json_output.software_output))
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection, \
+                patch('litpcli.retry.sleep') as sleep:
+            _get_connection.return_value = self.mock_https_connection
+            cli._get_auth_headers = mock_get_auth_headers
+            self.assertEqual(0, cli.run_command(sys.argv))
+        self.assertEqual(2, sleep.call_count)
+        self.assertEqual(3, sleep.call_args_list[0][0][0])
+        self.assertTrue(0 <= sleep.call_args_list[1][0][0] <= 1)
+        self.assertEqual(sample_json_output.software_output,
+                         json.loads(self.stdout.getvalue()))
+
+    def test_timing_printed_on_stderr(self):
+        sys.argv = ["-u", "foo", "-P", "bar", "--timing", "show", "-p", "/"]
+        self.mock_https_connection.add_to_expected_responses(
+            json.dumps(sample_json_output.software_output))
+        cli = litp.LitpCli(time.time())
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            cli._get_auth_headers = mock_get_auth_headers
+            self.assertEqual(0, cli.run_command(sys.argv))
+        timing = self.stderr.getvalue()
+        self.assertTrue(timing.startswith("Timing:\n  import"))
+        self.assertTrue("  GET /litp/rest/v1/ 200: first byte" in timing)
+        self.assertTrue(", format " in timing)
+        self.assertTrue("/software" in self.stdout.getvalue())
+
+    def test_trace_file_written(self):
+        trace_dir = tempfile.mkdtemp()
+        filename = os.path.join(trace_dir, 'trace.json')
+        sys.argv = ["-u", "foo", "-P", "bar", "--trace-file", filename,
+                    "show", "-p", "/software"]
+        self.mock_https_connection.add_to_expected_responses(
+            json.dumps(sample_json_output.software_output))
+        cli = litp.LitpCli(time.time())
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            cli._get_auth_headers = mock_get_auth_headers
+            self.assertEqual(0, cli.run_command(sys.argv))
+        events = json.load(open(filename))['traceEvents']
+        shutil.rmtree(trace_dir)
+        self.assertEqual(['import', 'GET /litp/rest/v1/software',
+                          'cb_format_show', 'run_command'],
+                         [event['name'] for event in events])
+        request = events[1]
+        self.assertEqual(200, request['args']['status'])
+        self.assertEqual(
+            len(json.dumps(sample_json_output.software_output)),
+            request['args']['bytes'])
+        run_command = events[3]
+        self.assertTrue(run_command['ts'] <= request['ts'] and
+                        request['ts'] + request['dur'] <=
+                        run_command['ts'] + run_command['dur'])
+
+    def test_action_profiled(self):
+        profile_dir = tempfile.mkdtemp()
+        filename = os.path.join(profile_dir, 'show.prof')
+        sys.argv = ["-u", "foo", "-P", "bar", "--profile", filename,
+                    "--profile-top", "5", "show", "-p", "/software"]
+        self.mock_https_connection.add_to_expected_responses(
+            json.dumps(sample_json_output.software_output))
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            cli._get_auth_headers = mock_get_auth_headers
+            self.assertEqual(0, cli.run_command(sys.argv))
+        stats = pstats.Stats(filename)
+        shutil.rmtree(profile_dir)
+        self.assertTrue(any(function[2] == 'object_show'
+                            for function in stats.stats))
+        self.assertTrue("cumulative" in self.stderr.getvalue())
+        self.assertTrue("/software" in self.stdout.getvalue())
+
+    def test_put_not_retried_on_503(self):
+        sys.argv = ["-u", "foo", "-P", "bar", "run_plan"]
+        self.mock_https_connection.add_to_expected_responses(
+            "<html>Service Unavailable</html>", 503)
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection, \
+                patch('litpcli.retry.sleep') as sleep:
+            _get_connection.return_value = self.mock_https_connection
+            cli._get_auth_headers = mock_get_auth_headers
+            self.assertEqual(1, cli.run_command(sys.argv))
+        self.assertFalse(sleep.called)
+        self.assertEqual(litp.SERVICE_UNAVAILABLE_ERR + "\n",
+                         self.stderr.getvalue())
+
+    def test_request_timeout(self):
+        sys.argv = ["-u", "foo", "-P", "bar", "--timeout", "2", "show",
+                    "-p", "/"]
+        self.mock_https_connection.getresponse = Mock(
+            side_effect=socket.timeout)
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection, \
+                patch('litpcli.retry.sleep') as sleep:
+            _get_connection.return_value = self.mock_https_connection
+            cli._get_auth_headers = mock_get_auth_headers
+            self.assertEqual(1, cli.run_command(sys.argv))
+        # Retries never wait beyond the deadline
+        self.assertTrue(sum(args[0][0] for args in sleep.call_args_list) < 2)
+        self.assertEqual(3, self.mock_https_connection.getresponse.call_count)
+        self.assertEqual(litp.LITP_TIMEOUT_ERR + "\n",
+                         self.stderr.getvalue())
+
+    def test_load_compressed_falls_back_on_415(self):
+        xml_file = tempfile.NamedTemporaryFile(suffix='.xml')
+        xml_file.write('<litp:root id="root"/>')
+        xml_file.flush()
+        sys.argv = ["-u", "foo", "-P", "bar", "load", "-p", "/",
+                    "-f", xml_file.name, "--merge", "--compress"]
+        requests = []
+        self.mock_https_connection.request = \
+            lambda method, url, body, headers: requests.append(
+                MockHTTPRequest(method, url, body.read(), headers))
+        self.mock_https_connection.add_to_expected_responses(
+            json.dumps({"messages": [{"type": "UnsupportedMediaTypeError",
+                                      "message": "Unsupported encoding"}]}),
+            415)
+        self.mock_https_connection.add_to_expected_responses(
+            json.dumps(sample_json_output.create_response), 201)
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            cli._get_auth_headers = mock_get_auth_headers
+            self.assertEqual(0, cli.run_command(sys.argv))
+        self.assertEqual(2, len(requests))
+        self.assertEqual('gzip', requests[0].headers['Content-Encoding'])
+        self.assertEqual(
+            '<litp:root id="root"/>',
+            zlib.decompress(requests[0].data, 16 + zlib.MAX_WBITS))
+        self.assertFalse('Content-Encoding' in requests[1].headers)
+        self.assertEqual('<litp:root id="root"/>', requests[1].data)
+        self.assertEqual(22, requests[1].headers['Content-Length'])
+        self.assertEqual('gzip, deflate',
+                         requests[1].headers['Accept-Encoding'])
+        self.assertEqual('', self.stderr.getvalue())
+
+    def test_load_streams_file_with_progress(self):
+        xml_file = tempfile.NamedTemporaryFile(suffix='.xml')
+        xml_file.write('<litp:root id="root"/>' * 10000)
+        xml_file.flush()
+        sys.argv = ["-u", "foo", "-P", "bar", "load", "-p", "/",
+                    "-f", xml_file.name, "--progress"]
+        blocks = []
+
+        def request(method, url, body, headers):
+            # Read the body in blocks, like httplib does
+            while True:
+                block = body.read(8192)
+                if not block:
+                    break
+                blocks.append(block)
+            self.mock_https_connection.request_received = \
+                MockHTTPRequest(method, url, body, headers)
+        self.mock_https_connection.request = request
+        self.mock_https_connection.set_expected_response(
+            json.dumps(sample_json_output.create_response), 201)
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            cli._get_auth_headers = mock_get_auth_headers
+            self.assertEqual(0, cli.run_command(sys.argv))
+        headers = self.mock_https_connection.request_received.headers
+        self.assertEqual(220000, headers['Content-Length'])
+        self.assertEqual(27, len(blocks))
+        self.assertEqual('<litp:root id="root"/>' * 10000, ''.join(blocks))
+        self.assertTrue(self.stderr.getvalue().startswith(
+            "Uploaded 0.2 MiB in "))
+
+    def _export(self, *args, **kwargs):
+        sys.argv = ["-u", "foo", "-P", "bar", "export", "-p",
+                    kwargs.get('path', "/deployments")] + list(args)
+        cli = litp.LitpCli()
+        with patch.object(cli, '_get_connection') as _get_connection:
+            _get_connection.return_value = self.mock_https_connection
+            cli._get_auth_headers = mock_get_auth_headers
+            return cli.run_command(sys.argv)
+
+    def test_export_streamed_to_file(self):
+        xml = '<litp:deployment id="d1">%s</litp:deployment>\n' % (
+            '<litp:cluster id="c1"/>' * 10000)
+        export_dir = tempfile.mkdtemp()
+        filename = os.path.join(export_dir, 'd1.xml')
+        self.mock_https_connection.set_expected_response(xml)
+        self.assertEqual(0, self._export("-f", filename))
+        self.assertEqual(xml, open(filename).read())
+        self.mock_https_connection.set_expected_response(xml)
+        self.assertEqual(0, self._export("-f", filename, "--compress"))
+        self.assertEqual(
+            xml, zlib.decompress(open(filename).read(), 16 + zlib.MAX_WBITS))
+        self.assertEqual(['d1.xml'], os.listdir(export_dir))
+        shutil.rmtree(export_dir)
+
+    def test_failed_export_leaves_file_untouched(self):
+        export_dir = tempfile.mkdtemp()
+        filename = os.path.join(export_dir, 'd1.xml')
+        with open(filename, 'w') as fobj:
+            fobj.write('previous')
+        response = MockHTTPResponse('<litp:deployment id="d1">', 200, 'OK')
+        response.read = Mock(side_effect=['<litp:deployment ',
+                                          socket.timeout()])
+        self.mock_https_connection.getresponse = lambda: response
+        self.assertEqual(1, self._export("-f", filename))
+        self.assertEqual(litp.LITP_TIMEOUT_ERR + "\n", self.stderr.getvalue())
+        self.assertEqual('previous', open(filename).read())
+        self.assertEqual(['d1.xml'], os.listdir(export_dir))
+        shutil.rmtree(export_dir)
+
+    def test_truncated_export_leaves_file_untouched(self):
+        export_dir = tempfile.mkdtemp()
+        filename = os.path.join(export_dir, 'root.xml')
+        with open(filename, 'w') as fobj:
+            fobj.write('previous')
+        for args in (("-f", filename), ("-f", filename, "--compress"), ()):
+            self.stderr.truncate(0)
+            response = short_response('<litp:root>partial', 100)
+            self.mock_https_connection.getresponse = lambda: response
+            self.assertEqual(1, self._export(*args))
+            self.assertEqual(litp.INVALID_RESPONSE_ERR + "\n",
+                             self.stderr.getvalue())
+        self.assertEqual('previous', open(filename).read())
+        self.assertEqual(['root.xml'], os.listdir(export_dir))
+        shutil.rmtree(export_dir)
+
+    def test_export_parallel(self):
+        export_dir = tempfile.mkdtemp()
+        filename = os.path.join(export_dir, 'd1.xml')
+        self.mock_https_connection.add_to_expected_responses(json.dumps({
+            'id': 'd1', 'item-type-name': 'deployment', 'properties': {},
+            '_embedded': {'item': [{'id': 'clusters'},
+                                   {'id': 'ordered_clusters'}]}}))
+        for tag, item_id in (
+                ('deployment-clusters-collection', 'clusters'),
+                ('deployment-ordered_clusters-collection',
+                 'ordered_clusters')):
+            self.mock_https_connection.add_to_expected_responses(
+                '<?xml version=\'1.0\' encoding=\'utf-8\'?>\n<litp:%s'
+                ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+                ' xmlns:litp="http://www.ericsson.com/litp"'
+                ' xsi:schemaLocation="http://www.ericsson.com/litp'
+                ' litp-xml-schema/litp.xsd" id="%s"/>\n' % (tag, item_id))
+        with patch.object(litp.LitpCli, '_get_max_parallel',
+                          return_value=1):
+            self.assertEqual(0, self._export("-f", filename, "--parallel",
+                                             path="/deployments/d1"))
+        self.assertTrue(self.mock_https_connection.request_received.url
+                        .endswith('/litp/xml/deployments/d1/ordered_clusters'))
+        self.assertEqual(
+            '<?xml version=\'1.0\' encoding=\'utf-8\'?>\n'
+            '<litp:deployment'
+            ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+            ' xmlns:litp="http://www.ericsson.com/litp"'
+            ' xsi:schemaLocation="http://www.ericsson.com/litp'
+            ' litp-xml-schema/litp.xsd" id="d1">\n'
+            '  <litp:deployment-clusters-collection id="clusters"/>\n'
+            '  <litp:deployment-ordered_clusters-collection'
+            ' id="ordered_clusters"/>\n'
+            '</litp:deployment>\n', open(filename).read())
+        self.assertEqual(['d1.xml'], os.listdir(export_dir))
+        shutil.rmtree(export_dir)
+
+    def test_export_parallel_truncated_child(self):
+        export_dir = tempfile.mkdtemp()
+        filename = os.path.join(export_dir, 'd1.xml')
+        responses = [
+            MockHTTPResponse(json.dumps({
+                'id': 'd1', 'item-type-name': 'deployment',
+                '_embedded': {'item': [{'id': 'clusters'}]}}), 200, 'OK'),
+            short_response('<litp:deployment-clusters-collection', 100)]
+        self.mock_https_connection.getresponse = lambda: responses.pop(0)
+        with patch.object(litp.LitpCli, '_get_max_parallel',
+                          return_value=1):
+            self.assertEqual(1, self._export("-f", filename, "--parallel",
+                                             path="/deployments/d1"))
+        self.assertEqual("Failed to export /deployments/d1/clusters:\n{0}\n"
+                         .format(litp.INVALID_RESPONSE_ERR),
+                         self.stderr.getvalue())
+        self.assertEqual([], os.listdir(export_dir))
+        shutil.rmtree(export_dir)
+
+    def test_export_parallel_collection_refused(self):
+        self.mock_https_connection.set_expected_response(json.dumps({
+            'id': 'deployments',
+            'item-type-name': 'collection-of-deployment',
+            '_embedded': {'item': [{'id': 'd1'}]}}))
+        self.assertEqual(1, self._export("-f", "deployments.xml",
+                                         "--parallel"))
+        self.assertTrue(self.stderr.getvalue().startswith(
+            "--parallel cannot export /deployments: the element of a"
+            " collection"))
+        self.assertFalse(os.path.exists("deployments.xml"))
+
+    def test_export_parallel_without_file(self):
+        self.assertEqual(1, self._export("--parallel"))
+        self.assertEqual("--parallel requires -f\n", self.stderr.getvalue())
+
+    def test_export_streamed_to_stdout(self):
+        self.mock_https_connection.set_expected_response(
+            '\n<litp:deployment id="d1">\n\n</litp:deployment>\n\n')
+        with patch.object(litp, 'DOWNLOAD_CHUNK_SIZE', 3):
+            self.assertEqual(0, self._export())
+        self.assertEqual('<litp:deployment id="d1">\n\n</litp:deployment>\n',
+                         self.stdout.getvalue())
+
     def test_load_from_empty_file(self):
         self._catch_sys_exit()
         sys.argv = ["-u", "foo",
@@ -1,4 +1,6 @@
-litp_help = """Usage: litp [-h] [-u USERNAME] [-P PASSWORD]  ...
+litp_help = """Usage: litp [-h] [-u USERNAME] [-P PASSWORD] [--timeout SECONDS] [--timing]
+            [--trace-file FILE]
+            ...
 
 LITP Command Line
 
@@ -8,12 +10,19 @@ Optional Arguments:
                         Username to connect to LITP service
   -P PASSWORD, --password PASSWORD
                         Password to connect to LITP service
+  --timeout SECONDS     Time limit for the whole command, including retries
+  --timing              Print the time spent in each phase of the command on
+                        stderr
+  --trace-file FILE     Write a trace of the command in the Chrome trace-event
+                        format to FILE
 
 Actions:
   Actions that can be performed on the specified item at the given path. For
   more information on an action, enter the command 'litp <action> -h'.
 
 
+    apply               Brings the deployment model to the items described in
+                        a manifest file.
     create              Adds a new instance of the specified item to the
                         deployment model.
     create_plan         Creates a set of tasks (a plan) used to deploy the
@@ -33,6 +42,10 @@ Actions:
     inherit             Creates a new path in the deployment model which
                         inherits property values from the source path.
     load                Loads the deployment model from a local XML file.
+    metrics             Outputs the latency histograms of litp commands in the
+                        Prometheus text format.
+    plan_history        Reports phase durations and the slowest tasks of plan
+                        runs recorded in the local plan history.
     prepare_restore     Prepares the full deployment model and management
                         server or a single node for restore in the event of a
                         disaster scenario.
@@ -94,6 +107,11 @@ litp_create_help = ['Usage: litp create [-h] -t TYPE -p PATH [-o PROPERTIES [PRO
  '',
  'Adds a new instance of the specified item to the deployment model.',
  '',
+ 'A path with brace expressions, {1..10} ranges or {a,b} lists, adds an item for',
+ 'each path it expands to, concurrently, up to max_parallel_requests from the',
+ '~/.litprc file at a time. In properties, {} stands for the value of the first',
+ 'expression and {N} for that of the expression at index N.',
+ '',
  'Optional Arguments:',
  '  -h, --help            Show this help message and exit',
  '  -o PROPERTIES [PROPERTIES ...], --options PROPERTIES [PROPERTIES ...]',
@@ -106,6 +124,9 @@ litp_create_help = ['Usage: litp create [-h] -t TYPE -p PATH [-o PROPERTIES [PRO
  '',
  'Example: litp create -t node -p',
  '/deployments/deployment1/clusters/cluster1/nodes/n1 -o hostname=node1',
+ 'Example: litp create -t node -p',
+ "'/deployments/deployment1/clusters/cluster1/nodes/n{1..200}' -o",
+ "hostname='node{}'",
  '']
 
 
@@ -133,13 +154,18 @@ litp_create_plan_help = ['Usage: litp create_plan [-h] [-j] [--no-lock-tasks [[.
  'litp create_plan --initial-lock-tasks',
  '']
 
-litp_export_help = ['Usage: litp export [-h] -p PATH [-f FILE]',
+litp_export_help = ['Usage: litp export [-h] -p PATH [-f FILE] [--compress] [--parallel]',
  '',
  'Exports the deployment model to a local XML file.',
  '',
  'Optional Arguments:',
  '  -h, --help            Show this help message and exit',
  '  -f FILE, --file FILE  XML file to which to export',
+ '  --compress            Compress the exported XML with gzip',
+ '  --parallel            Export the children of the item concurrently, up to',
+ '                        max_parallel_requests at a time, into the file; not',
+ '                        for collections, inherited items or items with',
+ '                        properties',
  '',
  'Required Arguments:',
  '  -p PATH, --path PATH  Location of item in the LITP model',
@@ -188,12 +214,15 @@ litp_import_iso_help = ['Usage: litp import_iso [-h] [-j] source_path',
  'Example: litp import_iso /mnt/my-iso',
  '']
 
-litp_inherit_help = ['Usage: litp inherit [-h] -p PATH -s SOURCE_PATH',
+litp_inherit_help = ['Usage: litp inherit [-h] (-p PATH | --to TARGETS) -s SOURCE_PATH',
  '                    [-o [PROPERTIES [PROPERTIES ...]]] [-j]',
  '',
  'Creates a new path in the deployment model which inherits property values from',
  'the source path.',
  '',
+ 'With --to, the source is inherited to many paths concurrently, up to',
+ 'max_parallel_requests from the ~/.litprc file at a time.',
+ '',
  'Optional Arguments:',
  '  -h, --help            Show this help message and exit',
  '  -o [PROPERTIES [PROPERTIES ...]], --options [PROPERTIES [PROPERTIES ...]]',
@@ -202,15 +231,22 @@ litp_inherit_help = ['Usage: litp inherit [-h] -p PATH -s SOURCE_PATH',
  '',
  'Required Arguments:',
  '  -p PATH, --path PATH  Location of inherit path in the LITP model',
+ '  --to TARGETS          Locations of the inherit paths: a path whose elements',
+ '                        but the last may hold shell wildcards, or a file of',
+ '                        such paths, one per line, - for stdin',
  '  -s SOURCE_PATH, --source-path SOURCE_PATH',
  '                        Location of source item in the LITP model',
  '',
  'Example: litp inherit -p',
  '/deployments/deployment1/clusters/cluster1/nodes/node1/storage_profile -s',
  '/infrastructure/storage/storage_profiles/profile1',
+ "Example: litp inherit --to '/deployments/*/clusters/*/nodes/*/items/vim' -s",
+ '/software/items/vim',
+ 'Example: litp inherit --to nodes.txt -s /software/items/vim',
  '']
 
-litp_load_help = ['Usage: litp load [-h] -p PATH -f FILE [--merge | --replace] [-j]',
+litp_load_help = ['Usage: litp load [-h] -p PATH -f FILE [--merge | --replace] [--parallel]',
+ '                 [--compress] [--progress] [-j]',
  '',
  'Loads the deployment model from a local XML file.',
  '',
@@ -222,6 +258,11 @@ litp_load_help = ['Usage: litp load [-h] -p PATH -f FILE [--merge | --replace] [
  '  --replace             Recreate the active model with contents of the',
  '                        specified XML file, removing items not present in the',
  '                        file',
+ '  --parallel            Merge the XML file into the deployment model as',
+ '                        subtrees loaded concurrently, up to',
+ '                        max_parallel_requests at a time',
+ '  --compress            Compress the XML file with gzip for upload',
+ '  --progress            Report upload progress and throughput on stderr',
  '  -j, --json            Output raw JSON response from server',
  '',
  'Required Arguments:',
@@ -257,18 +298,25 @@ litp_prepare_restore_missing_path = 'Usage: litp prepare_restore [-h] [-j] [-p P
 litp_prepare_restore_one_path = 'Usage: litp prepare_restore [-h] [-j] [-p PATH] [-f]\n' + \
 'litp prepare_restore: error: Path may only be specified once\n'
 
-litp_remove_help = ['Usage: litp remove [-h] -p PATH [-j]',
+litp_remove_help = ['Usage: litp remove [-h] [-p PATH] [--from-file FILE] [-j]',
  '',
  'Removes the specified item and its children from the deployment model.',
  '',
+ 'Several items are removed concurrently, up to max_parallel_requests from the',
+ '~/.litprc file at a time; items below another removed item need no request of',
+ 'their own.',
+ '',
  'Optional Arguments:',
  '  -h, --help            Show this help message and exit',
  '  -j, --json            Output raw JSON response from server',
  '',
- 'Required Arguments:',
- '  -p PATH, --path PATH  Location of item in the LITP model',
+ 'Path Arguments:',
+ '  -p PATH, --path PATH  Location of item in the LITP model, may be repeated',
+ '  --from-file FILE      File of paths to remove, one per line, - for stdin',
  '',
  'Example: litp remove -p /deployments/deployment1/clusters/cluster1',
+ 'Example: litp remove -p /software/items/vim -p /software/items/emacs',
+ 'Example: litp remove --from-file services.txt',
  '']
 
 litp_restore_snapshot_help = ['Usage: litp restore_snapshot [-h] [-j] [-f]',
@@ -307,7 +355,9 @@ litp_run_plan_help = ['Usage: litp run_plan [-h] [-j] [--resume]',
  'Example: litp run_plan',
  '']
 
-litp_show_help = ['Usage: litp show [-h] -p PATH [-l | -T | -o PROPERTY] [-j] [-r] [-n DEPTH]',
+litp_show_help = ['Usage: litp show [-h] -p PATH',
+ '                 [-l | -T | -o PROPERTY | --format {csv,tsv,table}] [-j] [-r]',
+ '                 [-n DEPTH] [--columns COLUMNS]',
  '',
  'Displays the item(s) located at the given path.',
  '',
@@ -320,10 +370,16 @@ litp_show_help = ['Usage: litp show [-h] -p PATH [-l | -T | -o PROPERTY] [-j] [-
  '  -T, --tree            List items at given path as a hierarchical tree',
  '  -o PROPERTY, --options PROPERTY',
  '                        Specific property to display',
+ '  --format {csv,tsv,table}',
+ '                        Output one row per item, as it is read, with the',
+ '                        columns of --columns',
  '  -j, --json            Output raw JSON response from server',
  '  -r, --recursive       Request children of item specified by path recursively',
  '  -n DEPTH, --depth DEPTH',
  '                        Limit the depth of recursion',
+ '  --columns COLUMNS     Comma separated columns of --format, among path, id,',
+ '                        type, state, source, reference and properties.NAME;',
+ '                        path,type,state by default',
  '',
  'Required Arguments:',
  '  -p PATH, --path PATH  Location of item in the LITP model',
@@ -331,7 +387,7 @@ litp_show_help = ['Usage: litp show [-h] -p PATH [-l | -T | -o PROPERTY] [-j] [-
  'Example: litp show -p /deployments -l',
  '']
 
-litp_show_plan_help = ['Usage: litp show_plan [-h] [-j] [-a]',
+litp_show_plan_help = ['Usage: litp show_plan [-h] [-j] [-a] [--eta]',
  '',
  'Displays the status of tasks initiated by the create_plan command or executed',
  'by the run_plan command. The tasks are executed in phases determined by the',
@@ -341,21 +397,31 @@ litp_show_plan_help = ['Usage: litp show_plan [-h] [-j] [-a]',
  '  -h, --help    Show this help message and exit',
  '  -j, --json    Output raw JSON response from server',
  '  -a, --active  Limit output to active tasks only',
+ '  --eta         Report task throughput and estimated plan completion time from',
+ '                successive show_plan polls',
  '',
  'Example: litp show_plan',
  '']
 
-litp_update_help = ['Usage: litp update [-h] -p PATH [-o PROPERTIES [PROPERTIES ...]]',
- '                   [-d PROPERTIES [PROPERTIES ...]] [-j]',
+litp_update_help = ['Usage: litp update [-h] (-p PATH | --match PATTERN)',
+ '                   [-o PROPERTIES [PROPERTIES ...]]',
+ '                   [-d PROPERTIES [PROPERTIES ...]] [--progress] [-j]',
  '',
  'Updates the properties of an item.',
  '',
+ 'With --match, every item matching the pattern is updated concurrently, up to',
+ 'max_parallel_requests from the ~/.litprc file at a time.',
+ '',
  'Optional Arguments:',
  '  -h, --help            Show this help message and exit',
+ '  --progress            Report the progress of the updates of --match on',
+ '                        stderr',
  '  -j, --json            Output raw JSON response from server',
  '',
  'Required Arguments:',
  '  -p PATH, --path PATH  Location of item in the LITP model',
+ '  --match PATTERN       Locations of items in the LITP model, as a path whose',
+ '                        elements may hold shell wildcards',
  '',
  '  -o PROPERTIES [PROPERTIES ...], --options PROPERTIES [PROPERTIES ...]',
  '                        Properties to update in item',
@@ -364,6 +430,8 @@ litp_update_help = ['Usage: litp update [-h] -p PATH [-o PROPERTIES [PROPERTIES
  '',
  'Example: litp update -p /infrastructure/networking/networks/mgmt -o',
  'name=new_network',
+ "Example: litp update --match '/deployments/*/clusters/*/nodes/*/items/ntp' -o",
+ 'server=ntp1',
  '']
 
 litp_upgrade_help = ['Usage: litp upgrade [-h] -p PATH [-j]',
@@ -0,0 +1,24 @@
+import unittest
+
+from bench_formatter import compare, median
+
+
+class BenchFormatterTests(unittest.TestCase):
+    def test_median(self):
+        self.assertEqual(2, median([3, 1, 2]))
+        self.assertEqual(2.5, median([4, 1, 2, 3]))
+
+    def test_compare(self):
+        baseline = {'show': {'1000': {'time': 0.009, 'peak_kib': 2000},
+                             '10000': {'time': 0.1, 'peak_kib': 20000}},
+                    'error': {'1000': {'error': 'died'}}}
+        results = {'show': {'1000': {'time': 0.013, 'peak_kib': 2900},
+                            '10000': {'time': 0.2, 'peak_kib': 40000}},
+                   'error': {'1000': {'time': 1.0, 'peak_kib': 0}},
+                   'new': {'1000': {'time': 1.0, 'peak_kib': 0}}}
+        # Only the differences above the noise and the tolerance count
+        self.assertEqual([
+            "show (10000 items): time 0.200s was 0.100s",
+            "show (10000 items): peak_kib 40000.000 KiB was 20000.000 KiB"],
+            compare(results, baseline, 0.25))
+        self.assertEqual([], compare(results, baseline, 1.5))
@@ -0,0 +1,184 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from mock import patch
+
+import sample_json_output
+
+from litpcli.client import LitpClient, LitpClientError
+from litpcli.litp import REST_URL, XML_URL, SERVICE_UNAVAILABLE_ERR, \
+    INVALID_RESPONSE_ERR
+
+
+class FakeResponse(object):
+    def __init__(self, data, status=200, length=None):
+        self.data = data
+        self.status = status
+        # Bytes announced by Content-Length but not yet received
+        self.length = length
+
+    def getheader(self, name, default=None):
+        return default
+
+    def read(self, amt=None):
+        if amt is None:
+            amt = len(self.data)
+        data, self.data = self.data[:amt], self.data[amt:]
+        return data
+
+
+class FakeLitpd(object):
+    """
+    Serves canned responses by method and URL, recording the requests.
+    """
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def connection(self):
+        return FakeConnection(self)
+
+
+class FakeConnection(object):
+    def __init__(self, litpd):
+        self.litpd = litpd
+        self.sock = None
+
+    def request(self, method, url, body=None, headers=None):
+        if hasattr(body, 'read'):
+            body = body.read()
+        with self.litpd.lock:
+            self.litpd.requests.append((method, url, body, headers))
+        self.pending = self.litpd.responses[(method, url)]
+
+    def getresponse(self):
+        data, status = self.pending[:2]
+        if callable(data):
+            data = data()
+        return FakeResponse(data, status, *self.pending[2:])
+
+    def close(self):
+        pass
+
+
+class LitpClientTests(unittest.TestCase):
+    def client(self, responses):
+        self.litpd = FakeLitpd(responses)
+        patcher = patch.object(LitpClient, '_create_connection',
+                               lambda _: self.litpd.connection())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return LitpClient('user', 'passwd')
+
+    def test_show_recursive(self):
+        first = sample_json_output.ms_ipaddresses_first_output
+        second = sample_json_output.ms_ipaddresses_second_output
+        client = self.client({
+            ('GET', REST_URL + '/ms/ipaddresses'): (json.dumps(first), 200),
+            ('GET', first['_embedded']['item'][0]['_links']['self']['href']):
+                (json.dumps(second), 200)})
+        item = client.show('/ms/ipaddresses', recursive=True)
+        expected = dict(second, _embedded={'item': []})
+        self.assertEqual([expected], item['_embedded']['item'])
+        headers = self.litpd.requests[0][3]
+        self.assertEqual('Basic dXNlcjpwYXNzd2Q=', headers['Authorization'])
+        self.assertEqual('gzip, deflate', headers['Accept-Encoding'])
+
+    def test_create_and_update(self):
+        response = json.dumps(sample_json_output.create_response)
+        client = self.client({
+            ('POST', REST_URL + '/software/items'): (response, 201),
+            ('PUT', REST_URL + '/software/items/vim'): (response, 200)})
+        self.assertEqual(sample_json_output.create_response, client.create(
+            '/software/items/vim', 'package', {'name': 'vim-enhanced'}))
+        client.update('/software/items/vim', {'name': 'vim'}, ['version'])
+        self.assertEqual(
+            [{'id': 'vim', 'type': 'package',
+              'properties': {'name': 'vim-enhanced'}},
+             {'properties': {'name': 'vim', 'version': None}}],
+            [json.loads(request[2]) for request in self.litpd.requests])
+
+    def test_error_raised(self):
+        error = sample_json_output.invalid_location_output
+        client = self.client({
+            ('GET', REST_URL + '/ms/x'): (json.dumps(error), 404),
+            ('DELETE', REST_URL + '/ms'): ('<html>Busy</html>', 503)})
+        try:
+            client.show('/ms/x')
+            self.fail("LitpClientError not raised")
+        except LitpClientError as ex:
+            self.assertEqual(404, ex.status)
+            self.assertEqual(error['messages'], ex.messages)
+            self.assertTrue('InvalidLocationError' in str(ex))
+        try:
+            client.remove('/ms')
+            self.fail("LitpClientError not raised")
+        except LitpClientError as ex:
+            self.assertEqual(503, ex.status)
+            self.assertEqual(SERVICE_UNAVAILABLE_ERR, str(ex))
+
+    def test_load_and_export_files(self):
+        xml = '<litp:root id="root"/>'
+        response = json.dumps(sample_json_output.create_response)
+        client = self.client({
+            ('POST', XML_URL + '/?merge=true'): (response, 201),
+            ('GET', XML_URL + '/deployments'): (xml, 200)})
+        export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_dir)
+        filename = os.path.join(export_dir, 'root.xml')
+        client.export('/deployments', filename)
+        self.assertEqual(xml, open(filename).read())
+        self.assertEqual(xml, client.export('/deployments'))
+        client.load('/', filename, merge=True)
+        self.assertEqual(xml, self.litpd.requests[-1][2])
+        self.assertEqual(len(xml), self.litpd.requests[-1][3]['Content-Length'])
+
+    def test_invalid_response(self):
+        first = sample_json_output.ms_ipaddresses_first_output
+        client = self.client({
+            ('GET', REST_URL + '/ms'): ('{"id": "ms", "_li', 200),
+            ('GET', REST_URL + '/ms/ipaddresses'): (json.dumps(first), 200),
+            ('GET', first['_embedded']['item'][0]['_links']['self']['href']):
+                ('<html>', 200),
+            ('GET', XML_URL + '/deployments'): ('<litp:root', 200, 100)})
+        export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_dir)
+        filename = os.path.join(export_dir, 'root.xml')
+        for call in (lambda: client.show('/ms'),
+                     lambda: client.show('/ms/ipaddresses', recursive=True),
+                     lambda: client.export('/deployments', filename)):
+            try:
+                call()
+                self.fail("LitpClientError not raised")
+            except LitpClientError as ex:
+                self.assertEqual(INVALID_RESPONSE_ERR, str(ex))
+        self.assertFalse(os.path.exists(filename))
+
+    def test_concurrent_calls(self):
+        barrier = threading.Event()
+        waiting = []
+
+        def slow_response():
+            waiting.append(1)
+            barrier.wait(5)
+            return json.dumps(sample_json_output.software_output)
+        client = self.client({
+            ('GET', REST_URL + '/software'): (slow_response, 200)})
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(client.show('/software')))
+            for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while len(waiting) < 4:
+            threading.Event().wait(0.01)
+        barrier.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([sample_json_output.software_output] * 4, results)
+        self.assertEqual(4, client.pool.connections_created)
@@ -0,0 +1,66 @@
+import httplib
+import unittest
+import zlib
+from StringIO import StringIO
+
+from litpcli.compression import DecompressingResponse, decode_response, \
+    gzip_compress
+
+
+class MockResponse(StringIO):
+    def __init__(self, data, encoding=None):
+        StringIO.__init__(self, data)
+        self.encoding = encoding
+        self.status = 200
+
+    def getheader(self, name, default=None):
+        if name == 'content-encoding':
+            return self.encoding
+        return default
+
+
+class CompressionTests(unittest.TestCase):
+    body = '{"id": "litp", "items": [%s]}' % ', '.join(
+        '"item%d"' % i for i in range(2000))
+
+    def test_gzip_response_read_in_chunks(self):
+        for amt in (1, 100, 65536, None):
+            response = decode_response(
+                MockResponse(gzip_compress(self.body), 'gzip'))
+            self.assertTrue(isinstance(response, DecompressingResponse))
+            self.assertEqual(200, response.status)
+            data = ''
+            while True:
+                chunk = response.read(amt)
+                data += chunk
+                if not chunk or amt is None:
+                    break
+            self.assertEqual(self.body, data)
+            self.assertEqual('', response.read(10))
+
+    def test_deflate_response_with_and_without_zlib_header(self):
+        raw = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        for data in (zlib.compress(self.body),
+                     raw.compress(self.body) + raw.flush()):
+            response = decode_response(MockResponse(data, 'deflate'))
+            self.assertEqual(self.body, response.read(17) + response.read())
+
+    def test_truncated_response(self):
+        for data, encoding in ((gzip_compress(self.body), 'gzip'),
+                               (zlib.compress(self.body), 'deflate')):
+            for cut in (1, 8, len(data) // 2):
+                for amt in (100, None):
+                    response = decode_response(
+                        MockResponse(data[:-cut], encoding))
+                    with self.assertRaises(httplib.IncompleteRead):
+                        while response.read(amt) and amt is not None:
+                            pass
+
+    def test_empty_response(self):
+        self.assertEqual('', decode_response(MockResponse('', 'gzip')).read())
+
+    def test_identity_response_not_wrapped(self):
+        response = MockResponse(self.body)
+        self.assertTrue(decode_response(response) is response)
+        response = StringIO(self.body)
+        self.assertTrue(decode_response(response) is response)
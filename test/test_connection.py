@@ -0,0 +1,198 @@
+import httplib
+import socket
+import threading
+import time
+import unittest
+
+from mock import Mock, patch
+
+from litpcli import connection
+from litpcli.connection import ConnectionPool
+from litpcli.retry import DeadlineExceeded
+
+
+class FakeResponse(object):
+    def __init__(self, data, will_close=False):
+        self.data = data
+        self.status = 200
+        self.will_close = will_close
+
+    def read(self, amt=None):
+        data, self.data = self.data, ''
+        return data
+
+
+class FakeConnection(object):
+    def __init__(self, responses=None):
+        self.responses = responses or []
+        self.requests = []
+        self.closed = False
+        self.sock = None
+
+    def request(self, method, url, body=None, headers=None):
+        self.requests.append((method, url, body))
+
+    def getresponse(self):
+        if self.responses:
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return FakeResponse('ok')
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.created = []
+
+    def factory(self):
+        conn = FakeConnection()
+        self.created.append(conn)
+        return conn
+
+    def get(self, pool, method='GET', url='/'):
+        pool.request(method, url, None, {})
+        return pool.getresponse().read()
+
+    def test_connection_reused(self):
+        pool = ConnectionPool(self.factory)
+        self.assertEqual('ok', self.get(pool))
+        self.assertEqual('ok', self.get(pool))
+        self.assertEqual(1, len(self.created))
+        self.assertEqual(2, len(self.created[0].requests))
+        self.assertEqual([2], [conn['requests'] for conn in pool.stats()])
+
+    def test_seed_connection_used_first(self):
+        seed = FakeConnection()
+        pool = ConnectionPool(self.factory, connection=seed)
+        self.get(pool)
+        self.assertEqual(1, len(seed.requests))
+        self.assertEqual([], self.created)
+
+    def test_unread_response_not_reused(self):
+        pool = ConnectionPool(self.factory)
+        pool.request('GET', '/', None, {})
+        pool.getresponse()
+        self.get(pool)
+        self.assertEqual(2, len(self.created))
+
+    def test_connection_close_not_reused(self):
+        seed = FakeConnection([FakeResponse('bye', will_close=True)])
+        pool = ConnectionPool(self.factory, connection=seed)
+        self.assertEqual('bye', self.get(pool))
+        self.assertTrue(seed.closed)
+        self.get(pool)
+        self.assertEqual(1, len(self.created))
+
+    def test_idle_timeout(self):
+        pool = ConnectionPool(self.factory, idle_timeout=-1)
+        self.get(pool)
+        self.get(pool)
+        self.assertEqual(2, len(self.created))
+        self.assertTrue(self.created[0].closed)
+
+    def test_closed_socket_fails_health_check(self):
+        local, remote = socket.socketpair()
+        seed = FakeConnection()
+        pool = ConnectionPool(self.factory, connection=seed)
+        self.get(pool)
+        seed.sock = local
+        remote.close()
+        self.get(pool)
+        self.assertTrue(seed.closed)
+        self.assertEqual(1, len(self.created))
+        local.close()
+
+    def test_read_request_resent_on_stale_connection(self):
+        seed = FakeConnection(
+            [FakeResponse('first'), httplib.BadStatusLine('')])
+        pool = ConnectionPool(self.factory, connection=seed)
+        self.assertEqual('first', self.get(pool))
+        self.assertEqual('ok', self.get(pool, 'GET', '/again'))
+        self.assertEqual(1, pool.reconnects)
+        self.assertEqual([('GET', '/again', None)], self.created[0].requests)
+
+    def test_write_request_not_resent(self):
+        for method in ('POST', 'PUT', 'DELETE'):
+            seed = FakeConnection(
+                [FakeResponse('first'), httplib.BadStatusLine('')])
+            pool = ConnectionPool(self.factory, connection=seed)
+            self.get(pool)
+            self.assertRaises(httplib.BadStatusLine, self.get, pool, method)
+            self.assertEqual([], self.created)
+
+    def test_timed_out_request_not_resent(self):
+        seed = FakeConnection([FakeResponse('first'), socket.timeout()])
+        pool = ConnectionPool(self.factory, connection=seed)
+        self.get(pool)
+        self.assertRaises(socket.timeout, self.get, pool)
+        self.assertEqual([], self.created)
+        self.assertTrue(seed.closed)
+
+    def test_timeout_applied_to_each_request(self):
+        timeouts = [5, 2.5]
+        seed = FakeConnection()
+        pool = ConnectionPool(self.factory, connection=seed,
+                              timeout=lambda: timeouts.pop(0))
+        self.get(pool)
+        self.assertEqual(5, seed.timeout)
+        seed.sock = Mock()
+        with patch.object(ConnectionPool, '_is_healthy', return_value=True):
+            self.get(pool)
+        self.assertEqual(2.5, seed.timeout)
+        seed.sock.settimeout.assert_called_once_with(2.5)
+        self.assertEqual([], self.created)
+
+    def test_expired_deadline_not_applied_to_socket(self):
+        seed = FakeConnection()
+        seed.sock = Mock()
+        pool = ConnectionPool(self.factory, connection=seed,
+                              timeout=lambda: 0.0)
+        with patch.object(ConnectionPool, '_is_healthy', return_value=True):
+            self.assertRaises(DeadlineExceeded, self.get, pool)
+        self.assertFalse(seed.sock.settimeout.called)
+        self.assertEqual([], seed.requests)
+
+    def test_concurrent_requests_use_separate_connections(self):
+        barrier = threading.Event()
+        waiting = []
+
+        class SlowConnection(FakeConnection):
+            def getresponse(self):
+                waiting.append(self)
+                barrier.wait(5)
+                return FakeResponse(self.requests[-1][1])
+
+        def factory():
+            conn = SlowConnection()
+            self.created.append(conn)
+            return conn
+
+        pool = ConnectionPool(factory, size=4)
+        results = {}
+
+        def worker(url):
+            results[url] = self.get(pool, 'GET', url)
+
+        threads = [threading.Thread(target=worker, args=('/%d' % i,))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + 5
+        while len(waiting) < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        barrier.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(dict(('/%d' % i, '/%d' % i) for i in range(4)),
+                         results)
+        self.assertEqual(4, len(self.created))
+
+
+class SslContextTests(unittest.TestCase):
+    def test_shared_ssl_context(self):
+        self.assertTrue(connection.get_ssl_context() is
+                        connection.get_ssl_context())
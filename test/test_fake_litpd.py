@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch
+
+from fake_litpd import FakeLitpd, Model, FaultInjector
+from litpcli.client import LitpClient, LitpClientError
+
+
+class FakeLitpdTests(unittest.TestCase):
+    """
+    Exercises the client's transport over a real unix socket.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmpdir, 'litpd.sock')
+        self.litpd = FakeLitpd(Model(nodes=5, items_per_node=4))
+        self.litpd.serve_unix(self.socket_path)
+
+    def tearDown(self):
+        self.litpd.shutdown()
+        shutil.rmtree(self.tmpdir)
+
+    def client(self, **kwargs):
+        client = LitpClient(unix_socket_path=self.socket_path, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_recursive_show_over_one_connection(self):
+        client = self.client()
+        nodes = client.show('/deployments/d1/clusters/c1/nodes',
+                            recursive=True)
+        self.assertEqual(5, len(nodes['_embedded']['item']))
+        self.assertEqual(
+            4, len(nodes['_embedded']['item'][0]['_embedded']['item']))
+        self.assertEqual(1, client.pool.connections_created)
+
+    def test_plan_progresses(self):
+        client = self.client()
+        client.create_plan()
+        client.run_plan()
+        states = set()
+        for _ in range(6):
+            states.add(client.show_plan()['properties']['state'])
+        self.assertEqual(set(['running', 'successful']), states)
+
+    @patch('litpcli.retry.sleep')
+    def test_injected_errors_retried(self, sleep):
+        self.litpd.servers[0].faults = FaultInjector(error_rate=1.0)
+        client = self.client(retries=2)
+        try:
+            client.show('/ms')
+            self.fail("LitpClientError not raised")
+        except LitpClientError as ex:
+            self.assertEqual(503, ex.status)
+        self.assertEqual([((1.0,), {})] * 2, sleep.call_args_list)
+
+    @patch('litpcli.retry.sleep')
+    def test_dropped_connection(self, sleep):
+        self.litpd.servers[0].faults = FaultInjector(drop_rate=1.0)
+        client = self.client(retries=1)
+        self.assertRaises(LitpClientError, client.show, '/ms')
+        self.assertEqual(1, sleep.call_count)
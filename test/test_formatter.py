@@ -4,6 +4,8 @@ import unittest
 import sample_json_output
 
 from litpcli.formatter import CliFormatter
+from litpcli.model import ModelTree
+from litpcli.progress import PlanEstimate
 
 
 class CliFormatterTests(unittest.TestCase):
@@ -69,6 +71,36 @@ class CliFormatterTests(unittest.TestCase):
         )
         self.assertEqual(expected, formatter.cb_format_show_plan(data))
 
+    def test_iter_show_plan_streamed_phases(self):
+        data = json.loads(sample_json_output.plan_output)
+        formatter = CliFormatter(self.url)
+        phases = data['_embedded']['item'][0]['_embedded']['item']
+        phase_metrics = []
+        output = list(formatter.iter_show_plan(
+            formatter.iter_plan_phases(iter(phases)), lambda: data,
+            phase_metrics))
+        self.assertEqual(formatter.cb_format_show_plan(data),
+                         "\n".join(output))
+        self.assertEqual(3, len(output))
+        self.assertEqual([{'total': 1, 'initial': 1, 'running': 0,
+                           'success': 0, 'failed': 0, 'stopped': 0}],
+                         phase_metrics)
+
+    def test_cb_format_plan_estimate(self):
+        formatter = CliFormatter(self.url)
+        self.assertTrue(formatter.cb_format_plan_estimate(None).startswith(
+            "Throughput: not enough samples yet"))
+        estimate = PlanEstimate(20, 14, 120, 6.0, [(2, 2.0, 4, 10)])
+        expected = (
+            "Throughput: 6.0 tasks/min over 2m00s | Completed: 14/20\n"
+            "\tPhase 2: 2.0 tasks/min | Completed: 4/10\n"
+            "ETA: none, plan is not running")
+        self.assertEqual(expected, formatter.cb_format_plan_estimate(
+            estimate, 'stopped'))
+        estimate.eta = 0
+        self.assertTrue(formatter.cb_format_plan_estimate(
+            estimate, 'running').endswith("(1m00s remaining, 6 tasks)"))
+
     def test_format_paths_as_tree(self):
         data = json.loads(sample_json_output.recursive_ms_output)
         formatter = CliFormatter(self.url)
@@ -82,6 +114,30 @@ class CliFormatterTests(unittest.TestCase):
         self.assertEqual(expected, formatter.cb_format_paths_as_tree(data,
                                                             recursive=True))
 
+    def _recursive_ms_tree(self):
+        data = json.loads(sample_json_output.recursive_ms_output)
+        # An inherited item and a link below /ms/items
+        data['_embedded']['item'][1]['_embedded'] = {'item': [
+            sample_json_output.show_inherited_output,
+            sample_json_output.show_link_output]}
+        tree = ModelTree(self.url)
+        tree.add_tree(data)
+        return data, tree
+
+    def test_format_model_tree(self):
+        data, tree = self._recursive_ms_tree()
+        for args in ({}, {'property': 'hostname'}):
+            formatter = CliFormatter(self.url, args)
+            self.assertEqual(
+                formatter.cb_format_show(json.dumps(data), recursive=True),
+                formatter.cb_format_show(tree, recursive=True))
+        formatter = CliFormatter(self.url)
+        for callback in (formatter.cb_format_paths_as_tree,
+                         formatter.cb_format_path_list,
+                         formatter.cb_format_path_completion):
+            self.assertEqual(callback(json.dumps(data), recursive=True),
+                             callback(tree, recursive=True))
+
     def test_format_item_types(self):
         data = json.loads(sample_json_output.item_types_output)
         formatter = CliFormatter(self.url)
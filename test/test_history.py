@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from litpcli.history import PlanHistory
+
+
+def plan(*phases):
+    return [[(task_id, '/ms', 'Task %s' % task_id, state)
+             for task_id, state in phase] for phase in phases]
+
+
+class PlanHistoryTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.history = PlanHistory(os.path.join(self.tmpdir, 'history.db'))
+
+    def tearDown(self):
+        self.history.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_observations_of_one_run(self):
+        history = self.history
+        run_id = history.record(plan([('t1', 'Initial'), ('t2', 'Initial')]),
+                                'initial', timestamp=0)
+        self.assertEqual(run_id, history.record(
+            plan([('t1', 'Running'), ('t2', 'Initial')]), 'running',
+            timestamp=10))
+        history.record(plan([('t1', 'Success'), ('t2', 'Running')]),
+                       'running', timestamp=70)
+        history.record(plan([('t1', 'Success'), ('t2', 'Success')]),
+                       'successful', timestamp=100)
+
+        self.assertEqual([{'run': run_id, 'plan_id': 'plan', 'first_seen': 0,
+                           'last_seen': 100, 'state': 'successful',
+                           'tasks': 2}], history.runs())
+        self.assertEqual([{'phase': 1, 'tasks': 2, 'started': 10,
+                           'finished': 100, 'duration': 90}],
+                         history.phase_durations(run_id))
+        slowest = history.slowest_tasks(run_id)
+        self.assertEqual([('t1', 60), ('t2', 30)],
+                         [(task['description'][5:], task['duration'])
+                          for task in slowest])
+
+    def test_new_run_detection(self):
+        history = self.history
+        first = history.record(plan([('t1', 'Success')]), 'successful',
+                               timestamp=0)
+        # Same tasks, but the plan was recreated
+        second = history.record(plan([('t1', 'Initial')]), 'initial',
+                                timestamp=10)
+        self.assertNotEqual(first, second)
+        # Different tasks
+        third = history.record(plan([('t1', 'Initial')], [('t2', 'Initial')]),
+                               'initial', timestamp=20)
+        self.assertNotEqual(second, third)
+        self.assertEqual(third, history.latest_run())
+        self.assertEqual(3, len(history.runs()))
+
+    def test_incomplete_phase_has_no_duration(self):
+        run_id = self.history.record(
+            plan([('t1', 'Success'), ('t2', 'Running')]), 'running',
+            timestamp=0)
+        self.assertEqual(None,
+                         self.history.phase_durations(run_id)[0]['duration'])
@@ -0,0 +1,36 @@
+import json
+import unittest
+from StringIO import StringIO
+
+import sample_json_output
+
+from litpcli.jsonstream import JsonItemStream, ANY
+
+
+class JsonItemStreamTests(unittest.TestCase):
+    def test_stream_plan_phases(self):
+        data = json.loads(sample_json_output.plan_output)
+        phases = data['_embedded']['item'][0]['_embedded']['item']
+        for chunk_size in (1, 7, 65536):
+            stream = JsonItemStream(
+                StringIO(sample_json_output.plan_output),
+                ('_embedded', 'item', ANY, '_embedded', 'item'), chunk_size)
+            self.assertEqual(phases, list(stream))
+            data['_embedded']['item'][0]['_embedded']['item'] = []
+            self.assertEqual(data, stream.remainder)
+            self.assertEqual(len(sample_json_output.plan_output),
+                             stream.bytes_read)
+
+    def test_stream_tricky_strings_and_scalars(self):
+        elements = [1, 'x]"{', {'b': '}\\'}, [2, [3]], None, True]
+        document = json.dumps({'a': elements, 'z': {'a': [5]}})
+        for chunk_size in range(1, 12):
+            stream = JsonItemStream(StringIO(document), ('a',), chunk_size)
+            self.assertEqual(elements, list(stream))
+            self.assertEqual({'a': [], 'z': {'a': [5]}}, stream.remainder)
+
+    def test_truncated_document(self):
+        stream = JsonItemStream(StringIO('{"a": [{"b": 1}, {"c":'), ('a',), 4)
+        self.assertRaises(ValueError, list, stream)
+        stream = JsonItemStream(StringIO('{"a": [{"b": 1}'), ('a',), 4)
+        self.assertRaises(ValueError, list, stream)
@@ -0,0 +1,119 @@
+import json
+import unittest
+
+from litpcli.manifest import load_manifest, plan_operations, dependencies, \
+    subtree_depths, find_item, ManifestError, Operation, CREATE, INHERIT, \
+    UPDATE, REMOVE
+
+REST_URL = 'https://localhost:9999/litp/rest/v1'
+
+MANIFEST = json.dumps({
+    'items': [
+        {'path': '/software/items/vim', 'type': 'package',
+         'properties': {'name': 'vim-enhanced'}},
+        {'path': '/ms/items/vim', 'inherit': '/software/items/vim'},
+        {'path': '/ms/items/ntp', 'type': 'package',
+         'properties': {'name': 'ntp', 'epoch': 0, 'enabled': True,
+                        'release': None}},
+    ],
+    'remove': ['/software/items/emacs', '/software/items/emacs/files']})
+
+
+class ManifestTests(unittest.TestCase):
+    def test_load(self):
+        items, removals = load_manifest(MANIFEST, 'site.json')
+        self.assertEqual(['/software/items/vim', '/ms/items/vim',
+                          '/ms/items/ntp'], [item.path for item in items])
+        self.assertEqual('/software/items/vim', items[1].source)
+        self.assertEqual({'name': 'ntp', 'epoch': '0', 'enabled': 'true',
+                          'release': None}, items[2].properties)
+        self.assertEqual(['/software/items/emacs'], removals)
+
+    def test_invalid(self):
+        for manifest in (
+                '[{"path": "/a"}]',
+                '[{"path": "/a", "type": "t", "inherit": "/b"}]',
+                '[{"path": "/a", "type": "t"}, {"path": "/a", "type": "t"}]',
+                '{"items": [{"path": "/a/b", "type": "t"}], "remove": ["/a"]}',
+                '[{"path": "a b", "type": "t"}]',
+                '{'):
+            self.assertRaises(ManifestError, load_manifest, manifest, 'm')
+
+    def test_plan(self):
+        items, removals = load_manifest(MANIFEST, 'site.json')
+        current = {
+            '/software/items/vim': None,
+            '/ms/items/vim': None,
+            '/ms/items/ntp': {
+                'item-type-name': 'package',
+                'properties': {'name': 'ntp', 'epoch': '1',
+                               'release': '2'}},
+            '/software/items/emacs': {'item-type-name': 'package'},
+        }
+        operations, conflicts = plan_operations(items, removals, current)
+        self.assertEqual([], conflicts)
+        self.assertEqual([(CREATE, '/software/items/vim'),
+                          (INHERIT, '/ms/items/vim'),
+                          (UPDATE, '/ms/items/ntp'),
+                          (REMOVE, '/software/items/emacs')],
+                         [(op.kind, op.path) for op in operations])
+        self.assertEqual(
+            ('PUT', '/ms/items/ntp', {'properties': {
+                'epoch': '0', 'enabled': 'true', 'release': None}}),
+            operations[2].request())
+        self.assertEqual(
+            ('POST', '/ms/items', {'inherit': '/software/items/vim',
+                                   'id': 'vim', 'properties': {}}),
+            operations[1].request())
+        self.assertEqual({'/software/items/vim': set(),
+                          '/ms/items/vim': set(['/software/items/vim'])},
+                         dependencies(operations))
+
+    def test_conflicts(self):
+        items, removals = load_manifest(MANIFEST, 'site.json')
+        current = {
+            '/software/items/vim': {'item-type-name': 'file'},
+            '/ms/items/vim': {'item-type-name': 'package', '_links': {}},
+        }
+        operations, conflicts = plan_operations(items, removals, current)
+        self.assertEqual([
+            "/software/items/vim exists with type file, not package",
+            "/ms/items/vim exists and is not inherited from"
+            " /software/items/vim"], conflicts)
+
+    def test_dependencies(self):
+        operations = [
+            Operation(REMOVE, '/software/items/emacs'),
+            Operation(UPDATE, '/software/items/vim'),
+            Operation(INHERIT, '/ms/items/vim', source='/software/items/vim'),
+            Operation(INHERIT, '/ms/items/emacs-files',
+                      source='/software/items/emacs/files'),
+            Operation(CREATE, '/ms/items/vim/files'),
+        ]
+        self.assertEqual({
+            '/software/items/emacs': set(['/ms/items/emacs-files']),
+            '/ms/items/vim': set(['/software/items/vim']),
+            '/ms/items/emacs-files': set(),
+            '/ms/items/vim/files': set(['/ms/items/vim'])},
+            dependencies(operations))
+
+    def test_find_item(self):
+        paths = ['/ms/items/vim', '/ms', '/software/items/vim',
+                 '/software/items/emacs', '/ms/items/ntp']
+        depths = subtree_depths(paths)
+        self.assertEqual({'/ms': 2, '/software/items/vim': 0,
+                          '/software/items/emacs': 0}, depths)
+
+        def item(path, *children):
+            return {'_links': {'self': {'href': REST_URL + path}},
+                    '_embedded': {'item': list(children)}}
+        vim = item('/ms/items/vim')
+        subtrees = {'/ms': item('/ms', item('/ms/items', vim)),
+                    '/software/items/vim': None,
+                    '/software/items/emacs': item('/software/items/emacs')}
+        self.assertEqual(vim, find_item(subtrees, '/ms/items/vim'))
+        self.assertEqual(None, find_item(subtrees, '/ms/items/ntp'))
+        self.assertEqual(None, find_item(subtrees, '/software/items/vim'))
+        self.assertEqual(None, find_item(subtrees,
+                                         '/software/items/vim/files'))
+        self.assertEqual(subtrees['/ms'], find_item(subtrees, '/ms'))
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from litpcli.metrics import LatencyMetrics, endpoint, COMMAND_METRIC, \
+    REQUEST_METRIC
+
+
+class LatencyMetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.metrics = LatencyMetrics(os.path.join(self.tmpdir, 'metrics.db'))
+
+    def tearDown(self):
+        self.metrics.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_endpoint(self):
+        self.assertEqual('/plans', endpoint(
+            'https://localhost:9999/litp/rest/v1/plans/plan?recurse_depth=1'))
+        self.assertEqual('/', endpoint('https://localhost:9999/litp/rest/v1/'))
+        self.assertEqual('/litp/xml', endpoint(
+            'https://localhost:9999/litp/xml/deployments/d1'))
+
+    def test_histograms(self):
+        labels = [('action', 'show'), ('transport', 'unix')]
+        self.metrics.record([(COMMAND_METRIC, labels, 0.003),
+                             (COMMAND_METRIC, labels, 0.2),
+                             (COMMAND_METRIC, labels, 120)])
+        self.metrics.record([(REQUEST_METRIC, [('method', 'GET'),
+                                               ('endpoint', '/'),
+                                               ('transport', 'unix')], 0.02)])
+        output = self.metrics.render().splitlines()
+        self.assertEqual(
+            '# TYPE litp_cli_command_duration_seconds histogram', output[1])
+        self.assertEqual(
+            'litp_cli_command_duration_seconds_bucket{action="show",'
+            'transport="unix",le="0.005"} 1', output[2])
+        self.assertTrue(
+            'litp_cli_command_duration_seconds_bucket{action="show",'
+            'transport="unix",le="0.25"} 2' in output)
+        self.assertTrue(
+            'litp_cli_command_duration_seconds_bucket{action="show",'
+            'transport="unix",le="+Inf"} 3' in output)
+        self.assertTrue(
+            'litp_cli_command_duration_seconds_sum{action="show",'
+            'transport="unix"} 120.203' in output)
+        self.assertTrue(
+            'litp_cli_request_duration_seconds_count{method="GET",'
+            'endpoint="/",transport="unix"} 1' in output)
@@ -0,0 +1,40 @@
+import unittest
+
+import sample_json_output
+
+from litpcli.model import ModelTree, is_model_item
+
+URL = "https://localhost:9999/litp/rest/v1"
+
+
+class ModelTreeTests(unittest.TestCase):
+    def test_add(self):
+        tree = ModelTree(URL)
+        root = tree.add(sample_json_output.show_link_output)
+        inherited = tree.add(sample_json_output.show_inherited_output, root)
+        self.assertEqual([0, 1], [root, inherited])
+        node = tree.root
+        self.assertEqual('/deployments/single_blade/clusters/cluster1/nodes'
+                         '/node1/system', node.path)
+        self.assertEqual('/infrastructure/system_providers/libvirt1/systems'
+                         '/vm1', node.reference)
+        self.assertEqual('libvirt-system', node.item_type)
+        self.assertEqual({'system_name': 'VM1'}, node.properties)
+        child, = tree.children(node)
+        self.assertEqual('/infrastructure/storage/storage_profiles/profile1'
+                         '/volume_groups/vg1/file_systems/root', child.source)
+        self.assertEqual(('size',), child.overwritten)
+        self.assertEqual([], tree.children(child))
+        self.assertEqual(2, len(tree))
+
+    def test_shared_strings(self):
+        tree = ModelTree(URL)
+        first = tree.nodes[tree.add(sample_json_output.show_inherited_output)]
+        second = tree.nodes[tree.add(sample_json_output.show_inherited_output)]
+        self.assertTrue(first.item_type is second.item_type)
+        self.assertTrue(first.source is second.source)
+
+    def test_is_model_item(self):
+        self.assertTrue(is_model_item(sample_json_output.show_link_output))
+        self.assertFalse(is_model_item(sample_json_output.item_description))
+        self.assertFalse(is_model_item([]))
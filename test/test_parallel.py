@@ -0,0 +1,67 @@
+import threading
+import unittest
+
+from litpcli.parallel import run_ordered, run_parallel, Skipped, Failed, \
+    RequestProgress
+
+
+class RunOrderedTests(unittest.TestCase):
+    def test_dependencies_run_first(self):
+        lock = threading.Lock()
+        order = []
+
+        def func(key):
+            with lock:
+                order.append(key)
+            return key.upper()
+        results = run_ordered(['c', 'b', 'a'], func,
+                              {'c': ['b'], 'b': ['a']}, 4)
+        self.assertEqual(['a', 'b', 'c'], order)
+        self.assertEqual({'a': 'A', 'b': 'B', 'c': 'C'}, results)
+
+    def test_dependents_of_failures_skipped(self):
+        def func(key):
+            if key == 'b':
+                raise ValueError(key)
+            return key != 'a'
+        results = run_ordered(
+            ['a', 'b', 'c', 'd', 'e'], func,
+            {'c': ['a'], 'd': ['b'], 'e': ['d']}, 2,
+            failed=lambda result: not result)
+        self.assertFalse(results['a'])
+        self.assertTrue(isinstance(results['b'], Failed))
+        self.assertEqual('a', results['c'].dependency)
+        self.assertEqual('b', results['d'].dependency)
+        self.assertEqual('d', results['e'].dependency)
+
+    def test_cycle_skipped(self):
+        results = run_ordered(['a', 'b', 'c'], lambda key: key,
+                              {'a': ['b'], 'b': ['a']})
+        self.assertEqual('c', results['c'])
+        self.assertTrue(isinstance(results['a'], Skipped))
+        self.assertTrue(isinstance(results['b'], Skipped))
+
+    def test_run_parallel(self):
+        seen = []
+        results = run_parallel(range(20), lambda key: key * 2, 3,
+                               lambda key, result: seen.append(key))
+        self.assertEqual(dict((key, key * 2) for key in range(20)), results)
+        self.assertEqual(range(20), sorted(seen))
+
+
+class RequestProgressTests(unittest.TestCase):
+    def test_report(self):
+        now = [100.0]
+        lines = []
+        progress = RequestProgress(4, 'requests', lines.append,
+                                   lambda result: result != 200,
+                                   clock=lambda: now[0])
+        progress.update('a', 200)
+        now[0] += 2
+        progress.update('b', 404)
+        progress.update('c', 200)
+        progress.update('d', 200)
+        progress.finish()
+        self.assertEqual([
+            "Completed 2 of 4 requests (50%), 1 failed, 1.0/s",
+            "Completed 4 requests in 2.0s, 1 failed, 2.0/s"], lines)
@@ -0,0 +1,64 @@
+import unittest
+
+from litpcli.paths import collapse_descendants, expand_glob, parent_path, \
+    model_path, expand_braces, has_braces, substitute
+
+
+class PathsTests(unittest.TestCase):
+    def test_parent_path(self):
+        self.assertEqual('/ms', parent_path('/ms/items'))
+        self.assertEqual('/', parent_path('/ms'))
+        self.assertEqual(None, parent_path('/'))
+        self.assertEqual('/ms', model_path(
+            'https://localhost:9999/litp/rest/v1/ms/'))
+
+    def test_collapse_descendants(self):
+        self.assertEqual(['/b', '/a'], collapse_descendants(
+            ['/b', '/a/c', '/a/', '/b', '/a/c/d']))
+
+    def test_expand_glob(self):
+        model = {'/': ['deployments', 'ms'],
+                 '/deployments': ['d1', 'd2'],
+                 '/deployments/d1/nodes': ['node1', 'node2', 'ms1'],
+                 '/deployments/d2/nodes': ['node3'],
+                 '/deployments/d1/nodes/node1/items': ['vim'],
+                 '/deployments/d1/nodes/node2/items': ['emacs'],
+                 '/deployments/d2/nodes/node3/items': ['vim']}
+        listed = []
+
+        def list_children(paths):
+            listed.append(paths)
+            return dict((path, model.get(path)) for path in paths)
+        self.assertEqual(
+            ['/deployments/d1/nodes/node1/items/vim',
+             '/deployments/d2/nodes/node3/items/vim'],
+            expand_glob('/deployments/*/nodes/node?/items/vim',
+                        list_children))
+        self.assertEqual([['/deployments'], ['/deployments/d1/nodes',
+                                             '/deployments/d2/nodes'],
+                          ['/deployments/d1/nodes/node1/items',
+                           '/deployments/d1/nodes/node2/items',
+                           '/deployments/d2/nodes/node3/items']],
+                         listed)
+        self.assertEqual([], expand_glob('/deployments/*/nodes/node4',
+                                         list_children))
+        self.assertEqual([], expand_glob('/software/*', list_children))
+        self.assertEqual(['/ms/items'], expand_glob('/ms/items',
+                                                    list_children))
+
+    def test_expand_braces(self):
+        self.assertEqual([('/c/n1/eth0', ('1', '0')),
+                          ('/c/n1/eth1', ('1', '1')),
+                          ('/c/n2/eth0', ('2', '0')),
+                          ('/c/n2/eth1', ('2', '1'))],
+                         expand_braces('/c/n{1..2}/eth{0,1}'))
+        self.assertEqual(['n09', 'n10', 'n11'], [
+            path for path, _ in expand_braces('n{09..11}')])
+        self.assertEqual(['n3', 'n2'], [
+            path for path, _ in expand_braces('n{3..2}')])
+        self.assertEqual(4, len(expand_braces('/n{1..2}/e{0,1}', limit=4)))
+        self.assertRaises(ValueError, expand_braces, '/n{1..100000000}', 10)
+        self.assertTrue(has_braces('/n{1..2}'))
+        self.assertFalse(has_braces('node{}'))
+        self.assertEqual('node7-eth0-{2}',
+                         substitute('node{}-eth{1}-{2}', ('7', '0')))
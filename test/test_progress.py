@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from litpcli.progress import PlanProgress
+
+
+def phase_metrics(*phases):
+    return [{'total': total, 'success': success, 'failed': 0}
+            for success, total in phases]
+
+
+class PlanProgressTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'progress')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_estimate_needs_two_samples(self):
+        progress = PlanProgress(self.filename)
+        progress.add_sample(phase_metrics((0, 10)), timestamp=100)
+        self.assertEqual(None, progress.estimate())
+
+    def test_estimate(self):
+        progress = PlanProgress(self.filename)
+        progress.add_sample(phase_metrics((2, 10), (0, 10)), timestamp=0)
+        progress.add_sample(phase_metrics((10, 10), (4, 10)), timestamp=120)
+        estimate = progress.estimate()
+        self.assertEqual(20, estimate.total)
+        self.assertEqual(14, estimate.completed)
+        self.assertEqual(6.0, estimate.rate)
+        self.assertEqual([(1, 4.0, 10, 10), (2, 2.0, 4, 10)],
+                         estimate.phase_rates)
+        self.assertEqual(180, estimate.eta)
+        self.assertEqual(None, progress.estimate(running=False).eta)
+
+    def test_new_plan_resets_samples(self):
+        progress = PlanProgress(self.filename)
+        progress.add_sample(phase_metrics((5, 10)), timestamp=0)
+        progress.add_sample(phase_metrics((1, 10)), timestamp=60)
+        self.assertEqual(1, len(progress.samples))
+        progress.add_sample(phase_metrics((1, 10), (0, 3)), timestamp=120)
+        self.assertEqual(1, len(progress.samples))
+
+    def test_save_and_load(self):
+        progress = PlanProgress(self.filename)
+        progress.add_sample(phase_metrics((0, 10)), timestamp=0)
+        progress.save()
+        self.assertEqual('0600', oct(os.stat(self.filename).st_mode)[-4:])
+        progress = PlanProgress(self.filename)
+        self.assertEqual([{'time': 0, 'phases': [[0, 10]]}],
+                         progress.load())
+
+    def test_load_corrupt_file(self):
+        with open(self.filename, 'w') as fobj:
+            fobj.write('not json')
+        self.assertEqual([], PlanProgress(self.filename).load())
@@ -0,0 +1,81 @@
+import socket
+import unittest
+from email.utils import formatdate
+
+from mock import Mock, patch
+
+from litpcli.retry import Deadline, RetryPolicy, parse_retry_after, \
+    send_request
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RetryTests(unittest.TestCase):
+    def test_deadline(self):
+        clock = Clock()
+        deadline = Deadline(30, clock)
+        self.assertEqual(30, deadline.remaining())
+        self.assertEqual(10, deadline.limit(10))
+        clock.now += 25
+        self.assertEqual(5, deadline.limit(10))
+        self.assertEqual(5, deadline.limit(None))
+        self.assertFalse(deadline.expired())
+        clock.now += 10
+        self.assertEqual(0, deadline.remaining())
+        self.assertTrue(deadline.expired())
+
+    def test_no_deadline(self):
+        deadline = Deadline()
+        self.assertEqual(None, deadline.remaining())
+        self.assertEqual(None, deadline.limit(None))
+        self.assertEqual(10, deadline.limit(10))
+        self.assertFalse(deadline.expired())
+
+    def test_backoff_is_jittered_and_capped(self):
+        policy = RetryPolicy(5, base_delay=0.5, max_delay=3,
+                             rand=lambda low, high: (low, high))
+        self.assertEqual([(0, 0.5), (0, 1.0), (0, 2.0), (0, 3), (0, 3)],
+                         [policy.delay(attempt) for attempt in range(5)])
+        self.assertEqual(2, policy.delay(0, retry_after=2))
+        self.assertEqual(3, policy.delay(0, retry_after=120))
+        for attempt in range(5):
+            self.assertTrue(0 <= RetryPolicy().delay(attempt) <= 8)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(5, parse_retry_after(' 5 '))
+        self.assertEqual(None, parse_retry_after(None))
+        self.assertEqual(None, parse_retry_after('soon'))
+        self.assertEqual(30, parse_retry_after(
+            formatdate(1030, usegmt=True), now=1000))
+        self.assertEqual(0, parse_retry_after(
+            formatdate(900, usegmt=True), now=1000))
+
+    @patch('litpcli.retry.sleep')
+    def test_every_attempt_observed(self, sleep):
+        conn = Mock()
+        conn.getresponse.side_effect = [socket.timeout(), Mock(status=200)]
+        observed = []
+        response = send_request(
+            conn, 'GET', '/', None, {}, RetryPolicy(rand=lambda a, b: 0),
+            Deadline(), 2,
+            lambda outcome, seconds, attempt: observed.append(
+                (outcome, attempt)))
+        self.assertEqual(200, response.status)
+        self.assertEqual([('timeout', 0), (200, 1)], observed)
+
+    def test_failed_attempt_observed(self):
+        conn = Mock()
+        conn.request.side_effect = socket.error(111, 'Connection refused')
+        observed = []
+        self.assertRaises(
+            socket.error, send_request, conn, 'GET', '/', None, {},
+            RetryPolicy(), Deadline(), 2,
+            lambda outcome, seconds, attempt: observed.append(
+                (outcome, attempt)))
+        self.assertEqual([('error', 0)], observed)
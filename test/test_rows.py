@@ -0,0 +1,54 @@
+import unittest
+from StringIO import StringIO
+
+import sample_json_output
+
+from litpcli.model import model_node
+from litpcli.rows import RowWriter, parse_columns, node_value, CSV, TSV, \
+    TABLE
+
+URL = "https://localhost:9999/litp/rest/v1"
+
+
+class RowsTests(unittest.TestCase):
+    def setUp(self):
+        self.node = model_node(sample_json_output.show_inherited_output, URL)
+
+    def test_parse_columns(self):
+        self.assertEqual(['path', 'properties.size'],
+                         parse_columns('path, properties.size,'))
+        self.assertRaises(ValueError, parse_columns, 'path,hostname')
+        self.assertRaises(ValueError, parse_columns, 'properties.')
+        self.assertRaises(ValueError, parse_columns, ',')
+
+    def test_node_value(self):
+        self.assertEqual('root', node_value(self.node, 'id'))
+        self.assertEqual('/infrastructure/storage/storage_profiles/profile1'
+                         '/volume_groups/vg1/file_systems/root',
+                         node_value(self.node, 'source'))
+        self.assertEqual('', node_value(self.node, 'reference'))
+        self.assertEqual('48G', node_value(self.node, 'properties.size'))
+        self.assertEqual('', node_value(self.node, 'properties.missing'))
+
+    def _rows(self, output_format, columns):
+        output = StringIO()
+        writer = RowWriter(output, columns, output_format)
+        writer.header()
+        writer.write(self.node)
+        return output.getvalue()
+
+    def test_csv(self):
+        self.assertEqual('id,type,properties.mount_point\n'
+                         'root,reference-to-file-system,/\n',
+                         self._rows(CSV, ['id', 'type',
+                                          'properties.mount_point']))
+
+    def test_tsv(self):
+        self.node.properties['mount_point'] = 'a\tb'
+        self.assertEqual('id\tproperties.mount_point\nroot\ta\\\tb\n',
+                         self._rows(TSV, ['id', 'properties.mount_point']))
+
+    def test_table(self):
+        self.assertEqual(['id                state',
+                          'root              Initial'],
+                         self._rows(TABLE, ['id', 'state']).splitlines())
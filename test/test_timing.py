@@ -0,0 +1,63 @@
+import unittest
+
+from litpcli.timing import Timings, percentile
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Response(object):
+    status = 200
+
+    def __init__(self, body):
+        self.body = body
+
+    def read(self, amt=None):
+        data, self.body = self.body, ''
+        return data
+
+
+class TimingTests(unittest.TestCase):
+    def test_percentile(self):
+        values = range(1, 101)
+        self.assertEqual(50, percentile(values, 50))
+        self.assertEqual(99, percentile(values, 99))
+        self.assertEqual(7, percentile([7], 90))
+
+    def test_repeated_phases_are_added_up(self):
+        clock = Clock()
+        timings = Timings(clock=clock)
+
+        def connect():
+            clock.now += 0.25
+        timed = timings.timed('connect', connect)
+        timed()
+        timed()
+        timings.add('import', 0.1)
+        report = timings.report().splitlines()
+        self.assertEqual("  connect                500.0ms (2 times)",
+                         report[1])
+        self.assertEqual("  import                 100.0ms", report[2])
+
+    def test_requests_timed_only_when_enabled(self):
+        clock = Clock()
+        timings = Timings(clock=clock)
+        self.assertEqual(None, timings.start_request('GET', '/'))
+        timings.enabled = True
+        for path in ('/a', '/b'):
+            timing = timings.start_request(
+                'GET', 'https://localhost:9999/litp/rest/v1' + path)
+            clock.now += 0.002
+            response = timing.response(Response('x' * 2048))
+            self.assertEqual(2048, len(response.read()))
+            timings.add_step('json', 0.001, timing)
+        report = timings.report()
+        self.assertTrue("  GET /litp/rest/v1/a 200: first byte 2.0ms, "
+                        "transfer 0.0ms, 2.0 KiB, json 1.0ms" in report)
+        self.assertTrue("  requests: 2, 4.0 KiB" in report)
+        self.assertTrue("  first byte: p50 2.0ms, p90 2.0ms" in report)
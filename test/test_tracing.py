@@ -0,0 +1,44 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from litpcli.tracing import Trace, NULL_TRACE
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TracingTests(unittest.TestCase):
+    def test_spans_written_as_complete_events(self):
+        clock = Clock()
+        trace = Trace(clock=clock)
+        with trace.span('run_command', 'cli'):
+            clock.now += 0.001
+            with trace.span('GET /', 'request', url='/') as span:
+                clock.now += 0.002
+                span.args['status'] = 200
+        trace_dir = tempfile.mkdtemp()
+        filename = os.path.join(trace_dir, 'trace.json')
+        trace.write(filename)
+        events = json.load(open(filename))['traceEvents']
+        shutil.rmtree(trace_dir)
+        self.assertEqual(
+            [('GET /', 'request', 'X', 1000, 2000, {'url': '/',
+                                                    'status': 200}),
+             ('run_command', 'cli', 'X', 0, 3000, {})],
+            [(event['name'], event['cat'], event['ph'], event['ts'],
+              event['dur'], event['args']) for event in events])
+
+    def test_null_trace(self):
+        with NULL_TRACE.span('run_command', 'cli') as span:
+            span.args['status'] = 200
+        NULL_TRACE.add('import', 'cli', 0, 1)
+        with NULL_TRACE.span('GET /', 'request') as span:
+            self.assertEqual({}, span.args)
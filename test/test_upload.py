@@ -0,0 +1,56 @@
+import unittest
+from StringIO import StringIO
+from tempfile import TemporaryFile
+
+from litpcli.upload import UploadBody, UploadProgress, MIB
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class UploadTests(unittest.TestCase):
+    def test_body_size_from_file(self):
+        fobj = TemporaryFile()
+        fobj.write('x' * 1000)
+        fobj.seek(10)
+        self.assertEqual(990, UploadBody(fobj).size)
+
+    def test_progress_reported_once_per_interval(self):
+        clock = Clock()
+        lines = []
+        fobj = StringIO('x' * int(4 * MIB))
+        fobj.size = int(4 * MIB)
+        body = UploadBody(fobj, UploadProgress(fobj.size, lines.append,
+                                               clock))
+        body.read(int(MIB))
+        clock.now += 0.5
+        body.read(int(MIB))
+        self.assertEqual([], lines)
+        clock.now += 0.5
+        body.read(int(MIB))
+        self.assertEqual(["Uploaded 3.0 of 4.0 MiB (75%), 3.0 MiB/s"], lines)
+        clock.now += 1
+        body.read(int(MIB))
+        body.read(int(MIB))
+        body.read(int(MIB))
+        self.assertEqual(["Uploaded 3.0 of 4.0 MiB (75%), 3.0 MiB/s",
+                          "Uploaded 4.0 of 4.0 MiB (100%), 2.0 MiB/s",
+                          "Uploaded 4.0 MiB in 2.0s, 2.0 MiB/s"], lines)
+
+    def test_resend_restarts_progress(self):
+        lines = []
+        fobj = StringIO('x' * 100)
+        fobj.size = 100
+        body = UploadBody(fobj, UploadProgress(100, lines.append, Clock()))
+        body.read()
+        body.read()
+        body.seek(0)
+        self.assertEqual(0, body.progress.sent)
+        body.read()
+        body.read()
+        self.assertEqual(2, len(lines))
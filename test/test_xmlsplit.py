@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+from litpcli.xmlsplit import item_counts, split_depth, split_subtrees, \
+    subtree_dependencies, stitch_subtrees, can_stitch, SplitError
+
+SITE_XML = """<?xml version="1.0" encoding="utf-8"?>
+<litp:root xmlns:litp="http://www.ericsson.com/litp"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    xsi:schemaLocation="http://www.ericsson.com/litp litp.xsd" id="root">
+  <litp:software id="software">
+    <litp:software-items-collection id="items">
+      <litp:package id="vim">
+        <name>vim-enhanced</name>
+      </litp:package>
+    </litp:software-items-collection>
+  </litp:software>
+  <litp:ms id="ms">
+    <hostname>ms1</hostname>
+    <litp:ms-items-collection id="items">
+      <litp:package-inherit source_path="/software/items/vim" id="vim"/>
+    </litp:ms-items-collection>
+  </litp:ms>
+</litp:root>
+"""
+
+NAMESPACES = ('xmlns:litp="http://www.ericsson.com/litp"\n'
+              '    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"\n'
+              '    xsi:schemaLocation="http://www.ericsson.com/litp'
+              ' litp.xsd"')
+SOFTWARE_XML = """<?xml version="1.0" encoding="utf-8"?>
+<litp:software {0} id="software">
+  <litp:software-items-collection id="items">
+    <litp:package id="vim">
+      <name>vim-enhanced</name>
+    </litp:package>
+  </litp:software-items-collection>
+</litp:software>
+""".format(NAMESPACES)
+MS_XML = """<?xml version="1.0" encoding="utf-8"?>
+<litp:ms {0} id="ms">
+  <hostname>ms1</hostname>
+  <litp:ms-items-collection id="items">
+    <litp:package-inherit source_path="/software/items/vim" id="vim"/>
+  </litp:ms-items-collection>
+</litp:ms>
+""".format(NAMESPACES)
+
+
+class XmlSplitTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_item_counts(self):
+        counts = item_counts(StringIO(SITE_XML))
+        self.assertEqual([1, 2, 2, 2], counts)
+        self.assertEqual(1, split_depth(counts, 2))
+        self.assertEqual(2, split_depth([1, 2, 5, 3], 4))
+        self.assertEqual(2, split_depth([1, 2, 5, 3], 8))
+        self.assertEqual(None, split_depth([1], 8))
+
+    def test_split(self):
+        top, subtrees = split_subtrees(StringIO(SITE_XML), '/', 2,
+                                       self.directory)
+        self.assertEqual([('/software/items', '/software'),
+                          ('/ms/items', '/ms')],
+                         [(subtree.path, subtree.parent)
+                          for subtree in subtrees])
+        top = open(top).read()
+        self.assertTrue('<hostname>ms1</hostname>' in top)
+        self.assertFalse('items' in top)
+        ms_items = open(subtrees[1].filename).read()
+        self.assertTrue(ms_items.startswith('<litp:ms-items-collection'))
+        self.assertTrue('xsi:schemaLocation="http://www.ericsson.com/litp'
+                        ' litp.xsd"' in ms_items)
+        self.assertTrue('source_path="/software/items/vim"' in ms_items)
+        self.assertEqual({'/software/items': set(),
+                          '/ms/items': set(['/software/items'])},
+                         subtree_dependencies(subtrees))
+
+    def test_split_below_load_path(self):
+        top, subtrees = split_subtrees(StringIO(SITE_XML.replace(
+            'litp:root', 'litp:deployment').replace('id="root"', 'id="d1"')),
+            '/deployments', 1, self.directory)
+        self.assertEqual(['/deployments/d1/software', '/deployments/d1/ms'],
+                         [subtree.path for subtree in subtrees])
+
+    def test_top_inheriting_from_subtree(self):
+        # /ms/vim is in the top of the model, /software/items/vim is not
+        site_xml = SITE_XML.replace(
+            '<litp:ms-items-collection id="items">', '').replace(
+            '</litp:ms-items-collection>', '')
+        self.assertRaises(SplitError, split_subtrees, StringIO(site_xml),
+                          '/', 3, self.directory)
+
+    def _parts(self, *texts):
+        filenames = []
+        for index, text in enumerate(texts):
+            filename = os.path.join(self.directory, str(index))
+            with open(filename, 'wb') as fobj:
+                fobj.write(text)
+            filenames.append(filename)
+        return filenames
+
+    def test_stitch(self):
+        output = StringIO()
+        stitch_subtrees(output, {'id': '', 'item-type-name': 'root'},
+                        self._parts(SOFTWARE_XML, MS_XML))
+        self.assertEqual(SITE_XML, output.getvalue())
+
+    def test_stitch_software(self):
+        items_xml = """<?xml version="1.0" encoding="utf-8"?>
+<litp:software-items-collection {0} id="items">
+  <litp:package id="vim">
+    <name>vim-enhanced</name>
+  </litp:package>
+</litp:software-items-collection>
+""".format(NAMESPACES)
+        output = StringIO()
+        stitch_subtrees(output, {'id': 'software',
+                                 'item-type-name': 'software',
+                                 'properties': {}},
+                        self._parts(items_xml))
+        self.assertEqual(SOFTWARE_XML, output.getvalue())
+
+    def test_can_stitch(self):
+        self.assertTrue(can_stitch({'id': 'd1',
+                                    'item-type-name': 'deployment'}))
+        self.assertFalse(can_stitch({
+            'id': 'items', 'item-type-name': 'collection-of-software-item'}))
+        self.assertFalse(can_stitch({
+            'id': 'ms', 'item-type-name': 'ms',
+            'properties': {'hostname': 'ms1'}}))
+        self.assertFalse(can_stitch({
+            'id': 'vim', 'item-type-name': 'package',
+            '_links': {'inherited-from': {
+                'href': 'https://localhost:9999/litp/rest/v1'
+                        '/software/items/vim'}}}))